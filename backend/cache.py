@@ -0,0 +1,289 @@
+"""Shared cache for server.py: one front end, pluggable backends.
+
+A Cache is a named view (listings, stats, auth, archives) on a backend that
+stores encoded values with a TTL:
+
+- MemoryCacheBackend keeps entries in the worker process (LRU bounded by
+  bytes). Other workers learn about writes through an InvalidationBus (the
+  caller publishes the tags it invalidates); when the bus cannot vouch for
+  freshness within max_staleness the caches bypass themselves.
+- RedisCacheBackend talks the Redis protocol (Redis, Valkey, or fakeredis's
+  FakeAsyncRedis as a stand-in), so every worker and host shares the entries.
+
+Invalidation is by tag. Each tag has a version counter and entries are stored
+with the versions of their tags read *before* the value was loaded, so
+bumping a tag makes all of its entries unreachable at once, including entries
+of loads that raced the write.
+
+Stampede protection: concurrent misses for a key share one load within a
+worker (SingleFlight); with a shared backend a short lock also makes the
+other workers wait for that load instead of repeating it. Backend errors are
+counted and the cache fails open: the value is loaded as if uncached.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+import orjson
+
+from cache_bus import ALL_TOPICS
+from metrics import CACHE_BACKEND_ERRORS, CACHE_LOOKUPS
+from singleflight import SingleFlight, normalized_key
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+
+
+logger = logging.getLogger(__name__)
+
+# Invalidates every tag (the InvalidationBus sends it when events may have been missed)
+ALL_TAGS = ALL_TOPICS
+
+
+class Codec:
+    """How a Cache turns values into bytes and back"""
+
+    def __init__(self, encode, decode):
+        self.encode = encode
+        self.decode = decode
+
+
+RAW = Codec(bytes, bytes)
+JSON = Codec(orjson.dumps, orjson.loads)
+
+
+class MemoryCacheBackend:
+    """Per-process entries, optionally invalidated across workers by an InvalidationBus"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_staleness=5.0, bus=None):
+        self.max_bytes = max_bytes
+        self.max_staleness = max_staleness
+        self.bus = bus
+        self._entries = OrderedDict()  # key -> (versions, value, expires_at)
+        self._size = 0
+        self._tags = {}
+        # Bumped when invalidations may have been missed; part of every version tuple
+        self._epoch = 0
+
+    def usable(self):
+        if self.max_bytes <= 0:
+            return False
+        return self.bus is None or self.bus.healthy_within(self.max_staleness)
+
+    async def tag_versions(self, tags):
+        return (self._epoch, *(self._tags.get(tag, 0) for tag in tags))
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        versions, value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return versions, value
+
+    async def set(self, key, versions, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (versions, value, time.monotonic() + ttl)
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def lock(self, key, ttl):
+        # SingleFlight already coalesces the loads of this process
+        return True
+
+    async def unlock(self, key):
+        pass
+
+    async def invalidate(self, *tags):
+        # The other workers are told by whoever publishes on the bus
+        self.invalidated(*tags)
+
+    def invalidated(self, *tags):
+        """Apply invalidations locally (also the InvalidationBus subscriber)"""
+        # Entries of older versions can never be hit again; the LRU evicts them
+        for tag in tags:
+            if tag == ALL_TAGS:
+                self._epoch += 1
+                self._entries.clear()
+                self._size = 0
+            else:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    async def stats(self):
+        return {"backend": "memory", "entries": len(self._entries), "size_bytes": self._size,
+                "usable": self.usable()}
+
+    async def close(self):
+        pass
+
+
+class RedisCacheBackend:
+    """Entries and tag versions in a Redis-protocol server shared by all workers"""
+
+    def __init__(self, client, prefix="cache", owns_client=False):
+        self.client = client
+        self.prefix = prefix
+        self.owns_client = owns_client
+        self._lock_token = uuid.uuid4().hex
+
+    @classmethod
+    def from_url(cls, url, prefix="cache"):
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        # Connects lazily, on the first command
+        return cls(redis_asyncio.from_url(url), prefix=prefix, owns_client=True)
+
+    def usable(self):
+        return True
+
+    def _key(self, kind, name):
+        return f"{self.prefix}:{kind}:{name}"
+
+    async def tag_versions(self, tags):
+        if not tags:
+            return ()
+        versions = await self.client.mget([self._key("tag", tag) for tag in tags])
+        return tuple(int(version or 0) for version in versions)
+
+    async def get(self, key):
+        stored = await self.client.get(self._key("entry", key))
+        if stored is None:
+            return None
+        header, _, value = stored.partition(b"\n")
+        versions = tuple(int(version) for version in header.split(b",")) if header else ()
+        return versions, value
+
+    async def set(self, key, versions, value, ttl):
+        header = ",".join(map(str, versions)).encode()
+        await self.client.set(self._key("entry", key), header + b"\n" + value, px=int(ttl * 1000))
+
+    async def lock(self, key, ttl):
+        return bool(await self.client.set(self._key("lock", key), self._lock_token, nx=True,
+                                          px=int(ttl * 1000)))
+
+    async def unlock(self, key):
+        # Unconditional: at worst a lock that already expired lets one more load through
+        await self.client.delete(self._key("lock", key))
+
+    async def invalidate(self, *tags):
+        tags = [tag for tag in tags if tag != ALL_TAGS]
+        if tags:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(self._key("tag", tag))
+                await pipe.execute()
+
+    async def stats(self):
+        try:
+            await asyncio.wait_for(self.client.ping(), 1.0)
+            reachable = True
+        except Exception:
+            reachable = False
+        return {"backend": "redis", "prefix": self.prefix, "reachable": reachable}
+
+    async def close(self):
+        if self.owns_client:
+            await self.client.aclose()
+
+
+class Cache:
+    """A named set of entries on a backend, invalidated by tags.
+
+    Values are encoded with codec; loads that raise are not cached.
+    """
+
+    def __init__(self, backend, name, ttl, tags=(), codec=JSON, lock_seconds=10.0):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.tags = tuple(tags)
+        self.codec = codec
+        self.lock_seconds = lock_seconds
+        self._flight = SingleFlight(f"cache_{name}")
+        self._lookups = {result: CACHE_LOOKUPS.labels(name, result) for result in ("hit", "miss", "bypass")}
+
+    async def get_or_load(self, key, load):
+        """The cached value for key, or the result of load() (a coroutine function)"""
+        if not self.backend.usable():
+            return await self._bypass(key, load)
+        entry_key = f"{self.name}:{key}"
+        try:
+            versions = await self.backend.tag_versions(self.tags)
+            entry = await self.backend.get(entry_key)
+        except Exception:
+            self._backend_error("get")
+            return await self._bypass(key, load)
+        if entry is not None and entry[0] == versions:
+            self._lookups["hit"].inc()
+            return self.codec.decode(entry[1])
+        self._lookups["miss"].inc()
+        return await self._flight.do(
+            normalized_key(versions, key),
+            lambda: self._load(entry_key, versions, load)
+        )
+
+    async def _bypass(self, key, load):
+        self._lookups["bypass"].inc()
+        # Still coalesced, so an unusable backend does not multiply the queries
+        return await self._flight.do(normalized_key(None, key), load)
+
+    async def _load(self, entry_key, versions, load):
+        try:
+            locked = await self.backend.lock(entry_key, self.lock_seconds)
+        except Exception:
+            self._backend_error("lock")
+            locked = True  # Load, but do not wait for other workers
+        if not locked:
+            value = await self._wait_for_other_worker(entry_key, versions)
+            if value is not None:
+                return value
+        try:
+            value = await load()
+            try:
+                await self.backend.set(entry_key, versions, self.codec.encode(value), self.ttl)
+            except Exception:
+                self._backend_error("set")
+            return value
+        finally:
+            if locked:
+                try:
+                    await self.backend.unlock(entry_key)
+                except Exception:
+                    self._backend_error("unlock")
+
+    async def _wait_for_other_worker(self, entry_key, versions):
+        """The value stored by the worker holding the lock, or None if it did not arrive in time"""
+        deadline = time.monotonic() + self.lock_seconds
+        delay = 0.01
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            try:
+                entry = await self.backend.get(entry_key)
+            except Exception:
+                self._backend_error("get")
+                return None
+            if entry is not None and entry[0] == versions:
+                return self.codec.decode(entry[1])
+        return None
+
+    def _backend_error(self, operation):
+        CACHE_BACKEND_ERRORS.labels(operation).inc()
+        logger.warning("Cache backend error, serving uncached", exc_info=True,
+                       extra={"cache": self.name, "operation": operation})
@@ -0,0 +1,127 @@
+"""Cross-worker cache invalidation over a capped MongoDB collection.
+
+Every worker appends small events ({worker, topic, at}) to the capped
+cache_events collection and tails it with a tailable-await cursor, so a write
+in one uvicorn worker invalidates the caches of all others within one round
+trip, without extra infrastructure. An event may carry the changed documents
+({worker, topic, at, changes}), so that in-process copies of the data can
+apply another worker's write instead of reloading everything.
+
+Each worker also publishes a heartbeat at a fixed interval. A listener that has
+not seen any event (its own heartbeats included) for longer than the staleness
+bound can no longer vouch that it has heard about every write, so caches ask
+healthy_within() before serving and bypass themselves instead of serving data
+that may be older than the bound.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "cache_events"
+HEARTBEAT = "heartbeat"
+# Passed to subscribers when events may have been missed (listener restarted)
+ALL_TOPICS = "*"
+# How far before the last event seen a restarted listener resumes reading
+RESUME_MARGIN = timedelta(seconds=5)
+
+
+class InvalidationBus:
+    """Publishes and receives cache invalidation topics across worker processes"""
+
+    def __init__(self, db, heartbeat_interval=1.0, size_bytes=1024 * 1024):
+        self.collection = db[EVENTS_COLLECTION]
+        self._db = db
+        self.heartbeat_interval = heartbeat_interval
+        self.size_bytes = size_bytes
+        self.worker_id = uuid.uuid4().hex
+        self.last_seen = None
+        self._handlers = []
+
+    def subscribe(self, handler, changes=False):
+        """Call handler(topic) for every topic published by another worker.
+
+        With changes=True the call is handler(topic, changes): the changes the
+        publisher attached, or None if it attached none.
+        """
+        self._handlers.append((handler, changes))
+
+    def healthy_within(self, seconds):
+        return self.last_seen is not None and time.monotonic() - self.last_seen < seconds
+
+    async def publish(self, topic, changes=None):
+        event = {"worker": self.worker_id, "topic": topic, "at": datetime.now(timezone.utc)}
+        if changes is not None:
+            event["changes"] = changes
+        await self.collection.insert_one(event)
+
+    async def run(self):
+        await self._ensure_collection()
+        await asyncio.gather(self._heartbeat(), self._listen())
+
+    async def _ensure_collection(self):
+        try:
+            await self._db.create_collection(EVENTS_COLLECTION, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # Created by another worker
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                await self.publish(HEARTBEAT)
+            except Exception:
+                logger.debug("Cache heartbeat failed", exc_info=True)
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _notify(self, topic, changes=None):
+        for handler, with_changes in self._handlers:
+            if with_changes:
+                handler(topic, changes)
+            else:
+                handler(topic)
+
+    async def _listen(self):
+        since = None  # at of the last event seen
+        # _id -> at of the events seen since RESUME_MARGIN before since, which
+        # a resumed cursor reads again; changes must not be applied twice
+        recent = OrderedDict()
+        while True:
+            try:
+                if since is None:
+                    since = datetime.now(timezone.utc)
+                # Tailable cursors on an empty capped collection die at once;
+                # this also gives the query below at least one match
+                await self.publish(HEARTBEAT)
+                # Resume from the last event seen rather than after its _id:
+                # ObjectIds of different processes are not ordered. The margin
+                # covers clocks of other hosts running behind.
+                cursor = self.collection.find(
+                    {"at": {"$gte": since - RESUME_MARGIN}}, cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                # Iteration also stops on an empty batch (no event within the
+                # server's await time) while the cursor stays alive
+                while cursor.alive:
+                    async for event in cursor:
+                        self.last_seen = time.monotonic()
+                        if event["_id"] in recent:
+                            continue
+                        recent[event["_id"]] = event["at"]
+                        since = max(since, event["at"])
+                        while recent and next(iter(recent.values())) < since - RESUME_MARGIN:
+                            recent.popitem(last=False)
+                        if event["worker"] != self.worker_id and event["topic"] != HEARTBEAT:
+                            self._notify(event["topic"], event.get("changes"))
+            except Exception:
+                logger.warning("Cache invalidation listener failed, restarting", exc_info=True)
+            # The cursor died (e.g. the capped collection wrapped around it), so
+            # events may have been missed
+            self._notify(ALL_TOPICS)
+            await asyncio.sleep(self.heartbeat_interval)
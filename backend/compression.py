@@ -0,0 +1,199 @@
+"""Response compression middleware.
+
+Negotiates zstd, brotli or gzip from Accept-Encoding (zstd and brotli only
+when their packages are installed), skips bodies below a minimum size and
+compresses large bodies in a worker thread so the event loop keeps serving
+other requests. Responses carrying an ETag are immutable by contract, so their
+compressed form is cached per (ETag, encoding) and never compressed twice.
+
+Streaming responses (more than one body chunk) are passed through unchanged.
+"""
+import asyncio
+import gzip
+import threading
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=6)
+
+
+def _brotli(data):
+    # Quality 4 is the usual sweet spot for dynamic content
+    return brotli.compress(data, quality=4)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+# Server preference order, used to break ties between equal q-values
+COMPRESSORS = OrderedDict()
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _zstd
+if brotli is not None:
+    COMPRESSORS["br"] = _brotli
+COMPRESSORS["gzip"] = _gzip
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported content coding for an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in COMPRESSORS:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressedBodyCache:
+    """LRU cache of compressed bodies bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete, compressible response bodies.
+
+    Bodies of at least thread_threshold bytes are compressed on executor: an
+    Executor, a callable returning one (e.g. an executor the app's lifespan
+    owns), or None for the event loop's default executor.
+    """
+
+    def __init__(self, app, minimum_size=1024, thread_threshold=64 * 1024, cache=None, executor=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+        self.cache = cache if cache is not None else CompressedBodyCache()
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            if (message.get("more_body", False)
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = await self._compress(body, encoding, headers.get("etag"))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _compress(self, body, encoding, etag):
+        cache_key = (etag, encoding) if etag else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        compressor = COMPRESSORS[encoding]
+        if len(body) >= self.thread_threshold:
+            loop = asyncio.get_running_loop()
+            executor = self.executor() if callable(self.executor) else self.executor
+            compressed = await loop.run_in_executor(executor, compressor, body)
+        else:
+            compressed = compressor(body)
+
+        if cache_key is not None:
+            self.cache.put(cache_key, compressed)
+        return compressed
@@ -0,0 +1,109 @@
+"""Building blocks of the /healthz and /readyz probes.
+
+PoolMonitor is a pymongo ConnectionPoolListener counting checked-out
+connections per server, so readiness can report pool utilisation without
+touching pymongo internals. CachedProbe runs a probe at most once per time
+window and lets concurrent callers share that run, so a load balancer polling
+every worker costs one MongoDB ping per window, not one per request.
+
+Like QueryMonitor, the listener callbacks run on Motor's executor threads and
+only update counters under a lock.
+"""
+import asyncio
+import threading
+import time
+
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Checked-out connection counts per server address"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_out = {}
+
+    def checked_out(self):
+        with self._lock:
+            return {f"{host}:{port}": count for (host, port), count in self._checked_out.items()}
+
+    def utilisation(self, max_pool_size):
+        """Fraction of the busiest pool that is checked out"""
+        with self._lock:
+            busiest = max(self._checked_out.values(), default=0)
+        return busiest / max_pool_size if max_pool_size else 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self._checked_out.setdefault(event.address, 0)
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._checked_out.pop(event.address, None)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._checked_out[event.address] = self._checked_out.get(event.address, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._checked_out[event.address] = max(self._checked_out.get(event.address, 0) - 1, 0)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
+class CachedProbe:
+    """Run an async probe at most once per ttl seconds"""
+
+    def __init__(self, probe, ttl=1.0):
+        self.probe = probe
+        self.ttl = ttl
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self):
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def get(self):
+        if self._fresh():
+            return self._result
+        async with self._lock:
+            # Callers that waited for the lock share the result of the run they waited for
+            if not self._fresh():
+                self._result = await self.probe()
+                self._checked_at = time.monotonic()
+            return self._result
+
+
+async def measure_loop_lag():
+    """Milliseconds a callback scheduled now waits before the event loop runs it"""
+    start = time.perf_counter()
+    await asyncio.sleep(0)
+    return (time.perf_counter() - start) * 1000
+
+
+def executor_queue_depth(executor):
+    """Work items waiting for a thread in a ThreadPoolExecutor"""
+    # There is no public API for this; _work_queue has existed since Python 3.2
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
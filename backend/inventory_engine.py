@@ -0,0 +1,286 @@
+"""Optional in-memory columnar index of the active inventory.
+
+The active cars of one dealership (tens of thousands at most) are loaded
+without their photos into NumPy columns: status, consignment, month and year
+as small integers, make and model as codes into interned string tables, plus
+the VIN and number strings for free-text search. Filters become vectorized
+masks, and the case-insensitive regex filters of GET /api/cars, which MongoDB
+can only answer by scanning the collection, run once per distinct make or
+model instead of once per car.
+
+The engine answers which cars match and the stats counters; the documents
+themselves (photos included) are still read from MongoDB, by _id.
+
+It is kept current by write hooks: single-car writes are applied in place,
+those of other workers from the changes their InvalidationBus events carry;
+bulk writes mark it stale and a background task reloads it. While stale,
+loading, or unable to vouch for freshness, usable() is False and callers use
+MongoDB as before.
+"""
+import asyncio
+import logging
+import re
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from cache_bus import ALL_TOPICS
+
+
+logger = logging.getLogger(__name__)
+
+PROJECTION = {
+    "_id": 1, "make": 1, "model": 1, "vin": 1, "number": 1, "status": 1,
+    "is_consignment": 1, "current_month": 1, "current_year": 1, "archive_status": 1,
+}
+STATUS_CODES = {"absent": 0, "present": 1}
+MISSING = -1
+INITIAL_CAPACITY = 1024
+
+
+def _code(value, codes):
+    return codes.get(value, MISSING)
+
+
+def _flag(value):
+    return MISSING if value is None else int(value is True)
+
+
+def _int(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else MISSING
+
+
+class StringTable:
+    """Interned strings: each distinct value is stored once and referenced by its code"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        if value is None:
+            return MISSING
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching(self, regex):
+        """Boolean array over the codes (plus a trailing False for MISSING)"""
+        matches = np.zeros(len(self.values) + 1, dtype=bool)
+        for code, value in enumerate(self.values):
+            if regex.search(value):
+                matches[code] = True
+        return matches
+
+
+class Columns:
+    """Column arrays of one load of the inventory; rows are appended, and deleted rows are masked"""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.status = np.full(capacity, MISSING, dtype=np.int8)
+        self.consignment = np.full(capacity, MISSING, dtype=np.int8)
+        self.month = np.full(capacity, MISSING, dtype=np.int16)
+        self.year = np.full(capacity, MISSING, dtype=np.int16)
+        self.make = np.full(capacity, MISSING, dtype=np.int32)
+        self.model = np.full(capacity, MISSING, dtype=np.int32)
+        self.makes = StringTable()
+        self.models = StringTable()
+        self.ids = []
+        self.vins = []
+        self.numbers = []
+        self.rows = {}  # _id -> row
+
+    def _grow(self):
+        capacity = len(self.alive) * 2
+        for name in ("alive", "status", "consignment", "month", "year", "make", "model"):
+            column = getattr(self, name)
+            grown = np.full(capacity, False if name == "alive" else MISSING, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def put(self, car):
+        row = self.rows.get(car["_id"])
+        if row is None:
+            if self.size == len(self.alive):
+                self._grow()
+            row = self.rows[car["_id"]] = self.size
+            self.size += 1
+            self.ids.append(car["_id"])
+            self.vins.append(None)
+            self.numbers.append(None)
+        self.alive[row] = True
+        self.status[row] = _code(car.get("status"), STATUS_CODES)
+        self.consignment[row] = _flag(car.get("is_consignment"))
+        self.month[row] = _int(car.get("current_month"))
+        self.year[row] = _int(car.get("current_year"))
+        self.make[row] = self.makes.code(car.get("make"))
+        self.model[row] = self.models.code(car.get("model"))
+        self.vins[row] = car.get("vin")
+        self.numbers[row] = car.get("number")
+
+    def remove(self, car_id):
+        row = self.rows.pop(car_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def mask(self, month=None, year=None):
+        mask = self.alive[:self.size].copy()
+        if month:
+            mask &= self.month[:self.size] == month
+        if year:
+            mask &= self.year[:self.size] == year
+        return mask
+
+    def text_matches(self, regex, values, mask):
+        """Rows of mask whose string in values matches regex"""
+        matches = np.zeros(self.size, dtype=bool)
+        for row in np.flatnonzero(mask):
+            value = values[row]
+            if value is not None and regex.search(value):
+                matches[row] = True
+        return matches
+
+
+def _regex(pattern):
+    """Python equivalent of {"$regex": pattern, "$options": "i"}, or None if it does not compile"""
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+class InventoryEngine:
+    """Columnar copy of the active cars, answering filters and stats counters"""
+
+    def __init__(self, max_staleness=5.0, bus=None):
+        if np is None:
+            raise RuntimeError("INVENTORY_ENGINE needs the numpy package")
+        self.max_staleness = max_staleness
+        self.bus = bus
+        self.loaded_at = None
+        self._columns = None
+        self._loading = False
+        self._stale = asyncio.Event()
+        self._stale.set()  # Loaded by run()
+
+    def usable(self):
+        if self._columns is None or self._loading or self._stale.is_set():
+            return False
+        return self.bus is None or self.bus.healthy_within(self.max_staleness)
+
+    def mark_stale(self):
+        self._stale.set()
+
+    def invalidated(self, topic, changes=None):
+        """InvalidationBus subscriber: another worker wrote cars ([(old, new)] documents, None for bulk writes)"""
+        if topic == ALL_TOPICS or (topic == "cars" and changes is None):
+            self.mark_stale()
+        elif topic == "cars":
+            for old, new in changes:
+                self.apply(old, new)
+
+    def apply(self, old, new):
+        """Apply a single-car write of this worker (old and new documents, either may be None)"""
+        if self._loading:
+            # The load in flight may or may not include this write
+            self.mark_stale()
+        columns = self._columns
+        if columns is None:
+            return
+        if new is not None and new.get("archive_status") == "active":
+            columns.put(new)
+        elif old is not None:
+            columns.remove(old["_id"])
+
+    async def run(self, db):
+        """Reload whenever marked stale (runs for the app's lifetime)"""
+        while True:
+            await self._stale.wait()
+            self._stale.clear()
+            self._loading = True
+            try:
+                columns = await self._load(db)
+            except Exception:
+                logger.exception("Inventory engine load failed")
+                await asyncio.sleep(self.max_staleness)
+                self._stale.set()
+                continue
+            finally:
+                self._loading = False
+            if not self._stale.is_set():
+                self._columns = columns
+                self.loaded_at = time.time()
+
+    async def _load(self, db):
+        started = time.perf_counter()
+        columns = Columns()
+        async for car in db.cars.find({"archive_status": "active"}, PROJECTION):
+            columns.put(car)
+        logger.info("Inventory engine loaded", extra={
+            "cars": columns.size, "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+        return columns
+
+    def select(self, month=None, year=None, make=None, model=None, status=None,
+               is_consignment=None, search=None):
+        """_ids of the active cars matching GET /api/cars filters, in load order.
+
+        None if a pattern is not valid in Python's regex dialect; the caller
+        then asks MongoDB.
+        """
+        columns = self._columns
+        mask = columns.mask(month, year)
+        if status:
+            mask &= columns.status[:columns.size] == STATUS_CODES.get(status, MISSING)
+        if is_consignment is not None:
+            mask &= columns.consignment[:columns.size] == int(is_consignment)
+        for pattern, table, codes in ((make, columns.makes, columns.make), (model, columns.models, columns.model)):
+            if pattern:
+                regex = _regex(pattern)
+                if regex is None:
+                    return None
+                mask &= table.matching(regex)[codes[:columns.size]]
+        if search:
+            regex = _regex(search)
+            if regex is None:
+                return None
+            mask &= (
+                columns.makes.matching(regex)[columns.make[:columns.size]]
+                | columns.models.matching(regex)[columns.model[:columns.size]]
+                | columns.text_matches(regex, columns.vins, mask)
+                | columns.text_matches(regex, columns.numbers, mask)
+            )
+        return [columns.ids[row] for row in np.flatnonzero(mask)]
+
+    def counts(self, month=None, year=None):
+        """Same shape as the period stats counters: {"regular": {...}, "consignment": {...}}"""
+        columns = self._columns
+        mask = columns.mask(month, year)
+        consignment = columns.consignment[:columns.size] == 1
+        present = columns.status[:columns.size] == STATUS_CODES["present"]
+        absent = columns.status[:columns.size] == STATUS_CODES["absent"]
+        result = {}
+        for name, group in (("regular", mask & ~consignment), ("consignment", mask & consignment)):
+            result[name] = {
+                "total": int(group.sum()),
+                "present": int((group & present).sum()),
+                "absent": int((group & absent).sum()),
+            }
+        return result
+
+    def stats(self):
+        columns = self._columns
+        return {
+            "usable": self.usable(),
+            "cars": len(columns.rows) if columns is not None else 0,
+            "makes": len(columns.makes.values) if columns is not None else 0,
+            "models": len(columns.models.values) if columns is not None else 0,
+            "loaded_at": self.loaded_at,
+        }
@@ -0,0 +1,120 @@
+"""Structured, non-blocking logging setup.
+
+Records are handed to a QueueHandler on the calling thread (a cheap, lock-free
+put) and formatted/written by a QueueListener thread, so log I/O never runs on
+the event loop. Output is one JSON object per line by default; fields passed
+via ``extra=`` end up as top-level keys.
+"""
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback out of the message.
+
+    The stock prepare() folds the formatted traceback into msg and drops
+    exc_info, so the JSON formatter could not emit it as its own field. Here
+    the traceback is formatted on the calling thread (the exception and its
+    frames must not outlive the call) into exc_text, which both formatters
+    use, and msg stays the plain message.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class LoggingListener(QueueListener):
+    """QueueListener that also detaches its QueueHandler from the root logger on stop()"""
+
+    def __init__(self, queue, handler, *handlers, respect_handler_level=False):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.queue_handler = handler
+
+    def stop(self):
+        # Detached first, so nothing is queued after the listener drained the queue
+        logging.getLogger().removeHandler(self.queue_handler)
+        super().stop()
+
+
+class RowSampler:
+    """Decide which per-row debug records of a bulk operation get logged.
+
+    Logs the first ``head`` rows and then every ``every``-th row, and only when
+    DEBUG is enabled, so the check costs a single comparison otherwise.
+    """
+
+    def __init__(self, logger, every=100, head=5):
+        self.enabled = logger.isEnabledFor(logging.DEBUG)
+        self.every = max(1, every)
+        self.head = head
+        self._seen = 0
+
+    def __call__(self):
+        if not self.enabled:
+            return False
+        self._seen += 1
+        return self._seen <= self.head or self._seen % self.every == 0
+
+
+def configure_logging(level="INFO", fmt="json"):
+    """Route all logging through a background QueueListener.
+
+    Returns the started listener; call ``stop()`` on shutdown to flush it and
+    detach it from the root logger.
+    """
+    level = level.upper()
+    fmt = fmt.lower()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    queue_handler = StructuredQueueHandler(log_queue)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = LoggingListener(log_queue, queue_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
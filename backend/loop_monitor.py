@@ -0,0 +1,147 @@
+"""Event loop lag measurement and blocking-call detection (opt-in).
+
+A heartbeat coroutine sleeps for a fixed interval and records how late it
+wakes up; that delay is the event loop lag every other request saw at the same
+time. A watchdog thread checks the heartbeat: when it is overdue by more than
+the block threshold, some callback is still running on the loop, so the
+watchdog captures the loop thread's stack right then. Once the heartbeat
+resumes, the block is measured, exported and logged with the route whose
+endpoint was on that stack.
+
+Routes are found by mapping each endpoint's code object to its path, so the
+lookup is a dict access per frame and needs no request-scoped state (context
+variables of the loop thread cannot be read from the watchdog thread).
+"""
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+
+logger = logging.getLogger("loop_monitor")
+
+APP_DIR = str(Path(__file__).resolve().parent)
+UNKNOWN_ROUTE = "<unknown>"
+MAX_STACK_FRAMES = 30
+
+
+def endpoint_routes(routes):
+    """Map endpoint code objects to route paths (through decorator wrappers)"""
+    mapping = {}
+    for route in routes:
+        endpoint = getattr(route, "endpoint", None)
+        if endpoint is None:
+            continue
+        code = getattr(inspect.unwrap(endpoint), "__code__", None)
+        if code is not None:
+            mapping.setdefault(code, route.path)
+    return mapping
+
+
+class LoopMonitor:
+    """Heartbeat-based lag histogram plus a watchdog capturing blocking stacks"""
+
+    def __init__(self, app, interval_ms=50, block_threshold_ms=100, max_blocks=100):
+        self.app = app
+        self.interval = interval_ms / 1000
+        self.block_threshold = block_threshold_ms / 1000
+        self.blocks = deque(maxlen=max_blocks)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._routes = None
+        self._last_beat = None
+        self._captured_for = None
+        self._captured = None
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    async def _heartbeat(self):
+        while True:
+            beat = time.perf_counter()
+            self._last_beat = beat
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - beat - self.interval, 0.0)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag >= self.block_threshold:
+                self._record_block(beat, lag)
+
+    def _watch(self):
+        # Check often enough to catch a block well before it ends
+        while not self._stop.wait(self.block_threshold / 4):
+            beat = self._last_beat
+            if beat is None or beat == self._captured_for:
+                continue
+            if time.perf_counter() - beat - self.interval >= self.block_threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    captured = self._describe(frame)
+                    with self._lock:
+                        self._captured_for = beat
+                        self._captured = captured
+
+    def _describe(self, frame):
+        if self._routes is None:
+            self._routes = endpoint_routes(self.app.routes)
+        stack = traceback.extract_stack(frame, limit=MAX_STACK_FRAMES)
+        route = UNKNOWN_ROUTE
+        location = None
+        while frame is not None:
+            if location is None and frame.f_code.co_filename.startswith(APP_DIR):
+                location = f"{Path(frame.f_code.co_filename).name}:{frame.f_lineno} in {frame.f_code.co_name}"
+            path = self._routes.get(frame.f_code)
+            if path is not None:
+                route = path
+                break
+            frame = frame.f_back
+        return {"route": route, "location": location, "stack": traceback.format_list(stack)}
+
+    def _record_block(self, beat, lag):
+        with self._lock:
+            captured = self._captured if self._captured_for == beat else None
+            self._captured = None
+        if captured is None:
+            # The block ended before the watchdog looked
+            captured = {"route": UNKNOWN_ROUTE, "location": None, "stack": []}
+        block = {"duration_ms": round(lag * 1000, 1), "at": time.time(), **captured}
+        self.blocks.append(block)
+        EVENT_LOOP_BLOCKS.labels(block["route"]).observe(lag)
+        logger.warning(
+            "event loop blocked",
+            extra={"duration_ms": block["duration_ms"], "route": block["route"], "location": block["location"],
+                   "stack": "".join(block["stack"])},
+        )
+
+    def hot_spots(self, limit=10):
+        """Recent blocks grouped by route and innermost application frame, worst first"""
+        grouped = {}
+        for block in list(self.blocks):
+            key = (block["route"], block["location"])
+            entry = grouped.setdefault(key, {"route": key[0], "location": key[1], "count": 0,
+                                             "total_ms": 0.0, "max_ms": 0.0, "stack": block["stack"]})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + block["duration_ms"], 1)
+            entry["max_ms"] = max(entry["max_ms"], block["duration_ms"])
+        return sorted(grouped.values(), key=lambda entry: entry["total_ms"], reverse=True)[:limit]
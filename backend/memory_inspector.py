@@ -0,0 +1,137 @@
+"""Memory introspection for the admin memory endpoints.
+
+Process-level numbers (RSS, GC generation counts) are always available.
+Allocation sites need tracemalloc, which costs CPU and memory while it runs,
+so MemoryInspector starts and stops it on demand and keeps a few numbered
+snapshots to compare. Taking snapshots and walking the live objects are slow,
+so callers run them in a worker thread.
+"""
+import gc
+import os
+import resource
+import sys
+import threading
+import tracemalloc
+from collections import OrderedDict
+
+
+MAX_SNAPSHOTS = 5
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# tracemalloc's own bookkeeping and the import machinery are noise here
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes():
+    """Current resident set size (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def gc_summary():
+    return {
+        "counts": gc.get_count(),
+        "thresholds": gc.get_threshold(),
+        "generations": gc.get_stats(),
+    }
+
+
+def largest_object_types(limit=20):
+    """Live GC-tracked objects grouped by type, largest total shallow size first"""
+    sizes = {}
+    counts = {}
+    for obj in gc.get_objects():
+        name = type(obj).__qualname__
+        sizes[name] = sizes.get(name, 0) + sys.getsizeof(obj, 0)
+        counts[name] = counts.get(name, 0) + 1
+    ranked = sorted(sizes, key=sizes.get, reverse=True)[:limit]
+    return [{"type": name, "count": counts[name], "size_kb": round(sizes[name] / 1024, 1)} for name in ranked]
+
+
+def _location(traceback, group_by):
+    if group_by == "traceback":
+        return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+    frame = traceback[0]
+    return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryInspector:
+    """tracemalloc control plus the last MAX_SNAPSHOTS snapshots, by id"""
+
+    def __init__(self):
+        self._snapshots = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def status(self):
+        if not tracemalloc.is_tracing():
+            return {"tracing": False, "snapshots": list(self._snapshots)}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "overhead_kb": round(tracemalloc.get_tracemalloc_memory() / 1024, 1),
+            "snapshots": list(self._snapshots),
+        }
+
+    def take_snapshot(self):
+        """Take and keep a snapshot; returns its id. Requires tracing."""
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def snapshot(self, snapshot_id):
+        return self._snapshots.get(snapshot_id)
+
+    def top(self, snapshot_id, limit=20, group_by="lineno"):
+        statistics = self._snapshots[snapshot_id].statistics(group_by)
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in statistics[:limit]
+        ]
+
+    def diff(self, base_id, target_id, limit=20, group_by="lineno"):
+        """Allocation sites that grew the most from base to target"""
+        statistics = self._snapshots[target_id].compare_to(self._snapshots[base_id], group_by)
+        return [
+            {
+                "location": _location(stat.traceback, group_by),
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count": stat.count,
+                "count_diff": stat.count_diff,
+            }
+            for stat in statistics[:limit]
+        ]
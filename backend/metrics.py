@@ -0,0 +1,179 @@
+"""Prometheus instrumentation for the inventory API.
+
+Exposes per-route HTTP metrics through a plain ASGI middleware (no
+BaseHTTPMiddleware, so the request body stream is never re-wrapped) and the
+domain counters updated by the route handlers in server.py.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+# HTTP metrics
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Total HTTP requests by route and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being processed",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route",
+    ["method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+
+# Domain metrics
+CARS_IMPORTED = Counter(
+    "inventory_cars_imported_total",
+    "Cars created by CSV imports",
+)
+CARS_UPDATED_BY_IMPORT = Counter(
+    "inventory_cars_import_updated_total",
+    "Existing cars updated by CSV imports (matched by VIN)",
+)
+CAR_STATUS_CHANGES = Counter(
+    "inventory_car_status_changes_total",
+    "Car presence status changes",
+    ["from_status", "to_status"],
+)
+ARCHIVES_CREATED = Counter(
+    "inventory_archives_created_total",
+    "Monthly archives created",
+)
+
+# MongoDB command metrics (fed by query_monitor.QueryMonitor)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ["collection", "command"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_DOCS_RETURNED = Counter(
+    "mongodb_command_documents_total",
+    "Documents returned or affected by MongoDB commands",
+    ["collection", "command"],
+)
+MONGO_SLOW_COMMANDS = Counter(
+    "mongodb_slow_commands_total",
+    "MongoDB commands slower than the slow query threshold",
+    ["collection", "command"],
+)
+
+# Read coalescing (fed by singleflight.SingleFlight)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "singleflight_requests_total",
+    "Coalesced reads; role=leader ran the query, role=coalesced shared a leader's result",
+    ["operation", "role"],
+)
+
+# Shared cache (fed by cache.Cache)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result (hit, miss, bypass when the backend cannot be used)",
+    ["cache", "result"],
+)
+CACHE_BACKEND_ERRORS = Counter(
+    "cache_backend_errors_total",
+    "Failed cache backend operations (the request is served uncached)",
+    ["operation"],
+)
+
+# Event loop metrics (fed by loop_monitor.LoopMonitor, when enabled)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop heartbeat beyond its scheduled time",
+    buckets=LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_BLOCKS = Histogram(
+    "event_loop_block_duration_seconds",
+    "Callbacks that blocked the event loop longer than the threshold, by route",
+    ["route"],
+    buckets=LOOP_LAG_BUCKETS,
+)
+
+
+def route_label(scope):
+    """Return the route template of a handled request (e.g. /api/cars/{car_id})"""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE) if route is not None else UNMATCHED_ROUTE
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request count, latency, size and concurrency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            # The router stores the matched route on the scope, so the label is the
+            # template rather than the raw path and cardinality stays bounded.
+            route = route_label(scope)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route).observe(duration)
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(response_size)
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (several uvicorn workers), the values of
+    all worker processes are aggregated.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,26 @@
+"""Run the storage migrations of server.py once and exit.
+
+The server also runs them in the background at startup; this is for running
+them ahead of a deploy or checking that nothing is left to convert:
+
+    cd backend && python migrate.py
+"""
+import asyncio
+import dataclasses
+
+import mongo_codecs
+import server
+
+
+async def main():
+    app = server.create_app(dataclasses.replace(server.Settings.from_env(), background_maintenance=False, cache_pubsub=False))
+    async with app.router.lifespan_context(app):
+        await server.build_period_stats()
+        await server.run_migrations()
+        completed = [doc["_id"] async for doc in server.db.migrations.find({}, {"_id": 1})]
+        print(f"Completed migrations: {', '.join(sorted(completed)) or 'none'}")
+        print(f"Legacy string id lookups: {'on' if mongo_codecs.legacy_string_ids else 'off'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
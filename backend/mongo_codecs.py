@@ -0,0 +1,170 @@
+"""BSON codec layer for the inventory collections.
+
+Timestamps are stored as native BSON datetimes and date-only fields
+(purchase_date) as BSON datetimes at midnight UTC, so range queries on them can
+use indexes. Ids are stored as BSON Binary UUIDs (subtype 4, 16 bytes) instead
+of 36-character strings. At the API boundary nothing changes: ids are UUID
+strings and date-only fields "YYYY-MM-DD" strings.
+
+Documents written before this layer existed hold strings instead; the decode
+helpers and id_query() still accept those until the background migrations in
+server.py have rewritten them.
+"""
+import uuid
+from datetime import date, datetime, timezone
+
+from bson.codec_options import TypeEncoder, TypeRegistry
+
+
+# Timestamp fields (datetime in the API, BSON datetime in MongoDB)
+DATETIME_FIELDS = ("created_at", "updated_at", "archived_at")
+# Date-only fields ("YYYY-MM-DD" in the API, BSON datetime at midnight UTC in MongoDB)
+DATE_FIELDS = ("purchase_date",)
+# Ids and references to ids (UUID strings in the API, Binary subtype 4 in MongoDB)
+ID_FIELDS = ("id", "created_by", "archived_by", "archive_id", "car_id")
+
+# Whether documents with string ids may still exist; cleared once the id
+# migration has completed so lookups become a single equality match
+legacy_string_ids = True
+
+
+class DateEncoder(TypeEncoder):
+    """Encode datetime.date (which BSON has no type for) as midnight UTC"""
+
+    python_type = date
+
+    def transform_python(self, value):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+
+
+def client_codec_options():
+    """Keyword arguments for AsyncIOMotorClient enabling the codec layer.
+
+    Decoded datetimes are timezone-aware UTC, matching what the models produce,
+    and uuid.UUID values round-trip as Binary subtype 4.
+    """
+    return {
+        "tz_aware": True,
+        "tzinfo": timezone.utc,
+        "uuidRepresentation": "standard",
+        "type_registry": TypeRegistry([DateEncoder()]),
+    }
+
+
+def parse_date(value):
+    """Parse a "YYYY-MM-DD" string; return None if it is not one"""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_date(value):
+    """Format a stored date-only value as "YYYY-MM-DD" """
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def parse_uuid(value):
+    """Parse a UUID string; return None if it is not one"""
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def id_query(value):
+    """Query condition matching an API id against stored ids.
+
+    Strings that are not UUIDs can only match legacy string ids.
+    """
+    parsed = parse_uuid(value)
+    if parsed is None:
+        return value
+    if legacy_string_ids:
+        return {"$in": [parsed, value]}
+    return parsed
+
+
+def encode_document(data):
+    """Convert API values to their storage types (in place).
+
+    Date-only strings that are not valid "YYYY-MM-DD" and ids that are not
+    UUIDs are stored unchanged.
+    """
+    for key in DATE_FIELDS:
+        value = data.get(key)
+        if isinstance(value, str):
+            parsed = parse_date(value)
+            if parsed is not None:
+                data[key] = parsed
+    for key in ID_FIELDS:
+        value = data.get(key)
+        if isinstance(value, str):
+            parsed = parse_uuid(value)
+            if parsed is not None:
+                data[key] = parsed
+    return data
+
+
+def decode_trusted(item):
+    """Convert stored ids and date-only values back to their API strings (in
+    place), including those of the cars embedded in an archive.
+
+    Timestamps are left alone; they serialize to ISO strings either way.
+    """
+    for key in DATE_FIELDS:
+        value = item.get(key)
+        if isinstance(value, date):
+            item[key] = format_date(value)
+    for key in ID_FIELDS:
+        value = item.get(key)
+        if isinstance(value, uuid.UUID):
+            item[key] = str(value)
+    for car in item.get("cars_data") or ():
+        decode_trusted(car)
+    return item
+
+
+def decode_document(item):
+    """Convert stored values back to their API types (in place)"""
+    decode_trusted(item)
+    for key in DATETIME_FIELDS:
+        value = item.get(key)
+        if isinstance(value, str):
+            # Legacy document written as an ISO string
+            item[key] = datetime.fromisoformat(value)
+    return item
+
+
+def legacy_date_updates(item):
+    """Return the $set needed to convert a legacy document's string dates, or {}"""
+    updates = {}
+    for key in DATETIME_FIELDS:
+        value = item.get(key)
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                continue
+            updates[key] = parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    for key in DATE_FIELDS:
+        value = item.get(key)
+        if isinstance(value, str):
+            parsed = parse_date(value)
+            if parsed is not None:
+                updates[key] = parsed
+    return updates
+
+
+def legacy_id_updates(item):
+    """Return the $set needed to convert a legacy document's string ids, or {}"""
+    updates = {}
+    for key in ID_FIELDS:
+        value = item.get(key)
+        if isinstance(value, str):
+            parsed = parse_uuid(value)
+            if parsed is not None:
+                updates[key] = parsed
+    return updates
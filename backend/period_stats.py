@@ -0,0 +1,257 @@
+"""Materialized per-period inventory counters.
+
+The period_stats collection holds one document per (year, month,
+is_consignment) with the number of active cars and how many of them are
+present or absent. Every car write applies its delta with $inc, so the stats
+and available-months endpoints read a few small documents instead of counting
+the cars collection.
+
+The counters are updated after the car write, not atomically with it, and
+writes that bypass the API are not seen at all; reconcile() recomputes them
+from the cars collection and repairs any drift.
+
+Until build() has run once against a database (the first start over existing
+cars), the reads count the cars collection instead of serving empty counters.
+
+The list of periods with active cars is additionally cached in-process by
+period_index, which every counter write invalidates.
+"""
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from pymongo import DeleteOne, UpdateOne
+
+from singleflight import SingleFlight
+
+
+COUNTERS = ("total", "present", "absent")
+# db.migrations document recording that the counters have been built
+BUILT_MARKER = "period_stats"
+# Set by build(); until then the reads count the cars collection
+counters_built = False
+MONTH_NAMES = (
+    "Januar", "Februar", "März", "April", "Mai", "Juni",
+    "Juli", "August", "September", "Oktober", "November", "Dezember"
+)
+
+
+def period_key(car):
+    """(year, month, is_consignment) a car counts towards, or None if it is not active"""
+    if car is None or car.get("archive_status") != "active":
+        return None
+    return car.get("current_year"), car.get("current_month"), car.get("is_consignment") is True
+
+
+def period_filter(year, month, is_consignment):
+    return {"year": year, "month": month, "is_consignment": is_consignment}
+
+
+def car_counts(car):
+    status = car.get("status")
+    return {"total": 1, "present": int(status == "present"), "absent": int(status == "absent")}
+
+
+class PeriodStatsDelta:
+    """Counter changes accumulated over one or more car writes"""
+
+    def __init__(self):
+        self.changes = defaultdict(Counter)
+
+    def add(self, car, sign=1):
+        """Count a stored car document in (sign=1) or out (sign=-1)"""
+        key = period_key(car)
+        if key is None:
+            return
+        counts = self.changes[key]
+        for name, value in car_counts(car).items():
+            counts[name] += sign * value
+
+    def change(self, old, new):
+        """Account a car going from document old to document new (either may be None)"""
+        self.add(old, -1)
+        self.add(new, 1)
+
+    def operations(self):
+        operations = []
+        for key, counts in self.changes.items():
+            increments = {name: value for name, value in counts.items() if value}
+            if increments:
+                operations.append(UpdateOne(period_filter(*key), {"$inc": increments}, upsert=True))
+        return operations
+
+    async def apply(self, db):
+        operations = self.operations()
+        self.changes.clear()
+        if operations:
+            await db.period_stats.bulk_write(operations, ordered=False)
+            period_index.invalidate()
+
+
+async def record_change(db, old, new):
+    """Apply the counter delta of a single car write"""
+    delta = PeriodStatsDelta()
+    delta.change(old, new)
+    await delta.apply(db)
+
+
+async def reset(db, month=None, year=None):
+    """Drop the counters of periods that no longer have active cars"""
+    query = {}
+    if month:
+        query["month"] = month
+    if year:
+        query["year"] = year
+    await db.period_stats.delete_many(query)
+    period_index.invalidate()
+
+
+async def read_counts(db, month=None, year=None):
+    """Counters summed over the matching periods, keyed by is_consignment"""
+    totals = {False: dict.fromkeys(COUNTERS, 0), True: dict.fromkeys(COUNTERS, 0)}
+    if not counters_built:
+        for (_, _, is_consignment), counted in (await count_cars(db, month, year)).items():
+            for name in COUNTERS:
+                totals[is_consignment][name] += counted[name]
+        return totals
+    query = {}
+    if month:
+        query["month"] = month
+    if year:
+        query["year"] = year
+    async for doc in db.period_stats.find(query, {"_id": 0}):
+        counts = totals[doc.get("is_consignment") is True]
+        for name in COUNTERS:
+            counts[name] += doc.get(name, 0)
+    return totals
+
+
+async def available_periods(db):
+    """[(month, year, car_count)] of all periods with active cars, newest first.
+
+    Pagination is applied to the cached list (PeriodIndex), not here.
+    """
+    periods = {}
+    if not counters_built:
+        for (year, month, _), counts in (await count_cars(db)).items():
+            periods[(year, month)] = periods.get((year, month), 0) + counts["total"]
+        newest_first = sorted(periods.items(), key=lambda item: (item[0][0] or 0, item[0][1] or 0), reverse=True)
+        return [(month, year, count) for (year, month), count in newest_first]
+    cursor = db.period_stats.find(
+        {"total": {"$gt": 0}}, {"_id": 0, "year": 1, "month": 1, "total": 1}
+    ).sort([("year", -1), ("month", -1)])
+    async for doc in cursor:
+        key = (doc["year"], doc["month"])
+        periods[key] = periods.get(key, 0) + doc["total"]
+    return [(month, year, count) for (year, month), count in periods.items()]
+
+
+async def count_cars(db, month=None, year=None):
+    """Counters computed from the cars collection: {(year, month, is_consignment): counts}"""
+    match = {"archive_status": "active"}
+    if month:
+        match["current_month"] = month
+    if year:
+        match["current_year"] = year
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "year": "$current_year",
+                "month": "$current_month",
+                "is_consignment": {"$eq": ["$is_consignment", True]}
+            },
+            "total": {"$sum": 1},
+            "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}},
+            "absent": {"$sum": {"$cond": [{"$eq": ["$status", "absent"]}, 1, 0]}}
+        }}
+    ]
+    counted = {}
+    async for row in db.cars.aggregate(pipeline):
+        key = (row["_id"]["year"], row["_id"]["month"], row["_id"]["is_consignment"])
+        counted[key] = {name: row[name] for name in COUNTERS}
+    return counted
+
+
+async def reconcile(db):
+    """Recompute all counters from the cars collection.
+
+    Returns the number of period documents that had to be corrected.
+    """
+    expected = await count_cars(db)
+    operations = []
+    async for doc in db.period_stats.find({}):
+        counts = expected.pop((doc.get("year"), doc.get("month"), doc.get("is_consignment")), None)
+        if counts is None:
+            operations.append(DeleteOne({"_id": doc["_id"]}))
+        elif any(doc.get(name, 0) != counts[name] for name in COUNTERS):
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": counts}))
+    for key, counts in expected.items():
+        operations.append(UpdateOne(period_filter(*key), {"$set": counts}, upsert=True))
+
+    if operations:
+        await db.period_stats.bulk_write(operations, ordered=False)
+        period_index.invalidate()
+    return len(operations)
+
+
+async def build(db):
+    """Build the counters from the cars collection unless an earlier run did.
+
+    Returns the number of period documents written (0 if already built).
+    """
+    global counters_built
+    if await db.migrations.find_one({"_id": BUILT_MARKER}):
+        counters_built = True
+        return 0
+    written = await reconcile(db)
+    await db.migrations.update_one(
+        {"_id": BUILT_MARKER}, {"$setOnInsert": {"completed_at": datetime.now(timezone.utc)}}, upsert=True
+    )
+    counters_built = True
+    return written
+
+
+class PeriodIndex:
+    """In-process cache of the periods with active cars, newest first.
+
+    Entries are ready-to-serve dicts built once per refresh. Writes in this
+    process invalidate the cache immediately; max_age bounds how long writes
+    made by other worker processes can go unseen.
+    """
+
+    def __init__(self, max_age=5.0):
+        self.max_age = max_age
+        self._entries = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        # Requests arriving while the list is being loaded share that load
+        self._flight = SingleFlight("available_months")
+
+    def invalidate(self):
+        self._generation += 1
+        self._entries = None
+
+    def _fresh(self):
+        return self._entries is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    async def get(self, db):
+        """All periods as (month, year, car_count, month_name) dicts"""
+        if self._fresh():
+            return self._entries
+        return await self._flight.do("periods", lambda: self._load(db))
+
+    async def _load(self, db):
+        generation = self._generation
+        entries = tuple(
+            {"month": month, "year": year, "car_count": car_count, "month_name": MONTH_NAMES[month - 1]}
+            for month, year, car_count in await available_periods(db)
+        )
+        # Do not cache a result that a concurrent write has already made stale
+        if generation == self._generation:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+        return entries
+
+
+period_index = PeriodIndex()
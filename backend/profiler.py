@@ -0,0 +1,178 @@
+"""In-process sampling profiler for the admin profiling endpoints.
+
+SamplingProfiler is a thread that snapshots the stacks of the other threads
+(sys._current_frames) at a fixed interval and counts identical stacks. It
+needs no tracing hooks, so the profiled code runs at full speed and the
+overhead is one stack walk per thread per sample. Results render as collapsed
+stacks (flamegraph.pl, speedscope, many others) or as a speedscope JSON file.
+
+RequestProfileSession profiles only the next K requests whose route matches a
+pattern: it samples the event loop thread and keeps the samples whose stack
+contains the endpoint of a matching route. Requests are counted as they
+finish by ProfilingMiddleware.
+"""
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from loop_monitor import endpoint_routes
+from metrics import route_label
+
+
+MAX_PROFILE_SECONDS = 60
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def frame_label(code):
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Counts the stacks of the process's threads, sampled every interval seconds.
+
+    thread_ids restricts sampling to those threads; keep(codes) can reject a
+    stack (given as code objects, innermost first).
+    """
+
+    def __init__(self, interval=0.005, thread_ids=None, keep=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.keep = keep
+        self.samples = Counter()
+        # Wall time attributed to each stack; a round can take longer than the
+        # interval when the sampler waits for the GIL
+        self.seconds = defaultdict(float)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        previous = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, previous = now - previous, now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if self.keep is not None and not self.keep(codes):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                codes.reverse()
+                key = (names.get(thread_id, str(thread_id)), tuple(codes))
+                self.samples[key] += 1
+                self.seconds[key] += elapsed
+
+    def collapsed(self):
+        """Collapsed stacks: "thread;outer;...;inner count" per line"""
+        lines = [
+            ";".join([thread_name, *map(frame_label, codes)]) + f" {count}"
+            for (thread_name, codes), count in self.samples.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name="profile"):
+        """A speedscope file with one sampled profile per thread (weights in seconds of wall time)"""
+        frames = []
+        frame_index = {}
+        profiles = {}
+        for (thread_name, codes), count in self.samples.items():
+            stack = []
+            for code in codes:
+                index = frame_index.get(code)
+                if index is None:
+                    index = frame_index[code] = len(frames)
+                    frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+                stack.append(index)
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled", "name": thread_name, "unit": "seconds",
+                "startValue": 0, "endValue": 0, "samples": [], "weights": [],
+            })
+            weight = self.seconds[(thread_name, codes)]
+            profile["samples"].append(stack)
+            profile["weights"].append(weight)
+            profile["endValue"] += weight
+        return json.dumps({
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "inventory-api sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        })
+
+    def render(self, fmt, name="profile"):
+        """(body, media type, file extension) in "collapsed" or "speedscope" format"""
+        if fmt == "collapsed":
+            return self.collapsed(), "text/plain", "collapsed.txt"
+        return self.speedscope(name), "application/json", "speedscope.json"
+
+
+class RequestProfileSession:
+    """Profiles the endpoints of the next `count` requests whose route matches pattern"""
+
+    def __init__(self, app, pattern, count, interval=0.005, exclude_prefix="/api/admin/profile"):
+        self.pattern = re.compile(pattern)
+        self.remaining = count
+        self.completed = 0
+        self.done = asyncio.Event()
+        self.routes = sorted({
+            path for path in endpoint_routes(app.routes).values()
+            if self.pattern.search(path) and not path.startswith(exclude_prefix)
+        })
+        endpoint_codes = {
+            code for code, path in endpoint_routes(app.routes).items() if path in self.routes
+        }
+        self.profiler = SamplingProfiler(
+            interval,
+            thread_ids={threading.get_ident()},  # created on the event loop thread
+            keep=lambda codes: not endpoint_codes.isdisjoint(codes),
+        )
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def request_finished(self, route):
+        if self.remaining > 0 and route in self.routes:
+            self.remaining -= 1
+            self.completed += 1
+            if self.remaining == 0:
+                self.done.set()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware counting finished requests for an active RequestProfileSession"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = getattr(scope["app"].state, "request_profile", None) if scope["type"] == "http" else None
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.request_finished(route_label(scope))
@@ -0,0 +1,217 @@
+"""MongoDB command monitoring and slow query log.
+
+QueryMonitor is a pymongo CommandListener registered on the Motor client. It
+records per-command durations and document counts keyed by collection and
+operation, and keeps the slowest query shapes (filters with all literal values
+replaced by "?") for the admin slow query endpoint.
+
+Listener callbacks run on Motor's executor threads, so all shared state is
+guarded by a lock and the callbacks do no I/O besides logging.
+"""
+import json
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+from metrics import MONGO_COMMAND_LATENCY, MONGO_DOCS_RETURNED, MONGO_SLOW_COMMANDS
+from request_timing import record_db_call
+
+
+slow_query_logger = logging.getLogger("slow_query")
+
+# Handshake, auth and session housekeeping are not application queries
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart", "saslContinue",
+    "authenticate", "getnonce", "endSessions", "killCursors",
+}
+
+# Where each command keeps its filter
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def normalize_shape(value):
+    """Replace literal values with "?" while keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: normalize_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in value):
+            return [normalize_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+
+def command_filter(command_name, command):
+    """Extract the filter document of a command, if it has one"""
+    if command_name in FILTER_FIELDS:
+        return command.get(FILTER_FIELDS[command_name]) or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        return [stage if "$match" in stage else {next(iter(stage), "?"): "..."} for stage in pipeline]
+    if command_name == "update":
+        updates = command.get("updates") or []
+        return updates[0].get("q", {}) if updates else {}
+    if command_name == "delete":
+        deletes = command.get("deletes") or []
+        return deletes[0].get("q", {}) if deletes else {}
+    return None
+
+
+def documents_in_reply(reply):
+    """Count the documents returned (reads) or affected (writes) by a command"""
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "n" in reply:
+        return reply["n"]
+    if "values" in reply:
+        return len(reply["values"])
+    return 1 if reply.get("value") is not None else 0
+
+
+class CommandStats:
+    """Aggregated timings of one (collection, command) pair"""
+
+    __slots__ = ("count", "total_ms", "max_ms", "documents", "failures")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.documents = 0
+        self.failures = 0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "documents": self.documents,
+            "failures": self.failures,
+        }
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """Command listener collecting per-command stats and slow query shapes"""
+
+    def __init__(self, slow_threshold_ms=100.0, max_shapes=500):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stats = {}
+        self._slow_shapes = {}
+
+    # pymongo listener interface
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        if not isinstance(collection, str):
+            collection = "<db>"
+        query_filter = command_filter(event.command_name, command)
+        shape = normalize_shape(query_filter) if query_filter is not None else None
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, shape)
+
+    def succeeded(self, event):
+        self._finish(event, documents_in_reply(event.reply), failed=False)
+
+    def failed(self, event):
+        self._finish(event, 0, failed=True)
+
+    def _finish(self, event, documents, failed):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, shape = pending
+        command_name = event.command_name
+        duration_ms = event.duration_micros / 1000.0
+
+        record_db_call(duration_ms)
+        MONGO_COMMAND_LATENCY.labels(collection, command_name).observe(duration_ms / 1000.0)
+        MONGO_DOCS_RETURNED.labels(collection, command_name).inc(documents)
+
+        is_slow = duration_ms >= self.slow_threshold_ms
+        with self._lock:
+            stats = self._stats.get((collection, command_name))
+            if stats is None:
+                stats = self._stats[(collection, command_name)] = CommandStats()
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.documents += documents
+            stats.failures += int(failed)
+            if is_slow:
+                self._record_slow_shape(collection, command_name, shape, duration_ms, documents)
+
+        if is_slow:
+            MONGO_SLOW_COMMANDS.labels(collection, command_name).inc()
+            slow_query_logger.warning("slow query", extra={
+                "collection": collection,
+                "command": command_name,
+                "duration_ms": round(duration_ms, 3),
+                "documents": documents,
+                "failed": failed,
+                "shape": shape,
+            })
+
+    def _record_slow_shape(self, collection, command_name, shape, duration_ms, documents):
+        key = (collection, command_name, json.dumps(shape, sort_keys=True, default=str))
+        entry = self._slow_shapes.get(key)
+        if entry is None:
+            if len(self._slow_shapes) >= self.max_shapes:
+                # Keep the table bounded by dropping the least severe shape
+                fastest = min(self._slow_shapes, key=lambda k: self._slow_shapes[k]["max_ms"])
+                del self._slow_shapes[fastest]
+            entry = self._slow_shapes[key] = {
+                "collection": collection,
+                "command": command_name,
+                "shape": shape,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "max_documents": 0,
+                "last_seen": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["max_documents"] = max(entry["max_documents"], documents)
+        entry["last_seen"] = time.time()
+
+    # Reporting
+    def top_slow_queries(self, limit=10):
+        """Return the slowest query shapes ordered by their worst duration"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._slow_shapes.values()]
+        entries.sort(key=lambda entry: entry["max_ms"], reverse=True)
+        for entry in entries:
+            entry["avg_ms"] = round(entry.pop("total_ms") / entry["count"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+        return entries[:limit]
+
+    def command_stats(self):
+        """Return aggregated stats for every (collection, command) pair seen"""
+        with self._lock:
+            items = [(key, stats.as_dict()) for key, stats in self._stats.items()]
+        return [
+            {"collection": collection, "command": command_name, **stats}
+            for (collection, command_name), stats in sorted(items)
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_shapes.clear()
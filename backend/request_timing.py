@@ -0,0 +1,141 @@
+"""Request-scoped cost accounting surfaced as Server-Timing headers.
+
+Every HTTP request gets a RequestTiming object stored in a context variable.
+The MongoDB command listener adds each round trip to it (Motor copies the
+context into its executor threads), the auth dependency and TimedRoute add
+auth and serialization time, and ServerTimingMiddleware writes the totals into
+the response headers so they show up in the browser devtools.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+
+class RequestTiming:
+    """Accumulated costs of one request (all durations in milliseconds)"""
+
+    __slots__ = ("start", "db_calls", "db_ms", "auth_ms", "serialize_ms", "endpoint_end")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_calls = 0
+        self.db_ms = 0.0
+        self.auth_ms = 0.0
+        self.serialize_ms = 0.0
+        self.endpoint_end = None
+
+    def header_value(self):
+        total_ms = (time.perf_counter() - self.start) * 1000
+        return ", ".join([
+            f'db;dur={self.db_ms:.2f};desc="{self.db_calls} round trips"',
+            f"auth;dur={self.auth_ms:.2f}",
+            f"ser;dur={self.serialize_ms:.2f}",
+            f"total;dur={total_ms:.2f}",
+        ])
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def record_db_call(duration_ms):
+    """Account one MongoDB round trip to the current request, if any"""
+    timing = current_timing.get()
+    if timing is not None:
+        timing.db_calls += 1
+        timing.db_ms += duration_ms
+
+
+@contextmanager
+def _track(attribute):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = current_timing.get()
+        if timing is not None:
+            setattr(timing, attribute, getattr(timing, attribute) + (time.perf_counter() - start) * 1000)
+
+
+def track_auth():
+    """Account the enclosed block as authentication time"""
+    return _track("auth_ms")
+
+
+def track_serialization():
+    """Account the enclosed block as serialization time (for responses rendered
+    inside the endpoint, which TimedRoute cannot see)"""
+    return _track("serialize_ms")
+
+
+class TimedRoute(APIRoute):
+    """APIRoute measuring the time FastAPI spends validating and serializing the
+    endpoint's return value, i.e. from endpoint return until the response exists"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint_end(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timing = current_timing.get()
+            if timing is not None and timing.endpoint_end is not None:
+                timing.serialize_ms += (time.perf_counter() - timing.endpoint_end) * 1000
+            return response
+
+        return timed_handler
+
+
+def _mark_endpoint_end(endpoint):
+    # include_router() re-creates routes from the already wrapped endpoint
+    if getattr(endpoint, "__marks_endpoint_end__", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timing = current_timing.get()
+            if timing is not None:
+                timing.endpoint_end = time.perf_counter()
+
+    wrapper.__marks_endpoint_end__ = True
+    return wrapper
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding Server-Timing (and optionally X-DB-Roundtrips) headers"""
+
+    def __init__(self, app, roundtrips_header=False, timing_allow_origin="*"):
+        self.app = app
+        self.roundtrips_header = roundtrips_header
+        self.timing_allow_origin = timing_allow_origin
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timing.header_value())
+                headers.append("Timing-Allow-Origin", self.timing_allow_origin)
+                if self.roundtrips_header:
+                    headers.append("X-DB-Roundtrips", str(timing.db_calls))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timing.reset(token)
@@ -1,9 +1,13 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Depends, status
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Depends, Request, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import UpdateOne
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
@@ -14,32 +18,98 @@ from enum import Enum
 import csv
 import io
 import base64
+import time
+import re
 import jwt
 from passlib.context import CryptContext
 from passlib.hash import bcrypt
 
+from cache import ALL_TAGS, RAW, Cache, MemoryCacheBackend, RedisCacheBackend
+from cache_bus import InvalidationBus
+from compression import CompressedBodyCache, CompressionMiddleware
+from health import CachedProbe, PoolMonitor, executor_queue_depth, measure_loop_lag
+from inventory_engine import PROJECTION as INVENTORY_FIELDS, InventoryEngine
+from logging_config import RowSampler, configure_logging
+from loop_monitor import LoopMonitor
+from memory_inspector import GROUP_BY, MemoryInspector, gc_summary, largest_object_types, rss_bytes
+from metrics import (
+    ARCHIVES_CREATED,
+    CACHE_BACKEND_ERRORS,
+    CAR_STATUS_CHANGES,
+    CARS_IMPORTED,
+    CARS_UPDATED_BY_IMPORT,
+    PrometheusMiddleware,
+    render_metrics,
+)
+import mongo_codecs
+from mongo_codecs import (
+    DATE_FIELDS,
+    DATETIME_FIELDS,
+    ID_FIELDS,
+    client_codec_options,
+    decode_document,
+    decode_trusted,
+    encode_document,
+    id_query,
+    legacy_date_updates,
+    legacy_id_updates,
+)
+import period_stats
+from profiler import MAX_PROFILE_SECONDS, ProfilingMiddleware, RequestProfileSession, SamplingProfiler
+from period_stats import PeriodStatsDelta
+from query_monitor import QueryMonitor
+from request_timing import ServerTimingMiddleware, TimedRoute, track_auth, track_serialization
+from settings import Settings
+from singleflight import SingleFlight, normalized_key
+from suggest_index import SuggestIndex
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+logger = logging.getLogger(__name__)
 
-# Create the main app without a prefix
-app = FastAPI()
+# Resources of the app. The route handlers below use these module globals,
+# so the module serves one app at a time: create_app() sets settings and the
+# per-app helpers (replacing those of an earlier app), the lifespan opens and
+# closes the MongoDB client.
+settings = Settings.from_env()
+query_monitor = QueryMonitor(slow_threshold_ms=settings.slow_query_ms)
+pool_monitor = PoolMonitor()
+compressed_body_cache = None
+cache_backend = None
+listings_cache = None
+facets_cache = None
+stats_cache = None
+auth_cache = None
+archives_cache = None
+invalidation_bus = None
+inventory_engine = None
+suggest_index = None
+client = None
+db = None
+# The app whose lifespan is running; no other app may start or be created meanwhile
+running_app = None
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+# Routes served at the root, not under /api
+root_router = APIRouter()
 
 # Security setup
 security = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
+# Upper bound for the limit parameter of paginated endpoints
+MAX_PAGE_SIZE = 240
+
+# Identical dashboard reads arriving together share one query (the caches
+# coalesce their own misses; this covers uncached strict-mode listings)
+cars_flight = SingleFlight("get_cars")
+
 
 # Define Enums
 class CarStatus(str, Enum):
@@ -57,6 +127,11 @@ class ArchiveStatus(str, Enum):
     archived = "archived"
 
 
+class SuggestField(str, Enum):
+    make = "make"
+    model = "model"
+
+
 # Archive Models
 class MonthlyArchive(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -77,6 +152,24 @@ class ArchiveCreate(BaseModel):
     year: int
 
 
+# Vehicle history models (one entry per VIN per archive)
+class VehicleHistoryEntry(BaseModel):
+    vin: str
+    archive_id: str
+    archive_name: str
+    month: int
+    year: int
+    status: CarStatus
+    car_id: Optional[str] = None
+    archived_at: datetime
+
+
+class VehicleHistory(BaseModel):
+    vin: str
+    last_verified_present: Optional[VehicleHistoryEntry] = None
+    entries: List[VehicleHistoryEntry]
+
+
 # Authentication Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -128,7 +221,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -138,19 +231,26 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    with track_auth():
+        try:
+            payload = jwt.decode(credentials.credentials, settings.jwt_secret_key, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = {"username": username}
+        except jwt.PyJWTError:
             raise credentials_exception
-        token_data = {"username": username}
-    except jwt.PyJWTError:
-        raise credentials_exception
-    
-    user = await db.users.find_one({"username": token_data["username"]})
-    if user is None:
-        raise credentials_exception
-    return User(**user)
+        
+        user = await auth_cache.get_or_load(token_data["username"], lambda: load_user(token_data["username"]))
+        if user is None:
+            raise credentials_exception
+        return User(**user, password_hash="")
+
+
+async def load_user(username):
+    """A user for the auth cache; the password hash is left out, requests never need it"""
+    user = await db.users.find_one({"username": username}, {"_id": 0, "password_hash": 0})
+    return parse_from_mongo(user)
 
 
 async def get_current_admin_user(current_user: User = Depends(get_current_user)):
@@ -219,23 +319,93 @@ class CSVImportResult(BaseModel):
 
 # Helper functions
 def prepare_for_mongo(data):
-    """Convert datetime objects to ISO strings for MongoDB storage"""
+    """Convert API values to native BSON types for MongoDB storage (dates, Binary UUID ids)"""
     if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
+        encode_document(data)
     return data
 
 
 def parse_from_mongo(item):
-    """Parse datetime strings back from MongoDB"""
+    """Convert stored values back to their API types"""
     if isinstance(item, dict):
-        for key, value in item.items():
-            if key in ['created_at', 'updated_at'] and isinstance(value, str):
-                item[key] = datetime.fromisoformat(value)
+        decode_document(item)
     return item
 
 
+def trusted_payload(model, doc):
+    """Fill model defaults into a document from our own collections without re-validating it"""
+    return model.model_construct(**decode_trusted(doc)).__dict__
+
+
+def orjson_response(content):
+    """Serialize a response directly with orjson, bypassing response_model validation"""
+    with track_serialization():
+        return ORJSONResponse(content)
+
+
+def normalize_vin(vin):
+    """Normalize a VIN for index storage and lookup"""
+    return vin.strip().upper() if vin else None
+
+
+def build_vehicle_history_entries(archive):
+    """Build vehicle_history index documents for all cars with a VIN in an archive"""
+    entries = []
+    for car in archive.get("cars_data") or []:
+        vin = normalize_vin(car.get("vin"))
+        if not vin:
+            continue
+        entries.append({
+            "vin": vin,
+            "archive_id": archive["id"],
+            "archive_name": archive["archive_name"],
+            "month": archive["month"],
+            "year": archive["year"],
+            "status": car.get("status", CarStatus.absent),
+            "car_id": car.get("id"),
+            "archived_at": archive["archived_at"]
+        })
+    return entries
+
+
+async def ensure_indexes():
+    """Create indexes required by the query paths"""
+    await db.vehicle_history.create_index(
+        [("vin", 1), ("year", -1), ("month", -1)], name="vin_period"
+    )
+    await db.vehicle_history.create_index("archive_id", name="archive_id")
+    # Single-document lookups by (Binary UUID) id
+    await db.cars.create_index("id", name="id", unique=True)
+    await db.users.create_index("id", name="id", unique=True)
+    await db.monthly_archives.create_index("id", name="id", unique=True)
+    # One counter document per period; also serves the newest-first sort
+    await db.period_stats.create_index(
+        [("year", -1), ("month", -1), ("is_consignment", 1)], name="period", unique=True
+    )
+    # Aging and recency queries on native BSON dates
+    await db.cars.create_index([("archive_status", 1), ("purchase_date", 1)], name="active_purchase_date")
+    await db.cars.create_index([("updated_at", -1)], name="updated_at")
+    await db.monthly_archives.create_index([("archived_at", -1)], name="archived_at")
+
+
+async def rebuild_vehicle_history():
+    """Backfill the VIN history index from existing archives if it is empty"""
+    if await db.vehicle_history.estimated_document_count() > 0:
+        return
+    
+    rebuilt = 0
+    projection = {"_id": 0, "id": 1, "archive_name": 1, "month": 1, "year": 1,
+                  "archived_at": 1, "cars_data.id": 1, "cars_data.vin": 1, "cars_data.status": 1}
+    async for archive in db.monthly_archives.find({}, projection):
+        entries = build_vehicle_history_entries(archive)
+        if entries:
+            await db.vehicle_history.insert_many(entries, ordered=False)
+            rebuilt += len(entries)
+    
+    if rebuilt:
+        logger.info("Vehicle history index rebuilt", extra={"entries": rebuilt})
+
+
 # Authentication routes
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_credentials: UserLogin):
@@ -257,7 +427,7 @@ async def login(user_credentials: UserLogin):
         "access_token": access_token,
         "token_type": "bearer",
         "user": {
-            "id": user["id"],
+            "id": str(user["id"]),
             "username": user["username"],
             "role": user["role"]
         }
@@ -286,6 +456,7 @@ async def create_user(user_data: UserCreate, current_admin: User = Depends(get_c
     
     user_mongo = prepare_for_mongo(new_user.dict())
     await db.users.insert_one(user_mongo)
+    await invalidate_caches("users")
     
     return UserResponse(
         id=new_user.id,
@@ -312,9 +483,10 @@ async def delete_user(user_id: str, current_admin: User = Depends(get_current_ad
             detail="Cannot delete your own account"
         )
     
-    result = await db.users.delete_one({"id": user_id})
+    result = await db.users.delete_one({"id": id_query(user_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await invalidate_caches("users")
     
     return {"message": "User deleted successfully"}
 
@@ -343,8 +515,9 @@ async def create_default_admin():
         )
         user_mongo = prepare_for_mongo(default_admin.dict())
         await db.users.insert_one(user_mongo)
-        print("✅ Default admin user created: username='admin', password='admin123'")
-        print("⚠️  Please change the default password after first login!")
+        await invalidate_caches("users")
+        logger.warning("Default admin user created: username='admin', password='admin123'. "
+                       "Please change the default password after first login!")
 
 
 async def cleanup_old_archives():
@@ -363,18 +536,174 @@ async def cleanup_old_archives():
                 "archived_at": {"$lt": six_months_ago}
             })
             
-            print(f"🗑️  Automatic cleanup: Deleted {result.deleted_count} archives older than 6 months")
+            await db.vehicle_history.delete_many({
+                "archive_id": {"$in": [archive["id"] for archive in old_archives]}
+            })
+            await invalidate_caches("archives")
             
-            # Log the deleted archives
-            for archive in old_archives:
-                archive_date = archive.get('archived_at', 'Unknown')
-                archive_name = archive.get('archive_name', 'Unknown')
-                print(f"   - Deleted: {archive_name} (archived: {archive_date})")
+            logger.info(
+                "Automatic cleanup: deleted archives older than 6 months",
+                extra={
+                    "deleted_count": result.deleted_count,
+                    "archives": [
+                        {"name": archive.get('archive_name', 'Unknown'), "archived_at": archive.get('archived_at', 'Unknown')}
+                        for archive in old_archives
+                    ]
+                }
+            )
         else:
-            print("✅ Archive cleanup: No archives older than 6 months found")
+            logger.info("Archive cleanup: no archives older than 6 months found")
             
-    except Exception as e:
-        print(f"❌ Error during archive cleanup: {str(e)}")
+    except Exception:
+        logger.exception("Error during archive cleanup")
+
+
+async def migrate_documents(migration_id, fields, legacy_updates):
+    """Rewrite documents that still store strings in the given fields.
+    
+    Returns True once the migration has completed (now or in an earlier run).
+    """
+    if await db.migrations.find_one({"_id": migration_id}):
+        return True
+    
+    try:
+        converted = 0
+        string_values = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        for collection in (db.cars, db.users, db.monthly_archives, db.vehicle_history):
+            batch = []
+            async for doc in collection.find(string_values):
+                updates = legacy_updates(doc)
+                if doc.get("cars_data"):
+                    updates["cars_data"] = [{**car, **legacy_updates(car)} for car in doc["cars_data"]]
+                if updates:
+                    batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": updates}))
+                if len(batch) >= 500:
+                    await collection.bulk_write(batch, ordered=False)
+                    converted += len(batch)
+                    batch = []
+            if batch:
+                await collection.bulk_write(batch, ordered=False)
+                converted += len(batch)
+        
+        await db.migrations.insert_one({
+            "_id": migration_id,
+            "completed_at": datetime.now(timezone.utc),
+            "converted_documents": converted
+        })
+        logger.info("Migration complete", extra={"migration": migration_id, "converted_documents": converted})
+        return True
+    except Exception:
+        logger.exception("Error during migration", extra={"migration": migration_id})
+        return False
+
+
+async def run_migrations():
+    """Convert legacy string dates and ids to native BSON types"""
+    await migrate_documents("native_dates", (*DATETIME_FIELDS, *DATE_FIELDS), legacy_date_updates)
+    if await migrate_documents("binary_uuids", ID_FIELDS, legacy_id_updates):
+        # No string ids left, so id lookups no longer need to match both forms
+        mongo_codecs.legacy_string_ids = False
+
+
+# Background maintenance tasks (references are kept so they are not garbage collected)
+background_tasks = set()
+
+
+async def run_maintenance_step(step):
+    try:
+        await step()
+    except Exception:
+        logger.exception("Error during startup maintenance", extra={"step": step.__name__})
+
+
+async def run_startup_maintenance():
+    """Slow startup work, run in the background so the app serves immediately"""
+    started = time.perf_counter()
+    await run_maintenance_step(create_default_admin)
+    await run_maintenance_step(ensure_indexes)
+    # Stats and available months count the cars collection until this ran
+    await run_maintenance_step(build_period_stats)
+    await run_maintenance_step(cleanup_old_archives)
+    await run_maintenance_step(rebuild_vehicle_history)
+    await run_maintenance_step(run_migrations)
+    logger.info("Startup maintenance complete",
+                extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+    await reconcile_period_stats_periodically(settings.period_stats_reconcile_minutes * 60)
+
+
+async def reconcile_period_stats():
+    """Repair drift between the period_stats counters and the cars collection"""
+    try:
+        corrected = await period_stats.reconcile(db)
+        if corrected:
+            logger.warning("Period stats reconciled", extra={"corrected_documents": corrected})
+            await invalidate_caches("cars")
+        return corrected
+    except Exception:
+        logger.exception("Error during period stats reconciliation")
+        return None
+
+
+async def build_period_stats():
+    """Build the period counters unless an earlier run did; until then reads count the cars"""
+    written = await period_stats.build(db)
+    if written:
+        logger.info("Period stats built", extra={"documents": written})
+
+
+async def reconcile_period_stats_periodically(interval_seconds):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await reconcile_period_stats()
+
+
+async def invalidate_caches(*tags, changes=None):
+    """Invalidate the cached data with these tags in every worker.
+    
+    changes travel with the events, for the in-process copies of other workers.
+    """
+    try:
+        await cache_backend.invalidate(*tags)
+    except Exception:
+        # Entries of the tags stay readable until their TTL expires
+        CACHE_BACKEND_ERRORS.labels("invalidate").inc()
+        logger.exception("Could not invalidate caches", extra={"tags": tags})
+    if invalidation_bus is not None:
+        for tag in tags:
+            try:
+                await invalidation_bus.publish(tag, changes)
+            except Exception:
+                # Other workers stop trusting their caches once heartbeats fail too
+                CACHE_BACKEND_ERRORS.labels("publish").inc()
+                logger.warning("Could not publish cache invalidation", exc_info=True, extra={"tag": tag})
+
+
+async def cars_changed(changes=None):
+    """Call after every car write, with its [(old, new)] documents (None for bulk writes)"""
+    for local_copy in (inventory_engine, suggest_index):
+        if local_copy is None:
+            continue
+        if changes is None:
+            local_copy.mark_stale()
+        else:
+            for old, new in changes:
+                local_copy.apply(old, new)
+    if changes is not None:
+        # Other workers apply these like their own writes instead of reloading
+        changes = [(indexed_fields(old), indexed_fields(new)) for old, new in changes]
+    await invalidate_caches("cars", changes=changes)
+
+
+def indexed_fields(car):
+    """The fields of a car document the in-process copies use (photos stay out of the events)"""
+    return None if car is None else {field: car.get(field) for field in INVENTORY_FIELDS}
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 
 # API Routes
@@ -401,6 +730,7 @@ async def create_default_admin_force():
     user_mongo = prepare_for_mongo(default_admin.dict())
     try:
         await db.users.insert_one(user_mongo)
+        await invalidate_caches("users")
         return {"message": "Default admin user created successfully"}
     except Exception as e:
         return {"message": f"Error creating admin: {str(e)}"}
@@ -414,6 +744,8 @@ async def create_car(car_data: CarCreate, current_user: User = Depends(get_curre
     car_mongo = prepare_for_mongo(car.dict())
     
     await db.cars.insert_one(car_mongo)
+    await period_stats.record_change(db, None, car_mongo)
+    await cars_changed([(None, car_mongo)])
     return car
 
 
@@ -423,6 +755,8 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
+    import_started = time.perf_counter()
+    stats_delta = PeriodStatsDelta()  # Applied once for the whole file
     try:
         content = await file.read()
         
@@ -443,9 +777,8 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
         # Remove any remaining BOM characters
         csv_data = csv_data.replace('\ufeff', '')
         
-        # Debug logging
-        print(f"CSV file received: {file.filename}, size: {len(content)} bytes")
-        print(f"CSV content preview: {repr(csv_data[:100])}...")
+        logger.debug("CSV file received", extra={"csv_filename": file.filename, "size_bytes": len(content),
+                                                 "preview": csv_data[:100]})
         
         csv_reader = csv.DictReader(io.StringIO(csv_data))
         
@@ -460,11 +793,14 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
                 cleaned_fieldnames.append(cleaned_field)
             
             csv_reader.fieldnames = cleaned_fieldnames
-            print(f"CSV fieldnames after cleaning: {csv_reader.fieldnames}")
+            logger.debug("CSV fieldnames after cleaning", extra={"fieldnames": csv_reader.fieldnames})
         
         imported_count = 0
         updated_count = 0
         errors = []
+        row_count = 0
+        # Per-row detail is DEBUG-only and sampled
+        sample_row = RowSampler(logger, every=settings.log_row_sample_every)
         
         # Check if CSV has required headers
         expected_headers = {'make', 'model', 'number', 'purchase_date'}
@@ -476,6 +812,8 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
             )
         
         for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 for header row
+            row_count += 1
+            log_row = sample_row()
             try:
                 # Clean and validate required fields
                 make = row.get('make', '').strip()
@@ -483,12 +821,11 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
                 number_str = row.get('number', '').strip()
                 purchase_date_str = row.get('purchase_date', '').strip()
                 
-                print(f"Processing row {row_num}: make={make}, model={model}, number={number_str}, purchase_date={purchase_date_str}")
-                
                 if not all([make, model, number_str]):
                     error_msg = f"Row {row_num}: Missing required fields (make={bool(make)}, model={bool(model)}, number={bool(number_str)})"
                     errors.append(error_msg)
-                    print(f"Error: {error_msg}")
+                    if log_row:
+                        logger.debug(error_msg)
                     continue
                 
                 # Validate purchase_date format if provided (should be YYYY-MM-DD)
@@ -513,7 +850,8 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
                         except ValueError:
                             error_msg = f"Row {row_num}: Invalid purchase_date format. Use YYYY-MM-DD, DD.MM.YYYY, or DD/MM/YYYY"
                             errors.append(error_msg)
-                            print(f"Error: {error_msg}")
+                            if log_row:
+                                logger.debug(error_msg)
                             continue
                 
                 # Create car object
@@ -527,7 +865,8 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
                     'status': CarStatus.absent  # All imported cars start as absent
                 }
                 
-                print(f"Creating car with data: {car_data}")
+                if log_row:
+                    logger.debug("Processing CSV row", extra={"row": row_num, "car_data": car_data})
                 
                 # Check for duplicate VIN if VIN is provided - UPDATE existing or CREATE new
                 if car_data['vin']:
@@ -545,23 +884,28 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
                         update_data["archive_status"] = "active"  # Ensure updated cars are active
                         
                         update_mongo = prepare_for_mongo(update_data)
-                        await db.cars.update_one({"vin": car_data['vin']}, {"$set": update_mongo})
+                        await db.cars.update_one({"_id": existing_car["_id"]}, {"$set": update_mongo})
+                        stats_delta.change(existing_car, {**existing_car, **update_mongo})
                         updated_count += 1
-                        print(f"Successfully updated existing car: {make} {model} (VIN: {car_data['vin']}) - set to current month/year and active status")
+                        if log_row:
+                            logger.debug("Updated existing car from CSV", extra={"row": row_num, "vin": car_data['vin']})
                         continue
                 
                 # Create new car if no duplicate VIN found
                 car = Car(**car_data)
                 car_mongo = prepare_for_mongo(car.dict())
                 await db.cars.insert_one(car_mongo)
+                stats_delta.add(car_mongo)
                 imported_count += 1
                 
-                print(f"Successfully imported new car: {make} {model}")
+                if log_row:
+                    logger.debug("Imported new car from CSV", extra={"row": row_num, "car_id": car.id})
                 
             except Exception as e:
                 error_msg = f"Row {row_num}: {str(e)}"
                 errors.append(error_msg)
-                print(f"Exception: {error_msg}")
+                if log_row:
+                    logger.debug(error_msg, exc_info=True)
         
         result = CSVImportResult(
             success=True,
@@ -571,29 +915,37 @@ async def import_cars_from_csv(file: UploadFile = File(...), current_user: User
             message=f"Successfully processed {imported_count + updated_count} cars ({imported_count} new, {updated_count} updated)"
         )
         
-        print(f"Import complete: {imported_count} cars imported, {updated_count} cars updated, {len(errors)} errors")
+        CARS_IMPORTED.inc(imported_count)
+        CARS_UPDATED_BY_IMPORT.inc(updated_count)
+        logger.info(
+            "CSV import complete",
+            extra={
+                "csv_filename": file.filename,
+                "size_bytes": len(content),
+                "rows": row_count,
+                "imported_count": imported_count,
+                "updated_count": updated_count,
+                "error_count": len(errors),
+                "duration_ms": round((time.perf_counter() - import_started) * 1000, 1)
+            }
+        )
         return result
         
     except HTTPException:
         raise
     except Exception as e:
         error_msg = f"Error processing CSV: {str(e)}"
-        print(f"Fatal error: {error_msg}")
+        logger.exception("CSV import failed", extra={"csv_filename": file.filename})
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        # Also account the rows written before a failure
+        await stats_delta.apply(db)
+        await cars_changed()
 
 
-@api_router.get("/cars", response_model=List[Car])
-async def get_cars(
-    make: Optional[str] = None,
-    model: Optional[str] = None,
-    status: Optional[CarStatus] = None,
-    search: Optional[str] = None,
-    month: Optional[int] = None,
-    year: Optional[int] = None,
-    is_consignment: Optional[bool] = None,
-    current_user: User = Depends(get_current_user)
-):
-    """Get all active cars with optional filtering"""
+def car_filter_query(make=None, model=None, status=None, search=None, month=None, year=None,
+                     is_consignment=None):
+    """MongoDB query for the filters of the car list"""
     query = {"archive_status": "active"}  # Only show active cars by default
     
     # Add month/year filter if provided
@@ -618,42 +970,146 @@ async def get_cars(
             {"vin": {"$regex": search, "$options": "i"}},
             {"number": {"$regex": search, "$options": "i"}}
         ]
+    return query
+
+
+@api_router.get("/cars", response_model=List[Car])
+async def get_cars(
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    status: Optional[CarStatus] = None,
+    search: Optional[str] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    is_consignment: Optional[bool] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get all active cars with optional filtering"""
+    query = car_filter_query(make, model, status, search, month, year, is_consignment)
     
-    cars = await db.cars.find(query).to_list(1000)
-    return [Car(**parse_from_mongo(car)) for car in cars]
+    async def find_cars():
+        if inventory_engine is not None and (make or model or search) and inventory_engine.usable():
+            # Regex filters scan the whole collection in MongoDB; the engine
+            # resolves them to _ids, so only the matching documents are read
+            ids = inventory_engine.select(month=month, year=year, make=make, model=model, status=status,
+                                          is_consignment=is_consignment, search=search)
+            if ids is not None:
+                if not ids:
+                    return []
+                return await db.cars.find(
+                    {"_id": {"$in": ids}, "archive_status": "active"}, {"_id": 0}
+                ).to_list(1000)
+        return await db.cars.find(query, {"_id": 0}).to_list(1000)
+    
+    async def load_cars():
+        cars = await find_cars()
+        if settings.strict_response_validation:
+            return [Car(**parse_from_mongo(car)) for car in cars]
+        # Rendered once; coalesced requests send the same bytes
+        return orjson_response([trusted_payload(Car, car) for car in cars]).body
+    
+    if settings.strict_response_validation:
+        return await cars_flight.do(normalized_key(query), load_cars)
+    body = await listings_cache.get_or_load(normalized_key(query), load_cars)
+    return Response(content=body, media_type="application/json")
 
 
-@api_router.get("/cars/available-months")
-async def get_available_months(current_user: User = Depends(get_current_user)):
-    """Get available months with active cars"""
-    pipeline = [
-        {"$match": {"archive_status": "active"}},
-        {"$group": {
-            "_id": {
-                "month": "$current_month",
-                "year": "$current_year"
-            },
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id.year": -1, "_id.month": -1}}
-    ]
+def facet_counts(group, sort, limit=None):
+    pipeline = [{"$group": {"_id": group, "count": {"$sum": 1}}}, {"$sort": sort}]
+    if limit is not None:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+
+@api_router.get("/cars/facets")
+async def get_car_facets(
+    make: Optional[str] = None,
+    model: Optional[str] = None,
+    status: Optional[CarStatus] = None,
+    search: Optional[str] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    is_consignment: Optional[bool] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user)
+):
+    """Counts of the active cars matching the filters, per make, model, status, consignment and period.
     
-    result = await db.cars.aggregate(pipeline).to_list(12)
+    Takes the same filters as GET /cars; limit caps the make and model lists (most cars first).
+    """
+    query = car_filter_query(make, model, status, search, month, year, is_consignment)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
     
-    return [
-        {
-            "month": item["_id"]["month"],
-            "year": item["_id"]["year"],
-            "car_count": item["count"],
-            "month_name": [
-                "Januar", "Februar", "März", "April", "Mai", "Juni",
-                "Juli", "August", "September", "Oktober", "November", "Dezember"
-            ][item["_id"]["month"] - 1]
+    async def load_facets():
+        # Counts per value of each filter, in one aggregation
+        pipeline = [
+            {"$match": query},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "make": facet_counts("$make", {"count": -1, "_id": 1}, limit),
+                "model": facet_counts({"make": "$make", "model": "$model"}, {"count": -1, "_id": 1}, limit),
+                "status": facet_counts("$status", {"count": -1, "_id": 1}),
+                "is_consignment": facet_counts("$is_consignment", {"count": -1, "_id": 1}),
+                "period": facet_counts({"year": "$current_year", "month": "$current_month"},
+                                       {"_id.year": -1, "_id.month": -1}),
+            }},
+        ]
+        result = (await db.cars.aggregate(pipeline).to_list(1))[0]
+        facets = {
+            "total": result["total"][0]["count"] if result["total"] else 0,
+            "make": [{"value": row["_id"], "count": row["count"]} for row in result["make"]],
+            "model": [{**row["_id"], "count": row["count"]} for row in result["model"]],
+            "status": [{"value": row["_id"], "count": row["count"]} for row in result["status"]],
+            "is_consignment": [{"value": row["_id"], "count": row["count"]} for row in result["is_consignment"]],
+            "period": [{**row["_id"], "count": row["count"]} for row in result["period"]],
         }
-        for item in result
+        return orjson_response(facets).body
+    
+    # Cached until the next car write (the "cars" tag version is the collection revision)
+    body = await facets_cache.get_or_load(normalized_key(query, limit), load_facets)
+    return Response(content=body, media_type="application/json")
+
+
+@api_router.get("/cars/suggest")
+async def suggest_car_values(
+    field: SuggestField,
+    prefix: str = "",
+    make: Optional[str] = None,
+    limit: int = 10,
+    current_user: User = Depends(get_current_user)
+):
+    """Autocomplete for the make and model inputs: known values starting with prefix, most used first.
+    
+    With field=model, make restricts the suggestions to that make's models.
+    """
+    if not suggest_index.loaded.is_set():
+        # The index is being built for the first time
+        try:
+            await asyncio.wait_for(suggest_index.loaded.wait(), settings.suggest_index_wait_seconds)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Suggestions are not available yet")
+    limit = min(max(limit, 1), 50)
+    return [
+        {"value": value, "count": count}
+        for value, count in suggest_index.suggest(field.value, prefix, make=make, limit=limit)
     ]
 
 
+@api_router.get("/cars/available-months")
+async def get_available_months(
+    response: Response,
+    limit: int = 12,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user)
+):
+    """Get available months with active cars, newest first (paginated)"""
+    periods = await period_stats.period_index.get(db)
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    response.headers["X-Total-Count"] = str(len(periods))
+    return list(periods[offset:offset + limit])
+
+
 @api_router.get("/cars/stats/summary")
 async def get_inventory_stats(
     month: Optional[int] = None,
@@ -662,28 +1118,25 @@ async def get_inventory_stats(
 ):
     """Get inventory summary statistics"""
     current_date = datetime.now(timezone.utc)
-    query = {"archive_status": "active"}
     
-    # Add month/year filter if provided
-    if month:
-        query["current_month"] = month
-    if year:
-        query["current_year"] = year
-    
-    # Total cars (all active cars)
-    total_cars = await db.cars.count_documents(query)
+    # Counters of the active cars in the matching periods (maintained on every car write)
+    counts = await stats_cache.get_or_load(
+        normalized_key(month or None, year or None),
+        lambda: load_inventory_counts(month, year)
+    )
     
     # Regular cars (non-consignment)
-    regular_query = {**query, "is_consignment": {"$ne": True}}
-    regular_total = await db.cars.count_documents(regular_query)
-    regular_present = await db.cars.count_documents({**regular_query, "status": "present"})
-    regular_absent = await db.cars.count_documents({**regular_query, "status": "absent"})
+    regular_total = counts["regular"]["total"]
+    regular_present = counts["regular"]["present"]
+    regular_absent = counts["regular"]["absent"]
     
     # Consignment cars
-    consignment_query = {**query, "is_consignment": True}
-    consignment_total = await db.cars.count_documents(consignment_query)
-    consignment_present = await db.cars.count_documents({**consignment_query, "status": "present"})
-    consignment_absent = await db.cars.count_documents({**consignment_query, "status": "absent"})
+    consignment_total = counts["consignment"]["total"]
+    consignment_present = counts["consignment"]["present"]
+    consignment_absent = counts["consignment"]["absent"]
+    
+    # Total cars (all active cars)
+    total_cars = regular_total + consignment_total
     
     return {
         "total_cars": total_cars,
@@ -700,10 +1153,17 @@ async def get_inventory_stats(
     }
 
 
+async def load_inventory_counts(month, year):
+    if inventory_engine is not None and inventory_engine.usable():
+        return inventory_engine.counts(month=month, year=year)
+    counts = await period_stats.read_counts(db, month=month, year=year)
+    return {"regular": counts[False], "consignment": counts[True]}
+
+
 @api_router.get("/cars/{car_id}", response_model=Car)
 async def get_car(car_id: str, current_user: User = Depends(get_current_user)):
     """Get a specific car by ID"""
-    car = await db.cars.find_one({"id": car_id})
+    car = await db.cars.find_one({"id": id_query(car_id)})
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     return Car(**parse_from_mongo(car))
@@ -712,7 +1172,7 @@ async def get_car(car_id: str, current_user: User = Depends(get_current_user)):
 @api_router.put("/cars/{car_id}", response_model=Car)
 async def update_car(car_id: str, car_update: CarUpdate, current_user: User = Depends(get_current_user)):
     """Update a car's information"""
-    car = await db.cars.find_one({"id": car_id})
+    car = await db.cars.find_one({"id": id_query(car_id)})
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
@@ -720,16 +1180,18 @@ async def update_car(car_id: str, car_update: CarUpdate, current_user: User = De
     update_data["updated_at"] = datetime.now(timezone.utc)
     
     update_mongo = prepare_for_mongo(update_data)
-    await db.cars.update_one({"id": car_id}, {"$set": update_mongo})
+    await db.cars.update_one({"_id": car["_id"]}, {"$set": update_mongo})
     
-    updated_car = await db.cars.find_one({"id": car_id})
+    updated_car = await db.cars.find_one({"_id": car["_id"]})
+    await period_stats.record_change(db, car, updated_car)
+    await cars_changed([(car, updated_car)])
     return Car(**parse_from_mongo(updated_car))
 
 
 @api_router.patch("/cars/{car_id}/status", response_model=Car)
 async def update_car_status(car_id: str, status_update: StatusUpdate, current_user: User = Depends(get_current_user)):
     """Update a car's presence status with photo verification"""
-    car = await db.cars.find_one({"id": car_id})
+    car = await db.cars.find_one({"id": id_query(car_id)})
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
@@ -758,18 +1220,30 @@ async def update_car_status(car_id: str, status_update: StatusUpdate, current_us
         update_data["vin_photo"] = None
     
     update_mongo = prepare_for_mongo(update_data)
-    await db.cars.update_one({"id": car_id}, {"$set": update_mongo})
+    await db.cars.update_one({"_id": car["_id"]}, {"$set": update_mongo})
+    
+    previous_status = car.get("status", CarStatus.absent)
+    if previous_status != status_update.status:
+        CAR_STATUS_CHANGES.labels(previous_status, status_update.status.value).inc()
     
-    updated_car = await db.cars.find_one({"id": car_id})
+    updated_car = await db.cars.find_one({"_id": car["_id"]})
+    await period_stats.record_change(db, car, updated_car)
+    await cars_changed([(car, updated_car)])
     return Car(**parse_from_mongo(updated_car))
 
 
 @api_router.delete("/cars/{car_id}")
 async def delete_car(car_id: str, current_admin: User = Depends(get_current_admin_user)):
     """Delete a car from inventory (admin only)"""
-    result = await db.cars.delete_one({"id": car_id})
-    if result.deleted_count == 0:
+    deleted_car = await db.cars.find_one_and_delete(
+        {"id": id_query(car_id)},
+        {"archive_status": 1, "current_month": 1, "current_year": 1, "is_consignment": 1, "status": 1,
+         "make": 1, "model": 1}
+    )
+    if deleted_car is None:
         raise HTTPException(status_code=404, detail="Car not found")
+    await period_stats.record_change(db, deleted_car, None)
+    await cars_changed([(deleted_car, None)])
     return {"message": "Car deleted successfully"}
 
 
@@ -777,6 +1251,8 @@ async def delete_car(car_id: str, current_admin: User = Depends(get_current_admi
 async def delete_all_cars(current_admin: User = Depends(get_current_admin_user)):
     """Delete all active cars from inventory (admin only)"""
     result = await db.cars.delete_many({"archive_status": "active"})
+    await period_stats.reset(db)
+    await cars_changed()
     return {
         "message": f"All active cars deleted successfully",
         "deleted_count": result.deleted_count
@@ -784,6 +1260,9 @@ async def delete_all_cars(current_admin: User = Depends(get_current_admin_user))
 
 
 # Archive endpoints
+ARCHIVE_PROJECTION = {"_id": 0, "cars_data._id": 0}
+
+
 @api_router.post("/archives/create-monthly", response_model=MonthlyArchive)
 async def create_monthly_archive(
     archive_data: ArchiveCreate,
@@ -833,68 +1312,90 @@ async def create_monthly_archive(
     archive_mongo = prepare_for_mongo(archive.dict())
     await db.monthly_archives.insert_one(archive_mongo)
     
+    # Index every archived VIN for cross-archive lookups
+    history_entries = build_vehicle_history_entries(archive_mongo)
+    if history_entries:
+        await db.vehicle_history.insert_many(history_entries, ordered=False)
+    
     # Mark cars as archived
     await db.cars.update_many(query, {
         "$set": {
             "archive_status": "archived",
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc)
         }
     })
+    await period_stats.reset(db, month=archive_data.month, year=archive_data.year)
+    await cars_changed()
+    await invalidate_caches("archives")
     
+    ARCHIVES_CREATED.inc()
+    for car in archive.cars_data:
+        decode_trusted(car)
     return archive
 
 
 @api_router.get("/archives", response_model=List[MonthlyArchive])
 async def get_monthly_archives(current_user: User = Depends(get_current_user)):
     """Get all monthly archives (last 6 months)"""
-    archives = await db.monthly_archives.find().sort("archived_at", -1).limit(6).to_list(6)
+    async def load_archives():
+        # Let MongoDB strip the ObjectId fields, including those inside cars_data
+        return await db.monthly_archives.find(
+            {}, ARCHIVE_PROJECTION
+        ).sort("archived_at", -1).limit(6).to_list(6)
     
-    # Clean archives data to remove ObjectId fields
-    cleaned_archives = []
-    for archive in archives:
-        # Remove MongoDB ObjectId
-        cleaned_archive = {k: v for k, v in archive.items() if k != '_id'}
-        
-        # Clean cars_data within each archive
-        if 'cars_data' in cleaned_archive and cleaned_archive['cars_data']:
-            cleaned_cars = []
-            for car in cleaned_archive['cars_data']:
-                cleaned_car = {k: v for k, v in car.items() if k != '_id'}
-                cleaned_cars.append(cleaned_car)
-            cleaned_archive['cars_data'] = cleaned_cars
-        
-        cleaned_archives.append(MonthlyArchive(**parse_from_mongo(cleaned_archive)))
+    if settings.strict_response_validation:
+        return [MonthlyArchive(**parse_from_mongo(archive)) for archive in await load_archives()]
     
-    return cleaned_archives
+    async def render_archives():
+        archives = await load_archives()
+        return orjson_response([trusted_payload(MonthlyArchive, archive) for archive in archives]).body
+    
+    body = await archives_cache.get_or_load("latest", render_archives)
+    return Response(content=body, media_type="application/json")
 
 
 @api_router.get("/archives/{archive_id}", response_model=MonthlyArchive)
-async def get_archive_details(archive_id: str, current_user: User = Depends(get_current_user)):
+async def get_archive_details(
+    archive_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user)
+):
     """Get specific archive details with all cars"""
-    archive = await db.monthly_archives.find_one({"id": archive_id})
-    if not archive:
-        raise HTTPException(status_code=404, detail="Archive not found")
+    # Archives never change after creation, so the id is a stable validator. The
+    # ETag also lets the compression middleware reuse the compressed body.
+    etag = f'W/"archive-{archive_id}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        if await db.monthly_archives.find_one({"id": id_query(archive_id)}, {"_id": 1}):
+            return Response(status_code=304, headers=cache_headers)
     
-    # Clean archive data to remove ObjectId fields
-    cleaned_archive = {k: v for k, v in archive.items() if k != '_id'}
+    async def load_archive():
+        archive = await db.monthly_archives.find_one({"id": id_query(archive_id)}, ARCHIVE_PROJECTION)
+        if not archive:
+            raise HTTPException(status_code=404, detail="Archive not found")
+        return archive
     
-    # Clean cars_data within the archive
-    if 'cars_data' in cleaned_archive and cleaned_archive['cars_data']:
-        cleaned_cars = []
-        for car in cleaned_archive['cars_data']:
-            cleaned_car = {k: v for k, v in car.items() if k != '_id'}
-            cleaned_cars.append(cleaned_car)
-        cleaned_archive['cars_data'] = cleaned_cars
+    if settings.strict_response_validation:
+        response.headers.update(cache_headers)
+        return MonthlyArchive(**parse_from_mongo(await load_archive()))
     
-    return MonthlyArchive(**parse_from_mongo(cleaned_archive))
+    async def render_archive():
+        return orjson_response(trusted_payload(MonthlyArchive, await load_archive())).body
+    
+    body = await archives_cache.get_or_load(archive_id, render_archive)
+    return Response(content=body, media_type="application/json", headers=cache_headers)
 
 
 @api_router.delete("/archives/{archive_id}")
 async def delete_archive(archive_id: str, current_admin: User = Depends(get_current_admin_user)):
     """Delete a specific archive (admin only)"""
-    result = await db.monthly_archives.delete_one({"id": archive_id})
+    result = await db.monthly_archives.delete_one({"id": id_query(archive_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Archive not found")
+    await db.vehicle_history.delete_many({"archive_id": id_query(archive_id)})
+    await invalidate_caches("archives")
     return {"message": "Archive deleted successfully", "deleted_archive_id": archive_id}
 
 
@@ -902,66 +1403,494 @@ async def delete_archive(archive_id: str, current_admin: User = Depends(get_curr
 async def delete_all_archives(current_admin: User = Depends(get_current_admin_user)):
     """Delete all archives (admin only)"""
     result = await db.monthly_archives.delete_many({})
+    await db.vehicle_history.delete_many({})
+    await invalidate_caches("archives")
     return {
         "message": f"All archives deleted successfully",
         "deleted_count": result.deleted_count
     }
 
 
-@api_router.get("/cars/available-months")
-async def get_available_months(current_user: User = Depends(get_current_user)):
-    """Get available months with active cars"""
-    pipeline = [
-        {"$match": {"archive_status": "active"}},
-        {"$group": {
-            "_id": {
-                "month": "$current_month",
-                "year": "$current_year"
-            },
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id.year": -1, "_id.month": -1}}
-    ]
+# Vehicle history endpoints
+@api_router.get("/vehicles/{vin}/history", response_model=VehicleHistory)
+async def get_vehicle_history(vin: str, current_user: User = Depends(get_current_user)):
+    """Get the archive history of a VIN across all monthly archives"""
+    normalized_vin = normalize_vin(vin)
+    entries = await db.vehicle_history.find(
+        {"vin": normalized_vin}, {"_id": 0}
+    ).sort([("year", -1), ("month", -1)]).to_list(1000)
     
-    result = await db.cars.aggregate(pipeline).to_list(12)
+    history = [VehicleHistoryEntry(**parse_from_mongo(entry)) for entry in entries]
+    last_present = next((entry for entry in history if entry.status == CarStatus.present), None)
     
-    return [
-        {
-            "month": item["_id"]["month"],
-            "year": item["_id"]["year"],
-            "car_count": item["count"],
-            "month_name": [
-                "Januar", "Februar", "März", "April", "Mai", "Juni",
-                "Juli", "August", "September", "Oktober", "November", "Dezember"
-            ][item["_id"]["month"] - 1]
-        }
-        for item in result
-    ]
+    return VehicleHistory(vin=normalized_vin, last_verified_present=last_present, entries=history)
 
 
-# Include the router in the main app
-app.include_router(api_router)
+# Admin diagnostics endpoints
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = 10, current_admin: User = Depends(get_current_admin_user)):
+    """Get the slowest MongoDB query shapes and per-command stats (admin only)"""
+    return {
+        "threshold_ms": query_monitor.slow_threshold_ms,
+        "slow_queries": query_monitor.top_slow_queries(limit),
+        "commands": query_monitor.command_stats()
+    }
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+@api_router.post("/admin/period-stats/reconcile")
+async def reconcile_period_stats_now(current_admin: User = Depends(get_current_admin_user)):
+    """Recompute the per-period counters from the cars collection (admin only)"""
+    corrected = await reconcile_period_stats()
+    if corrected is None:
+        raise HTTPException(status_code=500, detail="Period stats reconciliation failed")
+    return {"message": "Period stats reconciled", "corrected_documents": corrected}
+
+
+@api_router.delete("/admin/slow-queries")
+async def reset_slow_queries(current_admin: User = Depends(get_current_admin_user)):
+    """Reset collected query stats (admin only)"""
+    query_monitor.reset()
+    return {"message": "Query stats reset successfully"}
+
+
+@api_router.get("/admin/blocking-calls")
+async def get_blocking_calls(request: Request, limit: int = 10, current_admin: User = Depends(get_current_admin_user)):
+    """Get the code paths that blocked the event loop, worst first (admin only)"""
+    monitor = request.app.state.loop_monitor
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Loop monitor is disabled (set LOOP_MONITOR=true)")
+    return {
+        "threshold_ms": settings.loop_block_threshold_ms,
+        "hot_spots": monitor.hot_spots(limit),
+        "recent": list(monitor.blocks)[-limit:]
+    }
+
+
+def profile_response(profiler, fmt, name):
+    body, media_type, extension = profiler.render(fmt, name)
+    filename = f"profile-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.{extension}"
+    return Response(content=body, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@api_router.get("/admin/profile")
+async def profile_process(
+    request: Request,
+    seconds: float = 10,
+    interval_ms: float = 5,
+    format: str = "speedscope",
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Sample the stacks of all threads for N seconds and return a flamegraph file (admin only)"""
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}], interval_ms >= 1")
+    lock = request.app.state.profile_lock
+    if lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with lock:
+        profiler = SamplingProfiler(interval=interval_ms / 1000)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    logger.info("Process profile taken", extra={"seconds": seconds, "samples": sum(profiler.samples.values()),
+                                                "admin": current_admin.username})
+    return profile_response(profiler, format, f"process ({seconds:g}s)")
+
+
+@api_router.get("/admin/profile/requests")
+async def profile_requests(
+    request: Request,
+    pattern: str,
+    count: int = 10,
+    timeout: float = 60,
+    interval_ms: float = 1,
+    format: str = "speedscope",
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Profile the endpoints of the next `count` requests whose route matches the regex `pattern` (admin only)
+    
+    Returns when they have finished or after `timeout` seconds, with what was sampled so far.
+    """
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    if count < 1 or not 0 < timeout <= MAX_PROFILE_SECONDS or interval_ms < 1:
+        raise HTTPException(status_code=400, detail=f"count >= 1, timeout in (0, {MAX_PROFILE_SECONDS}], interval_ms >= 1")
+    lock = request.app.state.profile_lock
+    if lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    
+    async with lock:
+        try:
+            session = RequestProfileSession(request.app, pattern, count, interval=interval_ms / 1000)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid pattern: {e}")
+        if not session.routes:
+            raise HTTPException(status_code=400, detail="No route matches the pattern")
+        
+        request.app.state.request_profile = session
+        session.start()
+        try:
+            await asyncio.wait_for(session.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            request.app.state.request_profile = None
+            session.stop()
+    
+    logger.info("Request profile taken", extra={"routes": session.routes, "requests": session.completed,
+                                                "admin": current_admin.username})
+    response = profile_response(session.profiler, format, f"{session.completed} requests to {', '.join(session.routes)}")
+    response.headers["X-Profiled-Requests"] = str(session.completed)
+    return response
+
+
+@api_router.get("/admin/memory")
+async def get_memory_summary(
+    request: Request,
+    object_types: int = 0,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Get RSS, GC and tracemalloc status; object_types=N adds the N largest live object types (admin only)"""
+    summary = {
+        "rss_mb": round(rss_bytes() / (1024 * 1024), 1),
+        "gc": gc_summary(),
+        "tracemalloc": request.app.state.memory_inspector.status()
+    }
+    if object_types > 0:
+        # Walks every live object; keep it off the event loop
+        summary["largest_object_types"] = await asyncio.to_thread(largest_object_types, min(object_types, 100))
+    return summary
+
+
+@api_router.post("/admin/memory/tracemalloc/start")
+async def start_tracemalloc(request: Request, frames: int = 10, current_admin: User = Depends(get_current_admin_user)):
+    """Start tracing allocations, keeping `frames` frames per allocation (admin only)"""
+    inspector = request.app.state.memory_inspector
+    inspector.start(max(1, min(frames, 50)))
+    logger.info("tracemalloc started", extra={"frames": frames, "admin": current_admin.username})
+    return inspector.status()
+
+
+@api_router.post("/admin/memory/tracemalloc/stop")
+async def stop_tracemalloc(request: Request, current_admin: User = Depends(get_current_admin_user)):
+    """Stop tracing allocations; taken snapshots stay available (admin only)"""
+    inspector = request.app.state.memory_inspector
+    inspector.stop()
+    logger.info("tracemalloc stopped", extra={"admin": current_admin.username})
+    return inspector.status()
+
+
+def memory_group_by(group_by):
+    if group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+    return group_by
+
+
+@api_router.post("/admin/memory/snapshots")
+async def take_memory_snapshot(
+    request: Request,
+    limit: int = 20,
+    group_by: str = "lineno",
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Take a tracemalloc snapshot and return its top allocation sites (admin only)"""
+    memory_group_by(group_by)
+    inspector = request.app.state.memory_inspector
+    if not inspector.tracing:
+        raise HTTPException(status_code=409, detail="tracemalloc is not running")
+    snapshot_id = await asyncio.to_thread(inspector.take_snapshot)
+    top = await asyncio.to_thread(inspector.top, snapshot_id, limit, group_by)
+    return {"snapshot_id": snapshot_id, "top": top}
+
+
+@api_router.get("/admin/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(
+    request: Request,
+    snapshot_id: int,
+    limit: int = 20,
+    group_by: str = "lineno",
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Get the top allocation sites of a snapshot (admin only)"""
+    memory_group_by(group_by)
+    inspector = request.app.state.memory_inspector
+    if inspector.snapshot(snapshot_id) is None:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    top = await asyncio.to_thread(inspector.top, snapshot_id, limit, group_by)
+    return {"snapshot_id": snapshot_id, "top": top}
+
+
+@api_router.get("/admin/memory/diff")
+async def diff_memory_snapshots(
+    request: Request,
+    base: int,
+    target: Optional[int] = None,
+    limit: int = 20,
+    group_by: str = "lineno",
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Compare two snapshots; without `target` a new snapshot is taken and compared to `base` (admin only)"""
+    memory_group_by(group_by)
+    inspector = request.app.state.memory_inspector
+    if inspector.snapshot(base) is None or (target is not None and inspector.snapshot(target) is None):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    if target is None:
+        if not inspector.tracing:
+            raise HTTPException(status_code=409, detail="tracemalloc is not running")
+        target = await asyncio.to_thread(inspector.take_snapshot)
+    diff = await asyncio.to_thread(inspector.diff, base, target, limit, group_by)
+    return {"base": base, "target": target, "diff": diff}
+
+
+# Health probes (served at the root, unauthenticated, results cached per HEALTH_CACHE_SECONDS)
+async def liveness_probe(app):
+    return {
+        "status": "alive",
+        "uptime_s": round(time.monotonic() - app.state.started_at, 1),
+        "loop_lag_ms": round(await measure_loop_lag(), 3),
+    }
+
+
+async def readiness_probe(app):
+    checks = {}
+    ready = True
+    
+    if client is None:
+        checks["mongo"] = {"ok": False, "error": "client not started"}
+        ready = False
+    else:
+        ping_started = time.perf_counter()
+        try:
+            await asyncio.wait_for(client.admin.command("ping"), settings.ready_ping_timeout_seconds)
+            checks["mongo"] = {"ok": True, "ping_ms": round((time.perf_counter() - ping_started) * 1000, 3)}
+        except Exception as e:
+            checks["mongo"] = {"ok": False, "error": type(e).__name__}
+            ready = False
+    
+    utilisation = pool_monitor.utilisation(settings.mongo_max_pool_size)
+    checks["mongo_pool"] = {
+        "ok": utilisation < settings.ready_max_pool_utilisation,
+        "utilisation": round(utilisation, 3),
+        "max_pool_size": settings.mongo_max_pool_size,
+        "checked_out": pool_monitor.checked_out(),
+    }
+    
+    loop_lag_ms = await measure_loop_lag()
+    checks["event_loop"] = {"ok": loop_lag_ms < settings.ready_max_loop_lag_ms, "lag_ms": round(loop_lag_ms, 3)}
+    
+    log_listener = getattr(app.state, "log_listener", None)
+    checks["queues"] = {
+        "ok": True,
+        "background_tasks": len(background_tasks),
+        "compression": executor_queue_depth(app.state.compression_executor),
+        "log_records": log_listener.queue.qsize() if log_listener is not None else 0,
+    }
+    # Informational: the caches bypass an unusable backend, they do not fail requests
+    checks["cache"] = {"ok": True, **await cache_backend.stats()}
+    if inventory_engine is not None:
+        checks["inventory_engine"] = {"ok": True, **inventory_engine.stats()}
+    
+    ready = ready and all(check["ok"] for check in checks.values())
+    return {"status": "ready" if ready else "not_ready", "checks": checks}
+
+
+@root_router.get("/healthz", include_in_schema=False)
+async def healthz(request: Request):
+    return await request.app.state.liveness.get()
+
+
+@root_router.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    result = await request.app.state.readiness.get()
+    return ORJSONResponse(result, status_code=200 if result["status"] == "ready" else 503)
+
+
+# Prometheus scrape endpoint (served at the root, not under /api)
+@root_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Open the MongoDB client for the app's lifetime and start background maintenance"""
+    global client, db, invalidation_bus, inventory_engine, suggest_index, running_app
+    if running_app is not None:
+        raise RuntimeError("Another app of server.py is running; the module serves one app at a time")
+    log_listener = configure_logging(settings.log_level, settings.log_format)
+    app.state.log_listener = log_listener
+    owns_client = app.state.mongo_client is None
+    if owns_client:
+        if not settings.mongo_url or not settings.db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set")
+        # The client connects lazily, on the first operation
+        client = AsyncIOMotorClient(
+            settings.mongo_url,
+            maxPoolSize=settings.mongo_max_pool_size,
+            event_listeners=[query_monitor, pool_monitor],
+            **client_codec_options()
+        )
+    else:
+        client = app.state.mongo_client
+    db = client[settings.db_name]
+    period_stats.period_index.invalidate()
+    period_stats.counters_built = False  # Until build_period_stats() checked this database
+    app.state.compression_executor = ThreadPoolExecutor(
+        max_workers=settings.compression_workers, thread_name_prefix="compression"
+    )
+    
+    if isinstance(cache_backend, MemoryCacheBackend):
+        # Entries from an earlier run of this app (benchmarks start it repeatedly)
+        cache_backend.invalidated(ALL_TAGS)
+    if settings.inventory_engine:
+        inventory_engine = InventoryEngine(max_staleness=settings.cache_max_staleness_seconds)
+        run_in_background(inventory_engine.run(db))
+    suggest_index = SuggestIndex()
+    run_in_background(suggest_index.run(db))
+    # Tells the in-process copies about other workers' writes (a shared cache backend sees them itself)
+    if settings.cache_pubsub:
+        # Heartbeats well within the staleness bound, so one late beat does not bypass the cache
+        invalidation_bus = InvalidationBus(db, heartbeat_interval=settings.cache_max_staleness_seconds / 3)
+        if isinstance(cache_backend, MemoryCacheBackend):
+            invalidation_bus.subscribe(cache_backend.invalidated)
+            cache_backend.bus = invalidation_bus
+        if inventory_engine is not None:
+            invalidation_bus.subscribe(inventory_engine.invalidated, changes=True)
+            inventory_engine.bus = invalidation_bus
+        invalidation_bus.subscribe(suggest_index.invalidated, changes=True)
+        run_in_background(invalidation_bus.run())
+    if settings.loop_monitor:
+        app.state.loop_monitor = LoopMonitor(
+            app,
+            interval_ms=settings.loop_monitor_interval_ms,
+            block_threshold_ms=settings.loop_block_threshold_ms,
+        )
+        app.state.loop_monitor.start()
+    if settings.background_maintenance:
+        run_in_background(run_startup_maintenance())
+    running_app = app
+    try:
+        yield
+    finally:
+        for task in list(background_tasks):
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        if app.state.loop_monitor is not None:
+            await app.state.loop_monitor.stop()
+        app.state.compression_executor.shutdown(wait=False)
+        app.state.compression_executor = None
+        if owns_client:
+            client.close()
+        if isinstance(cache_backend, MemoryCacheBackend):
+            cache_backend.bus = None
+        invalidation_bus = None
+        inventory_engine = None
+        suggest_index = None
+        await cache_backend.close()
+        client = None
+        db = None
+        running_app = None
+        log_listener.stop()
+
+
+def create_app(app_settings=None, mongo_client=None, cache=None):
+    """Configure this module for app_settings and build its FastAPI app.
+    
+    Not a factory: the route handlers read the module globals set here, so
+    a new app replaces the settings and caches of the previous one, and it
+    refuses to do so while an app's lifespan is running. Tests and tools
+    build and run one app after another.
+    
+    Nothing here does I/O; the lifespan opens the MongoDB client, or uses
+    mongo_client if one is given (e.g. an in-memory stand-in). cache replaces
+    the cache backend chosen by the settings (e.g. a RedisCacheBackend over
+    fakeredis).
+    """
+    global settings, query_monitor, pool_monitor, compressed_body_cache
+    global cache_backend, listings_cache, facets_cache, stats_cache, auth_cache, archives_cache
+    if running_app is not None:
+        raise RuntimeError("create_app() would replace the state of the running app")
+    settings = app_settings or Settings.from_env()
+    query_monitor = QueryMonitor(slow_threshold_ms=settings.slow_query_ms)
+    pool_monitor = PoolMonitor()
+    period_stats.period_index.max_age = settings.period_index_max_age_seconds
+    # Compressed bodies of immutable (ETag-carrying) responses, e.g. archive details
+    compressed_body_cache = CompressedBodyCache(max_bytes=settings.compression_cache_mb * 1024 * 1024)
+    
+    if cache is not None:
+        cache_backend = cache
+    elif settings.cache_backend == "redis":
+        cache_backend = RedisCacheBackend.from_url(settings.redis_url, prefix=f"{settings.db_name}:cache")
+    else:
+        cache_backend = MemoryCacheBackend(
+            max_bytes=settings.cache_memory_mb * 1024 * 1024,
+            max_staleness=settings.cache_max_staleness_seconds,
+        )
+    ttl = settings.cache_ttl_seconds
+    # Rendered response bodies and query results, invalidated by the writes of their tags
+    listings_cache = Cache(cache_backend, "listings", ttl, tags=["cars"], codec=RAW)
+    facets_cache = Cache(cache_backend, "facets", ttl, tags=["cars"], codec=RAW)
+    stats_cache = Cache(cache_backend, "stats", ttl, tags=["cars"])
+    auth_cache = Cache(cache_backend, "auth", settings.auth_cache_seconds, tags=["users"])
+    archives_cache = Cache(cache_backend, "archives", ttl, tags=["archives"], codec=RAW)
+    
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+    app.state.mongo_client = mongo_client
+    app.state.started_at = time.monotonic()
+    app.state.loop_monitor = None
+    app.state.profile_lock = asyncio.Lock()
+    app.state.request_profile = None
+    app.state.memory_inspector = MemoryInspector()
+    app.state.liveness = CachedProbe(lambda: liveness_probe(app), ttl=settings.health_cache_seconds)
+    app.state.readiness = CachedProbe(lambda: readiness_probe(app), ttl=settings.health_cache_seconds)
+    app.state.compression_executor = None  # Owned by the lifespan
+    
+    app.include_router(root_router)
+    app.include_router(api_router)
+    
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Paginated endpoints report the full count in a header the frontend reads
+        expose_headers=["X-Total-Count"],
+    )
+    
+    if settings.compression:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_min_size,
+            thread_threshold=settings.compression_thread_threshold,
+            cache=compressed_body_cache,
+            executor=lambda: app.state.compression_executor,
+        )
+    
+    app.add_middleware(PrometheusMiddleware)
+    
+    if settings.server_timing:
+        app.add_middleware(
+            ServerTimingMiddleware,
+            roundtrips_header=settings.server_timing_roundtrips,
+            timing_allow_origin=",".join(settings.cors_origins),
+        )
+    return app
 
-@app.on_event("startup")
-async def startup_event():
-    await create_default_admin()
-    await cleanup_old_archives()
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+def __getattr__(name):
+    # The app of "uvicorn server:app", built on first access rather than at
+    # import, so importing the module does not configure it
+    global app
+    if name == "app":
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,113 @@
+"""Runtime configuration of the inventory API.
+
+Settings.from_env() reads the environment (and backend/.env, loaded by
+server.py) once; create_app() takes the result, so tests and tools can build
+an app from explicit values with dataclasses.replace() instead of patching
+os.environ before importing server.py.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() == "true"
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+    jwt_secret_key: str = "your-secret-key-change-in-production"
+    cors_origins: List[str] = field(default_factory=lambda: ["*"])
+    # Re-validate documents from our own collections on read (slower, for debugging)
+    strict_response_validation: bool = False
+    slow_query_ms: float = 100.0
+    mongo_max_pool_size: int = 100
+    compression: bool = True
+    compression_min_size: int = 1024
+    compression_thread_threshold: int = 64 * 1024
+    compression_cache_mb: int = 32
+    compression_workers: int = 2
+    server_timing: bool = True
+    server_timing_roundtrips: bool = False
+    # How long another worker's car writes can take to show up in the cached period list
+    period_index_max_age_seconds: float = 5.0
+    period_stats_reconcile_minutes: float = 60.0
+    # Index creation, archive cleanup, migrations and counter reconciliation
+    # after startup; off for tools and tests that manage the data themselves
+    background_maintenance: bool = True
+    # Probe results are reused for this long, so polling them is nearly free
+    health_cache_seconds: float = 1.0
+    ready_ping_timeout_seconds: float = 2.0
+    # /readyz fails above these, so load balancers shed traffic from degraded workers
+    ready_max_pool_utilisation: float = 0.9
+    ready_max_loop_lag_ms: float = 250.0
+    # Cache backend shared by listings, stats, auth and archives: "memory" (per
+    # worker) or "redis" (REDIS_URL, shared by all workers and hosts)
+    cache_backend: str = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    # Size of the memory backend per worker (0 disables caching)
+    cache_memory_mb: int = 64
+    cache_ttl_seconds: float = 300.0
+    # Shorter, as a cached user outlives a role change made directly in the database
+    auth_cache_seconds: float = 60.0
+    # Cross-worker invalidation for the memory backend over a capped collection;
+    # without it caches only see writes of their own process (single worker)
+    cache_pubsub: bool = True
+    # Upper bound on how long a worker may serve cached data after another worker's write
+    cache_max_staleness_seconds: float = 5.0
+    # Columnar in-memory copy of the active cars for filters and stats (see inventory_engine.py)
+    inventory_engine: bool = False
+    # How long a suggestion request waits for the first build of the index before a 503
+    suggest_index_wait_seconds: float = 2.0
+    # Continuous event loop lag histogram and blocking-call stacks (see loop_monitor.py)
+    loop_monitor: bool = False
+    loop_monitor_interval_ms: float = 50.0
+    loop_block_threshold_ms: float = 100.0
+    log_level: str = "INFO"
+    # "json" (one object per line) or "text"
+    log_format: str = "json"
+    # Per-row DEBUG records of bulk operations: the first few, then every Nth row
+    log_row_sample_every: int = 100
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            mongo_url=os.environ.get("MONGO_URL"),
+            db_name=os.environ.get("DB_NAME"),
+            jwt_secret_key=os.environ.get("JWT_SECRET_KEY", cls.jwt_secret_key),
+            cors_origins=os.environ.get("CORS_ORIGINS", "*").split(","),
+            strict_response_validation=_flag("STRICT_RESPONSE_VALIDATION", "false"),
+            slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "100")),
+            mongo_max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+            compression=_flag("COMPRESSION", "true"),
+            compression_min_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
+            compression_thread_threshold=int(os.environ.get("COMPRESSION_THREAD_THRESHOLD", "65536")),
+            compression_cache_mb=int(os.environ.get("COMPRESSION_CACHE_MB", "32")),
+            compression_workers=int(os.environ.get("COMPRESSION_WORKERS", "2")),
+            server_timing=_flag("SERVER_TIMING", "true"),
+            server_timing_roundtrips=_flag("SERVER_TIMING_ROUNDTRIPS", "false"),
+            period_index_max_age_seconds=float(os.environ.get("PERIOD_INDEX_MAX_AGE_SECONDS", "5")),
+            period_stats_reconcile_minutes=float(os.environ.get("PERIOD_STATS_RECONCILE_MINUTES", "60")),
+            background_maintenance=_flag("BACKGROUND_MAINTENANCE", "true"),
+            health_cache_seconds=float(os.environ.get("HEALTH_CACHE_SECONDS", "1")),
+            ready_ping_timeout_seconds=float(os.environ.get("READY_PING_TIMEOUT_SECONDS", "2")),
+            ready_max_pool_utilisation=float(os.environ.get("READY_MAX_POOL_UTILISATION", "0.9")),
+            ready_max_loop_lag_ms=float(os.environ.get("READY_MAX_LOOP_LAG_MS", "250")),
+            cache_backend=os.environ.get("CACHE_BACKEND", "memory"),
+            redis_url=os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+            cache_memory_mb=int(os.environ.get("CACHE_MEMORY_MB", "64")),
+            cache_ttl_seconds=float(os.environ.get("CACHE_TTL_SECONDS", "300")),
+            auth_cache_seconds=float(os.environ.get("AUTH_CACHE_SECONDS", "60")),
+            cache_pubsub=_flag("CACHE_PUBSUB", "true"),
+            cache_max_staleness_seconds=float(os.environ.get("CACHE_MAX_STALENESS_SECONDS", "5")),
+            inventory_engine=_flag("INVENTORY_ENGINE", "false"),
+            suggest_index_wait_seconds=float(os.environ.get("SUGGEST_INDEX_WAIT_SECONDS", "2")),
+            loop_monitor=_flag("LOOP_MONITOR", "false"),
+            loop_monitor_interval_ms=float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "50")),
+            loop_block_threshold_ms=float(os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "100")),
+            log_level=os.environ.get("LOG_LEVEL", "INFO"),
+            log_format=os.environ.get("LOG_FORMAT", "json"),
+            log_row_sample_every=int(os.environ.get("LOG_ROW_SAMPLE_EVERY", "100")),
+        )
@@ -0,0 +1,55 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+When many clients ask for the same data at the same moment (every device
+loading the dashboard at shift start), only the first request (the leader)
+runs the query; requests arriving while it is in flight await the leader's
+result instead of sending their own. Nothing is cached: once the call
+finishes, the next request starts a new one.
+
+The call runs in its own task, so a leader whose client disconnects does not
+cancel the query for the requests waiting on it. Results are shared between
+requests and must not be mutated by them.
+"""
+import asyncio
+import json
+
+from metrics import SINGLEFLIGHT_REQUESTS
+
+
+def normalized_key(*parts):
+    """Stable key for query parameters (dicts are compared independent of key order)"""
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+def _consume_exception(task):
+    # The exception is re-raised to every waiter; this only stops asyncio from
+    # warning about it when all of them were cancelled first
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent callers with the same key"""
+
+    def __init__(self, operation):
+        self.operation = operation
+        self._in_flight = {}
+        self._leaders = SINGLEFLIGHT_REQUESTS.labels(operation, "leader")
+        self._coalesced = SINGLEFLIGHT_REQUESTS.labels(operation, "coalesced")
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    async def do(self, key, call):
+        """Return the result of call() (a coroutine function), shared with concurrent callers for key"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self._leaders.inc()
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._in_flight.pop(key, None))
+            task.add_done_callback(_consume_exception)
+        else:
+            self._coalesced.inc()
+        return await asyncio.shield(task)
@@ -0,0 +1,192 @@
+"""In-memory prefix index for make/model autocomplete.
+
+Each PrefixIndex keeps the distinct values of a field, case-folded and
+whitespace-trimmed, in a sorted list: the values starting with a prefix are
+one contiguous slice found by two bisections, and the slice is ranked by how
+many cars use the value. Spellings that only differ in case or surrounding
+whitespace ("BMW", "bmw ") share an entry, which suggests the most common
+spelling, so the form steers users towards it.
+
+SuggestIndex holds the make and model indexes (models also per make) for all
+cars, archived ones included. Single-car writes are applied incrementally,
+those of other workers from the changes their InvalidationBus events carry;
+bulk writes mark it stale and a background task rebuilds it from one
+aggregation. Suggestions are served from the previous build meanwhile: a
+value appearing a few seconds late does no harm here.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+from collections import Counter
+from itertools import islice
+
+from cache_bus import ALL_TOPICS
+
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every other character, so prefix + it bounds the prefix's slice
+MAX_CHAR = "\U0010ffff"
+# Slices longer than this (short prefixes) are not ranked per query; the
+# values are walked by popularity until enough of them match instead
+RANKED_SCAN_MIN = 256
+
+
+def fold(value):
+    return value.strip().casefold() if isinstance(value, str) else ""
+
+
+class PrefixIndex:
+    """Distinct values of one field with the number of cars using each"""
+
+    def __init__(self):
+        self._keys = []  # Sorted folded values
+        self._totals = {}
+        self._spellings = {}
+        self._ranked_keys = None  # Most used first, built on demand
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, value, count=1):
+        key = fold(value)
+        if not key:
+            return
+        if key not in self._spellings:
+            bisect.insort(self._keys, key)
+            self._spellings[key] = Counter()
+            self._totals[key] = 0
+        self._spellings[key][value] += count
+        self._totals[key] += count
+        self._ranked_keys = None
+
+    def remove(self, value):
+        key = fold(value)
+        spellings = self._spellings.get(key)
+        if spellings is None or spellings[value] <= 0:
+            return
+        spellings[value] -= 1
+        if spellings[value] == 0:
+            del spellings[value]
+        self._totals[key] -= 1
+        self._ranked_keys = None
+        if not spellings:
+            del self._spellings[key]
+            del self._totals[key]
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def suggest(self, prefix, limit=10):
+        """[(value, cars)] starting with prefix (case-insensitive), most used first"""
+        prefix = fold(prefix)
+        low = bisect.bisect_left(self._keys, prefix)
+        high = bisect.bisect_left(self._keys, prefix + MAX_CHAR, low)
+        if high - low > RANKED_SCAN_MIN:
+            keys = list(islice((key for key in self._ranked() if key.startswith(prefix)), limit))
+        else:
+            # Stable, so values used by as many cars stay in alphabetical order
+            keys = heapq.nlargest(limit, self._keys[low:high], key=self._totals.__getitem__)
+        return [(self._spellings[key].most_common(1)[0][0], self._totals[key]) for key in keys]
+
+    def _ranked(self):
+        if self._ranked_keys is None:
+            self._ranked_keys = sorted(self._keys, key=self._totals.__getitem__, reverse=True)
+        return self._ranked_keys
+
+
+class SuggestIndex:
+    """Make and model prefix indexes, kept current by write hooks"""
+
+    def __init__(self):
+        self.makes = PrefixIndex()
+        self.models = PrefixIndex()
+        self.models_by_make = {}
+        self.loaded = asyncio.Event()
+        self.loaded_at = None
+        self._loading = False
+        self._stale = asyncio.Event()
+        self._stale.set()  # Built by run()
+
+    def add(self, car, count=1):
+        make, model = car.get("make"), car.get("model")
+        self.makes.add(make, count)
+        self.models.add(model, count)
+        if fold(make):
+            self.models_by_make.setdefault(fold(make), PrefixIndex()).add(model, count)
+
+    def remove(self, car):
+        make, model = car.get("make"), car.get("model")
+        self.makes.remove(make)
+        self.models.remove(model)
+        models = self.models_by_make.get(fold(make))
+        if models is not None:
+            models.remove(model)
+            if not len(models):
+                del self.models_by_make[fold(make)]
+
+    def apply(self, old, new):
+        """Apply a single-car write of this worker (old and new documents, either may be None)"""
+        if old is not None and new is not None and (
+            old.get("make") == new.get("make") and old.get("model") == new.get("model")
+        ):
+            return  # E.g. a status change
+        if self._loading:
+            # The build in flight may or may not include this write
+            self.mark_stale()
+        if old is not None:
+            self.remove(old)
+        if new is not None:
+            self.add(new)
+
+    def mark_stale(self):
+        self._stale.set()
+
+    def invalidated(self, topic, changes=None):
+        """InvalidationBus subscriber: another worker wrote cars ([(old, new)] documents, None for bulk writes)"""
+        if topic == ALL_TOPICS or (topic == "cars" and changes is None):
+            self.mark_stale()
+        elif topic == "cars":
+            for old, new in changes:
+                self.apply(old, new)
+
+    def suggest(self, field, prefix, make=None, limit=10):
+        if field == "model" and make:
+            index = self.models_by_make.get(fold(make))
+            if index is None:
+                return []
+        else:
+            index = self.makes if field == "make" else self.models
+        return index.suggest(prefix, limit)
+
+    async def run(self, db):
+        """Rebuild whenever marked stale (runs for the app's lifetime)"""
+        while True:
+            await self._stale.wait()
+            self._stale.clear()
+            self._loading = True
+            try:
+                built = await self._build(db)
+            except Exception:
+                logger.exception("Suggestion index build failed")
+                await asyncio.sleep(5)
+                self._stale.set()
+                continue
+            finally:
+                self._loading = False
+            self.makes, self.models, self.models_by_make = built.makes, built.models, built.models_by_make
+            self.loaded_at = time.time()
+            self.loaded.set()
+
+    @staticmethod
+    async def _build(db):
+        started = time.perf_counter()
+        built = SuggestIndex()
+        pipeline = [{"$group": {"_id": {"make": "$make", "model": "$model"}, "cars": {"$sum": 1}}}]
+        async for row in db.cars.aggregate(pipeline):
+            built.add(row["_id"], row["cars"])
+        logger.info("Suggestion index built", extra={
+            "makes": len(built.makes), "models": len(built.models),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+        return built
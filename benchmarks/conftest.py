@@ -0,0 +1,40 @@
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "backend"))
+
+# Settings.from_env() reads these; no I/O happens until an app's lifespan runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dealership_benchmarks")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from generate_inventory import InventoryGenerator  # noqa: E402
+
+LIST_SIZE = 500
+AS_OF = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def _stored(cars):
+    """Generated cars in the format they come back from MongoDB"""
+    import server
+
+    return [server.prepare_for_mongo(car) for car in cars]
+
+
+@pytest.fixture(scope="session")
+def car_docs():
+    generator = InventoryGenerator(seed=7, as_of=AS_OF)
+    return _stored(generator.cars(LIST_SIZE, with_photos=False))
+
+
+@pytest.fixture(scope="session")
+def car_docs_with_photos():
+    generator = InventoryGenerator(seed=7, as_of=AS_OF, photo_kb=100, present_ratio=1.0)
+    return _stored(generator.cars(LIST_SIZE))
@@ -0,0 +1,319 @@
+"""Deterministic synthetic inventory for scale testing.
+
+Generates N cars with a realistic make/model mix, valid 17-character VINs
+(with check digit), sequential internal numbers, skewed purchase dates and
+optional verification photo blobs. The same seed always produces the same
+dataset.
+
+Write the active inventory as CSV files for ``POST /api/cars/import-csv``:
+
+    python benchmarks/generate_inventory.py csv --cars 10000 --out /tmp/inventory
+
+Or bulk-insert directly into MongoDB, including past periods that are
+archived the same way the archive endpoint does it:
+
+    python benchmarks/generate_inventory.py mongo --mongo mongodb://localhost:27017 \\
+        --db-name dealership_scale --cars 1000000 --months 4 --photo-kb 120
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import io
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Make -> (weight, world manufacturer identifier, models ordered by popularity)
+MAKES = {
+    "Volkswagen": (20, "WVW", ["Golf", "Polo", "Tiguan", "Passat", "T-Roc", "Touran", "ID.3", "Up!"]),
+    "Mercedes-Benz": (11, "WDD", ["C 200", "A 180", "E 220 d", "GLC 300", "B 200", "CLA 200", "GLA 200"]),
+    "BMW": (10, "WBA", ["320d", "118i", "X1 sDrive18i", "520d", "X3 xDrive20d", "218i Active Tourer"]),
+    "Audi": (9, "WAU", ["A3 Sportback", "A4 Avant", "Q3", "A6 Avant", "Q5", "A1"]),
+    "Skoda": (8, "TMB", ["Octavia Combi", "Fabia", "Superb", "Kodiaq", "Karoq", "Kamiq"]),
+    "Opel": (6, "W0L", ["Corsa", "Astra", "Mokka", "Grandland", "Insignia"]),
+    "Ford": (6, "WF0", ["Focus", "Fiesta", "Kuga", "Puma", "Mondeo"]),
+    "Seat": (5, "VSS", ["Leon", "Ibiza", "Ateca", "Arona"]),
+    "Hyundai": (4, "KMH", ["i30", "Tucson", "Kona", "i20"]),
+    "Toyota": (4, "JTD", ["Yaris", "Corolla", "C-HR", "RAV4"]),
+    "Renault": (4, "VF1", ["Clio", "Megane", "Captur", "Zoe"]),
+    "Peugeot": (3, "VF3", ["208", "308", "2008", "3008"]),
+    "Fiat": (3, "ZFA", ["500", "Panda", "Tipo"]),
+    "Tesla": (2, "5YJ", ["Model 3", "Model Y"]),
+}
+
+VIN_CHARS = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+VIN_WEIGHTS = [8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2]
+VIN_VALUES = {
+    **{str(digit): digit for digit in range(10)},
+    "A": 1, "B": 2, "C": 3, "D": 4, "E": 5, "F": 6, "G": 7, "H": 8,
+    "J": 1, "K": 2, "L": 3, "M": 4, "N": 5, "P": 7, "R": 9,
+    "S": 2, "T": 3, "U": 4, "V": 5, "W": 6, "X": 7, "Y": 8, "Z": 9,
+}
+# Model year codes (position 10) for 2010-2030
+YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY"
+CSV_COLUMNS = ["make", "model", "number", "purchase_date", "vin", "image_url"]
+PHOTO_POOL_SIZE = 32
+
+
+def vin_check_digit(vin):
+    total = sum(VIN_VALUES[char] * weight for char, weight in zip(vin, VIN_WEIGHTS))
+    remainder = total % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+class InventoryGenerator:
+    """Seeded generator of car documents shaped like the API's Car model"""
+
+    def __init__(self, seed=42, as_of=None, photo_kb=0, present_ratio=0.6, consignment_ratio=0.08,
+                 first_number=100000):
+        self.rng = random.Random(seed)
+        self.as_of = as_of or datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        self.photo_kb = photo_kb
+        self.present_ratio = present_ratio
+        self.consignment_ratio = consignment_ratio
+        self.next_number = first_number
+        self.vin_serial = 0
+
+        self._makes = list(MAKES)
+        self._make_weights = [MAKES[make][0] for make in self._makes]
+        # Popularity within a make falls off like 1/rank
+        self._model_weights = {
+            make: [1.0 / rank for rank in range(1, len(MAKES[make][2]) + 1)] for make in self._makes
+        }
+        self._photos = []
+        if photo_kb > 0:
+            # Random bytes are as incompressible as real JPEGs; a small pool keeps generation fast
+            self._photos = [
+                "data:image/jpeg;base64," + base64.b64encode(self.rng.randbytes(photo_kb * 1024)).decode("ascii")
+                for _ in range(PHOTO_POOL_SIZE)
+            ]
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _vin(self, make, model_year):
+        wmi = MAKES[make][1]
+        self.vin_serial += 1
+        vds = "".join(self.rng.choice(VIN_CHARS) for _ in range(5))
+        year_code = YEAR_CODES[(model_year - 2010) % len(YEAR_CODES)]
+        plant = self.rng.choice(VIN_CHARS)
+        vin = f"{wmi}{vds}0{year_code}{plant}{self.vin_serial % 1_000_000:06d}"
+        return vin[:8] + vin_check_digit(vin) + vin[9:]
+
+    def car(self, month, year, archive_status="active", with_photos=True):
+        """Generate one car document for the given inventory period"""
+        rng = self.rng
+        make = rng.choices(self._makes, self._make_weights)[0]
+        model = rng.choices(MAKES[make][2], self._model_weights[make])[0]
+        period_start = datetime(year, month, 1, tzinfo=timezone.utc)
+        # Most stock is recent; a long tail stays on the lot for years
+        age_days = min(int(rng.expovariate(1 / 120)), 3 * 365)
+        purchase_date = period_start - timedelta(days=age_days + 1)
+        present = rng.random() < self.present_ratio
+        self.next_number += 1
+        created_at = period_start + timedelta(seconds=rng.randint(0, 20 * 24 * 3600))
+
+        car = {
+            "id": self._uuid(),
+            "make": make,
+            "model": model,
+            "number": str(self.next_number),
+            "purchase_date": purchase_date.strftime("%Y-%m-%d"),
+            "image_url": None,
+            "status": "present" if present else "absent",
+            "vin": self._vin(make, purchase_date.year) if rng.random() < 0.95 else None,
+            "car_photo": None,
+            "vin_photo": None,
+            "is_consignment": rng.random() < self.consignment_ratio,
+            "current_month": month,
+            "current_year": year,
+            "archive_status": archive_status,
+            "created_at": created_at,
+            "updated_at": created_at + timedelta(seconds=rng.randint(0, 5 * 24 * 3600)),
+        }
+        if present and with_photos and self._photos:
+            car["car_photo"] = rng.choice(self._photos)
+            car["vin_photo"] = rng.choice(self._photos)
+        return car
+
+    def cars(self, count, month=None, year=None, archive_status="active", with_photos=True):
+        month = month or self.as_of.month
+        year = year or self.as_of.year
+        for _ in range(count):
+            yield self.car(month, year, archive_status, with_photos)
+
+    def past_periods(self, months):
+        """(month, year) of the ``months`` periods before the as-of period, oldest first"""
+        periods = []
+        month, year = self.as_of.month, self.as_of.year
+        for _ in range(months):
+            month, year = (12, year - 1) if month == 1 else (month - 1, year)
+            periods.append((month, year))
+        return list(reversed(periods))
+
+
+def csv_bytes(cars):
+    """Render cars as an import-csv payload"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for car in cars:
+        writer.writerow({**car, "vin": car["vin"] or "", "image_url": car["image_url"] or ""})
+    return buffer.getvalue().encode("utf-8")
+
+
+def write_csv(generator, out_dir, count, chunk_rows=None):
+    """Write the active inventory as one or more CSV files and return their paths"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    chunk_rows = chunk_rows or count
+    paths = []
+    for index, offset in enumerate(range(0, count, chunk_rows)):
+        rows = min(chunk_rows, count - offset)
+        path = out_dir / f"inventory_{index:04d}.csv"
+        path.write_bytes(csv_bytes(generator.cars(rows, with_photos=False)))
+        paths.append(path)
+    return paths
+
+
+def _server():
+    """Import server.py lazily; its storage helpers define the document format"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    return server
+
+
+async def insert_cars(db, cars, batch_size=5000):
+    """Bulk-insert generated cars in storage format and return the stored documents.
+
+    The period_stats counters are updated like the API would.
+    """
+    server = _server()
+    stats_delta = server.PeriodStatsDelta()
+    stored = []
+    batch = []
+    for car in cars:
+        batch.append(server.prepare_for_mongo(car))
+        if len(batch) >= batch_size:
+            # insert_many adds _id to the documents it is given, so insert copies
+            await db.cars.insert_many([dict(doc) for doc in batch], ordered=False)
+            stored.extend(batch)
+            batch = []
+    if batch:
+        await db.cars.insert_many([dict(doc) for doc in batch], ordered=False)
+        stored.extend(batch)
+    for doc in stored:
+        stats_delta.add(doc)
+    await stats_delta.apply(db)
+    return stored
+
+
+async def write_mongo(generator, db, count, months=0, cars_per_period=2000, batch_size=5000,
+                      archive_photos=False, admin_id="generator"):
+    """Bulk-insert the active inventory plus archived past periods.
+
+    Documents go through server.py's own storage helpers, so they match what the
+    API writes.
+    """
+    server = _server()
+    totals = {"active_cars": 0, "archived_cars": 0, "archives": 0}
+
+    for month, year in generator.past_periods(months):
+        cars = await insert_cars(
+            db, generator.cars(cars_per_period, month, year, "archived", with_photos=archive_photos), batch_size
+        )
+        present = sum(1 for car in cars if car["status"] == "present")
+        archive = server.MonthlyArchive(
+            month=month,
+            year=year,
+            archive_name=f"Inventur {month:02d}/{year}",
+            total_cars=len(cars),
+            present_cars=present,
+            absent_cars=len(cars) - present,
+            cars_data=cars,
+            archived_by=admin_id,
+            archived_at=datetime(year, month, 28, 18, tzinfo=timezone.utc),
+        )
+        archive_mongo = server.prepare_for_mongo(archive.dict())
+        await db.monthly_archives.insert_one(archive_mongo)
+        history_entries = server.build_vehicle_history_entries(archive_mongo)
+        if history_entries:
+            await db.vehicle_history.insert_many(history_entries, ordered=False)
+        totals["archived_cars"] += len(cars)
+        totals["archives"] += 1
+
+    # Stream the active inventory in batches instead of holding it all in memory
+    batch = []
+    for car in generator.cars(count):
+        batch.append(car)
+        if len(batch) >= batch_size:
+            totals["active_cars"] += len(await insert_cars(db, batch, batch_size))
+            batch = []
+    if batch:
+        totals["active_cars"] += len(await insert_cars(db, batch, batch_size))
+
+    return totals
+
+
+async def _main_mongo(args, generator):
+    os.environ.setdefault("MONGO_URL", args.mongo)
+    os.environ.setdefault("DB_NAME", args.db_name)
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo, **_server().client_codec_options())
+    if args.drop:
+        await client.drop_database(args.db_name)
+    totals = await write_mongo(generator, client[args.db_name], args.cars, args.months, args.cars_per_period,
+                               args.batch_size, args.archive_photos)
+    client.close()
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=["csv", "mongo"])
+    parser.add_argument("--cars", type=int, default=1000, help="Active cars in the current period")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", help="Current period as YYYY-MM (default: this month)")
+    parser.add_argument("--photo-kb", type=int, default=0, help="Size of each photo blob; 0 disables photos")
+    parser.add_argument("--present-ratio", type=float, default=0.6)
+    parser.add_argument("--consignment-ratio", type=float, default=0.08)
+    parser.add_argument("--out", default="generated_inventory", help="CSV output directory")
+    parser.add_argument("--chunk-rows", type=int, help="Split CSV output into files of this many rows")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="dealership_scale")
+    parser.add_argument("--drop", action="store_true", help="Drop the database before inserting")
+    parser.add_argument("--months", type=int, default=0, help="Archived past periods to generate")
+    parser.add_argument("--cars-per-period", type=int, default=2000)
+    parser.add_argument("--archive-photos", action="store_true", help="Keep photos in archived cars")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    as_of = None
+    if args.as_of:
+        year, month = (int(part) for part in args.as_of.split("-"))
+        as_of = datetime(year, month, 1, tzinfo=timezone.utc)
+    generator = InventoryGenerator(seed=args.seed, as_of=as_of, photo_kb=args.photo_kb,
+                                   present_ratio=args.present_ratio, consignment_ratio=args.consignment_ratio)
+
+    start = time.perf_counter()
+    if args.target == "csv":
+        paths = write_csv(generator, args.out, args.cars, args.chunk_rows)
+        summary = {"files": [str(path) for path in paths]}
+    else:
+        summary = asyncio.run(_main_mongo(args, generator))
+    summary["seconds"] = round(time.perf_counter() - start, 2)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
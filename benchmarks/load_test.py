@@ -0,0 +1,363 @@
+"""Concurrent load test for the inventory API.
+
+Runs a weighted mix of realistic operations (car listings, stats, status
+toggles with verification photos, CSV imports, archiving) from many concurrent
+async clients and reports throughput and latency percentiles per endpoint as
+JSON.
+
+By default the app is booted in-process (httpx ASGI transport, no sockets)
+against an in-memory Motor stand-in, so the numbers measure the application
+code itself:
+
+    python benchmarks/load_test.py --clients 50 --duration 30 --cars 2000
+
+Against a local mongod, still in-process:
+
+    python benchmarks/load_test.py --mongo mongodb://localhost:27017
+
+With the shared cache backend (a redis:// URL, or "fakeredis" in-process):
+
+    python benchmarks/load_test.py --cache fakeredis
+
+Against a running server (e.g. ``uvicorn server:app --workers 4``); passing
+--mongo as well enables seeding of archivable periods:
+
+    python benchmarks/load_test.py --url http://localhost:8001 --mongo mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import base64
+import dataclasses
+import json
+import os
+import random
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from generate_inventory import MAKES, InventoryGenerator, csv_bytes, insert_cars
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Operation name -> relative weight in the workload mix
+DEFAULT_MIX = {
+    "list_cars": 30,
+    "list_cars_filtered": 15,
+    "stats": 20,
+    "facets": 5,
+    "suggest": 5,
+    "available_months": 10,
+    "get_car": 10,
+    "mark_present": 6,
+    "mark_absent": 6,
+    "list_archives": 2,
+    "csv_import": 0.5,
+    "create_archive": 0.5,
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects latencies (seconds) and failures per operation"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, operation, duration, ok):
+        self.latencies.setdefault(operation, []).append(duration)
+        if not ok:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def report(self, elapsed):
+        operations = {}
+        total = 0
+        for operation, values in sorted(self.latencies.items()):
+            values.sort()
+            total += len(values)
+            operations[operation] = {
+                "requests": len(values),
+                "errors": self.errors.get(operation, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2),
+            "operations": operations,
+        }
+
+
+class Workload:
+    """Shared state of one load test run"""
+
+    def __init__(self, http, db, args):
+        self.http = http
+        self.db = db
+        self.args = args
+        self.generator = InventoryGenerator(seed=args.seed)
+        self.car_ids = []
+        self.archive_periods = []
+        photo = os.urandom(args.photo_kb * 1024)
+        self.photo = "data:image/jpeg;base64," + base64.b64encode(photo).decode("ascii")
+        now = datetime.now(timezone.utc)
+        self.month, self.year = now.month, now.year
+
+    async def login(self):
+        response = await self.http.post("/api/auth/login", json={"username": self.args.username,
+                                                                 "password": self.args.password})
+        response.raise_for_status()
+        self.http.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+    async def seed(self):
+        chunk = 1000
+        for offset in range(0, self.args.cars, chunk):
+            content = csv_bytes(self.generator.cars(min(chunk, self.args.cars - offset), with_photos=False))
+            response = await self.http.post(
+                "/api/cars/import-csv", files={"file": ("seed.csv", content, "text/csv")}
+            )
+            response.raise_for_status()
+
+        response = await self.http.get("/api/cars")
+        response.raise_for_status()
+        self.car_ids = [car["id"] for car in response.json()]
+
+        if self.db is not None:
+            await self.seed_archive_periods()
+
+    async def seed_archive_periods(self):
+        """Insert active cars into past periods so archiving has work to do"""
+        for month, year in self.generator.past_periods(self.args.archive_periods):
+            await insert_cars(self.db, self.generator.cars(self.args.cars_per_archive, month, year, with_photos=False))
+            self.archive_periods.append((month, year))
+
+    async def run_operation(self, operation, rng):
+        http = self.http
+        if operation == "list_cars":
+            return await http.get("/api/cars")
+        if operation == "list_cars_filtered":
+            params = {"month": self.month, "year": self.year,
+                      "status": rng.choice(["present", "absent"]),
+                      "is_consignment": "false"}
+            if rng.random() < 0.3:
+                params["search"] = rng.choice(list(MAKES))[:3]
+            return await http.get("/api/cars", params=params)
+        if operation == "stats":
+            return await http.get("/api/cars/stats/summary", params={"month": self.month, "year": self.year})
+        if operation == "facets":
+            return await http.get("/api/cars/facets", params={"month": self.month, "year": self.year})
+        if operation == "suggest":
+            make = rng.choice(list(MAKES))
+            # What the form sends after one or two keystrokes
+            prefix = rng.choice(MAKES[make][2])[:rng.randint(1, 2)]
+            return await http.get("/api/cars/suggest", params={"field": "model", "make": make, "prefix": prefix})
+        if operation == "available_months":
+            return await http.get("/api/cars/available-months")
+        if operation == "get_car":
+            return await http.get(f"/api/cars/{rng.choice(self.car_ids)}")
+        if operation == "mark_present":
+            return await http.patch(f"/api/cars/{rng.choice(self.car_ids)}/status", json={
+                "status": "present", "car_photo": self.photo, "vin_photo": self.photo,
+            })
+        if operation == "mark_absent":
+            return await http.patch(f"/api/cars/{rng.choice(self.car_ids)}/status", json={"status": "absent"})
+        if operation == "list_archives":
+            return await http.get("/api/archives")
+        if operation == "csv_import":
+            content = csv_bytes(self.generator.cars(self.args.csv_rows, with_photos=False))
+            return await http.post("/api/cars/import-csv", files={"file": ("load.csv", content, "text/csv")})
+        if operation == "create_archive":
+            if not self.archive_periods:
+                return None
+            month, year = self.archive_periods.pop()
+            return await http.post("/api/archives/create-monthly", json={
+                "archive_name": f"Load test {month}/{year}", "month": month, "year": year,
+            })
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+async def client_loop(workload, recorder, mix, deadline, seed):
+    rng = random.Random(seed)
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await workload.run_operation(operation, rng)
+        except httpx.HTTPError:
+            recorder.record(operation, time.perf_counter() - start, ok=False)
+            continue
+        if response is None:
+            continue
+        recorder.record(operation, time.perf_counter() - start, ok=response.status_code < 400)
+
+
+def mongomock_client():
+    """AsyncMongoMockClient that accepts what server.py stores.
+
+    mongomock checks every written document by BSON-encoding it with pymongo's
+    default codec options, which refuse the uuid.UUID ids and datetime.date
+    values that client_codec_options() lets the real driver encode. The check
+    is pointed at those options instead; the values are stored unchanged.
+    """
+    import bson
+    import mongomock.collection
+    from bson.codec_options import CodecOptions
+    from mongomock_motor import AsyncMongoMockClient
+
+    from mongo_codecs import client_codec_options
+
+    options = client_codec_options()
+    codec_options = CodecOptions(tz_aware=options["tz_aware"], tzinfo=options["tzinfo"],
+                                 uuid_representation=bson.binary.UuidRepresentation.STANDARD,
+                                 type_registry=options["type_registry"])
+
+    class BSON(bson.BSON):
+        @classmethod
+        def encode(cls, document, check_keys=False, codec_options=codec_options):
+            return super().encode(document, check_keys, codec_options)
+
+    mongomock.collection.BSON = BSON
+    return AsyncMongoMockClient(tz_aware=options["tz_aware"])
+
+
+@asynccontextmanager
+async def open_inprocess_app(args):
+    """Build server.py's app against the requested database and run its lifespan"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    mongo_url = args.mongo if args.mongo != "memory" else None
+    mongo_client = None
+    if mongo_url is None:
+        mongo_client = mongomock_client()
+    cache = None
+    redis_url = None
+    if args.cache == "fakeredis":
+        import fakeredis
+
+        cache = server.RedisCacheBackend(fakeredis.FakeAsyncRedis(), prefix=f"{args.db_name}:cache")
+    elif args.cache != "memory":
+        redis_url = args.cache
+    settings = dataclasses.replace(server.Settings.from_env(), mongo_url=mongo_url, db_name=args.db_name,
+                                   background_maintenance=False,
+                                   log_level=os.environ.get("LOG_LEVEL", "WARNING"),
+                                   # mongomock has no tailable cursors; a single process needs no bus
+                                   cache_pubsub=mongo_url is not None,
+                                   cache_backend="redis" if redis_url else "memory",
+                                   redis_url=redis_url or server.Settings.redis_url)
+    app = server.create_app(settings, mongo_client=mongo_client, cache=cache)
+    async with app.router.lifespan_context(app):
+        if mongo_url is not None:
+            await server.client.drop_database(args.db_name)
+        # Entries of an earlier run must not outlive its database
+        await server.invalidate_caches("cars", "users", "archives")
+        await server.ensure_indexes()
+        await server.build_period_stats()
+        await server.create_default_admin()
+        yield server, httpx.ASGITransport(app=app)
+
+
+async def main(args):
+    mix = dict(DEFAULT_MIX)
+    for override in args.mix:
+        name, _, weight = override.partition("=")
+        if name not in mix:
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+    async with AsyncExitStack() as stack:
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        db = None
+        if args.url:
+            http = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+            if args.mongo and args.mongo != "memory":
+                from motor.motor_asyncio import AsyncIOMotorClient
+
+                sys.path.insert(0, str(BACKEND_DIR))
+                from mongo_codecs import client_codec_options
+
+                db = AsyncIOMotorClient(args.mongo, **client_codec_options())[args.db_name]
+            target = args.url
+        else:
+            server, transport = await stack.enter_async_context(open_inprocess_app(args))
+            http = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+            db = server.db
+            target = f"in-process ({args.mongo})"
+
+        http = await stack.enter_async_context(http)
+        workload = Workload(http, db, args)
+        await workload.login()
+        await workload.seed()
+        if not workload.archive_periods:
+            mix.pop("create_archive", None)
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            client_loop(workload, recorder, mix, deadline, args.seed + client_id)
+            for client_id in range(args.clients)
+        ])
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "target": target,
+        "clients": args.clients,
+        "duration_s": args.duration,
+        "seeded_cars": len(workload.car_ids),
+        "photo_kb": args.photo_kb,
+        "mix": mix,
+        **recorder.report(elapsed),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server; omit to boot the app in-process")
+    parser.add_argument("--mongo", default="memory",
+                        help="'memory' for the in-memory Motor stand-in or a MongoDB URL (default: memory)")
+    parser.add_argument("--cache", default="memory",
+                        help='Cache backend for the in-process app: "memory", "fakeredis" or a redis:// URL')
+    parser.add_argument("--db-name", default="dealership_loadtest")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run the mix")
+    parser.add_argument("--cars", type=int, default=500, help="Cars seeded through CSV import")
+    parser.add_argument("--photo-kb", type=int, default=150, help="Size of each verification photo")
+    parser.add_argument("--csv-rows", type=int, default=50, help="Rows per csv_import operation")
+    parser.add_argument("--archive-periods", type=int, default=20, help="Past periods seeded for archiving")
+    parser.add_argument("--cars-per-archive", type=int, default=50)
+    parser.add_argument("--mix", action="append", default=[], metavar="OP=WEIGHT",
+                        help="Override an operation weight, e.g. --mix csv_import=0")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
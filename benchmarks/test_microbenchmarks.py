@@ -0,0 +1,123 @@
+"""Microbenchmarks for the per-document hot paths of server.py.
+
+Run with ``pytest benchmarks`` (requires pytest-benchmark); see pytest.ini for
+how results are stored per commit and compared. Helpers are always called on
+copies because parse_from_mongo mutates the documents it is given.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import server
+
+
+# Model construction
+@pytest.mark.benchmark(group="models")
+def test_car_from_mongo(benchmark, car_docs):
+    benchmark(lambda: [server.Car(**server.parse_from_mongo(dict(doc))) for doc in car_docs])
+
+
+@pytest.mark.benchmark(group="models")
+def test_car_from_mongo_with_photos(benchmark, car_docs_with_photos):
+    benchmark(lambda: [server.Car(**server.parse_from_mongo(dict(doc))) for doc in car_docs_with_photos])
+
+
+@pytest.mark.benchmark(group="models")
+def test_monthly_archive(benchmark, car_docs):
+    archive = {
+        "id": "b1c7c1a2-8f0e-4a53-9d3e-1f5c2b7d9e01",
+        "month": 2,
+        "year": 2024,
+        "archive_name": "Februar 2024 Inventur",
+        "total_cars": len(car_docs),
+        "present_cars": sum(1 for doc in car_docs if doc["status"] == "present"),
+        "absent_cars": sum(1 for doc in car_docs if doc["status"] == "absent"),
+        "cars_data": [dict(doc) for doc in car_docs],
+        "archived_at": datetime(2024, 2, 29, 18, tzinfo=timezone.utc).isoformat(),
+        "archived_by": "5d0f3c1e-2a4b-4c6d-8e9f-0a1b2c3d4e5f",
+    }
+    benchmark(lambda: server.MonthlyArchive(**server.parse_from_mongo(dict(archive))))
+
+
+@pytest.mark.benchmark(group="models")
+def test_user_response(benchmark):
+    user = server.prepare_for_mongo(
+        server.User(username="verkauf", password_hash="$2b$12$" + "x" * 53).dict()
+    )
+    benchmark(lambda: server.UserResponse(**server.parse_from_mongo(dict(user))))
+
+
+# Storage helpers
+@pytest.mark.benchmark(group="storage")
+def test_prepare_for_mongo(benchmark, car_docs):
+    cars = [server.Car(**server.parse_from_mongo(dict(doc))) for doc in car_docs]
+    benchmark(lambda: [server.prepare_for_mongo(car.dict()) for car in cars])
+
+
+@pytest.mark.benchmark(group="storage")
+def test_parse_from_mongo(benchmark, car_docs):
+    benchmark(lambda: [server.parse_from_mongo(dict(doc)) for doc in car_docs])
+
+
+# JSON encoding of list responses (the work FastAPI does for response_model=List[Car])
+@pytest.mark.benchmark(group="json")
+def test_encode_car_list(benchmark, car_docs):
+    cars = [server.Car(**server.parse_from_mongo(dict(doc))) for doc in car_docs]
+    benchmark(lambda: json.dumps(jsonable_encoder(cars)).encode("utf-8"))
+
+
+@pytest.mark.benchmark(group="json")
+def test_encode_car_list_with_photos(benchmark, car_docs_with_photos):
+    cars = [server.Car(**server.parse_from_mongo(dict(doc))) for doc in car_docs_with_photos]
+    benchmark(lambda: json.dumps(jsonable_encoder(cars)).encode("utf-8"))
+
+
+# JWT
+@pytest.mark.benchmark(group="jwt")
+def test_jwt_encode(benchmark):
+    benchmark(server.create_access_token, {"sub": "admin"}, timedelta(minutes=server.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+@pytest.mark.benchmark(group="jwt")
+def test_jwt_decode(benchmark):
+    token = server.create_access_token({"sub": "admin"}, timedelta(minutes=server.ACCESS_TOKEN_EXPIRE_MINUTES))
+    benchmark(jwt.decode, token, server.settings.jwt_secret_key, algorithms=[server.ALGORITHM])
+
+
+# orjson path used for trusted documents (STRICT_RESPONSE_VALIDATION off)
+@pytest.mark.benchmark(group="json")
+def test_trusted_orjson_car_list(benchmark, car_docs):
+    benchmark(lambda: server.ORJSONResponse(
+        [server.trusted_payload(server.Car, dict(doc)) for doc in car_docs]
+    ).body)
+
+
+@pytest.mark.benchmark(group="json")
+def test_trusted_orjson_car_list_with_photos(benchmark, car_docs_with_photos):
+    benchmark(lambda: server.ORJSONResponse(
+        [server.trusted_payload(server.Car, dict(doc)) for doc in car_docs_with_photos]
+    ).body)
+
+
+# Autocomplete
+@pytest.fixture(scope="module")
+def model_index():
+    from suggest_index import PrefixIndex
+
+    index = PrefixIndex()
+    for number in range(5000):
+        index.add(f"Model {number:04d}", count=number % 17 + 1)
+    return index
+
+
+@pytest.mark.benchmark(group="suggest")
+def test_suggest_prefix(benchmark, model_index):
+    benchmark(lambda: model_index.suggest("model 12", limit=10))
+
+
+@pytest.mark.benchmark(group="suggest")
+def test_suggest_short_prefix(benchmark, model_index):
+    benchmark(lambda: model_index.suggest("m", limit=10))
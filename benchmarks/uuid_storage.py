@@ -0,0 +1,94 @@
+"""Compare string and Binary UUID ids in a real MongoDB.
+
+Fills two scratch collections with the same generated cars, one with 36-byte
+string ids and one with 16-byte Binary (subtype 4) ids, builds the unique id
+index on both and reports storage size, id index size and the average
+find_one-by-id latency as JSON:
+
+    python benchmarks/uuid_storage.py --mongo mongodb://localhost:27017 --cars 50000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from generate_inventory import InventoryGenerator
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+async def fill(collection, docs, batch_size=1000):
+    await collection.drop()
+    for offset in range(0, len(docs), batch_size):
+        await collection.insert_many([dict(doc) for doc in docs[offset:offset + batch_size]], ordered=False)
+    await collection.create_index("id", name="id", unique=True)
+
+
+async def measure(db, name, docs, lookups):
+    collection = db[name]
+    await fill(collection, docs)
+    stats = await db.command("collStats", name)
+
+    start = time.perf_counter()
+    for value in lookups:
+        await collection.find_one({"id": value}, {"_id": 0, "id": 1})
+    lookup_ms = (time.perf_counter() - start) * 1000 / len(lookups)
+
+    return {
+        "storage_bytes": stats["storageSize"],
+        "avg_document_bytes": stats.get("avgObjSize"),
+        "id_index_bytes": stats["indexSizes"]["id"],
+        "total_index_bytes": stats["totalIndexSize"],
+        "avg_find_one_ms": round(lookup_ms, 4),
+    }
+
+
+async def main(args):
+    sys.path.insert(0, str(BACKEND_DIR))
+    from mongo_codecs import client_codec_options, encode_document
+
+    client = AsyncIOMotorClient(args.mongo, **client_codec_options())
+    db = client[args.db_name]
+    generator = InventoryGenerator(seed=args.seed)
+    binary_docs = [encode_document(car) for car in generator.cars(args.cars, with_photos=False)]
+    # Identical documents apart from the id representation
+    string_docs = [{**doc, "id": str(doc["id"])} for doc in binary_docs]
+
+    rng = random.Random(args.seed)
+    picks = [rng.randrange(len(binary_docs)) for _ in range(args.lookups)]
+    try:
+        report = {
+            "cars": args.cars,
+            "lookups": args.lookups,
+            "string": await measure(db, "uuid_bench_string", string_docs,
+                                    [string_docs[i]["id"] for i in picks]),
+            "binary": await measure(db, "uuid_bench_binary", binary_docs,
+                                    [binary_docs[i]["id"] for i in picks]),
+        }
+    finally:
+        if not args.keep:
+            await db.uuid_bench_string.drop()
+            await db.uuid_bench_binary.drop()
+        client.close()
+    print(json.dumps(report, indent=2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="dealership_bench")
+    parser.add_argument("--cars", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections for inspection")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
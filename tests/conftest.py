@@ -0,0 +1,70 @@
+import dataclasses
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "benchmarks"))
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+# Settings.from_env() reads these; no I/O happens until an app's lifespan runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dealership_tests")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+ADMIN = {"username": "admin", "password": "admin123"}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def app_settings(**overrides):
+    """Settings of an in-process app: no background maintenance, no bus (mongomock has no tailable cursors)"""
+    import server
+
+    return dataclasses.replace(server.Settings.from_env(), background_maintenance=False,
+                               cache_pubsub=False, **overrides)
+
+
+@pytest.fixture
+def settings_overrides():
+    """Overridden by tests that need other settings"""
+    return {}
+
+
+@pytest.fixture
+async def app(settings_overrides):
+    """server.py's app running against a fresh in-memory database"""
+    import server
+    from load_test import mongomock_client
+
+    app = server.create_app(app_settings(**settings_overrides), mongo_client=mongomock_client())
+    async with app.router.lifespan_context(app):
+        await server.ensure_indexes()
+        await server.build_period_stats()
+        await server.create_default_admin()
+        yield app
+
+
+@pytest.fixture
+def server(app):
+    """The server module, its globals bound to the running app"""
+    import server
+
+    return server
+
+
+@pytest.fixture
+async def http(app):
+    """Client of the running app, logged in as the default admin"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/auth/login", json=ADMIN)
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        yield client
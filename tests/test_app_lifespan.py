@@ -0,0 +1,32 @@
+import httpx
+import pytest
+
+import server
+from load_test import mongomock_client
+from tests.conftest import app_settings
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_lifespan_can_run_again():
+    # Every body compressed on the lifespan's executor
+    app = server.create_app(app_settings(compression_min_size=1, compression_thread_threshold=1),
+                            mongo_client=mongomock_client())
+    for _ in range(2):
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+                response = await http.get("/healthz", headers={"Accept-Encoding": "gzip"})
+            assert response.status_code == 200
+            assert response.headers["content-encoding"] == "gzip"
+            assert app.state.compression_executor is not None
+        assert app.state.compression_executor is None
+
+
+async def test_only_one_app_runs_at_a_time(app):
+    with pytest.raises(RuntimeError):
+        server.create_app(app_settings(), mongo_client=mongomock_client())
+    with pytest.raises(RuntimeError):
+        async with app.router.lifespan_context(app):
+            pass
+
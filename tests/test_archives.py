@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_archive(http):
+    response = await http.post("/api/cars", json={"make": "Skoda", "model": "Fabia", "number": "101",
+                                                  "vin": "TMBJJ7NJ1NZ000001"})
+    response.raise_for_status()
+    now = datetime.now(timezone.utc)
+    response = await http.post("/api/archives/create-monthly",
+                               json={"month": now.month, "year": now.year, "archive_name": "This month"})
+    response.raise_for_status()
+    return response.json()
+
+
+async def test_cleanup_drops_cached_archive_list(http, server):
+    archive = await create_archive(http)
+    await server.db.monthly_archives.update_one(
+        {"id": server.id_query(archive["id"])},
+        {"$set": {"archived_at": datetime.now(timezone.utc) - timedelta(days=200)}},
+    )
+    response = await http.get("/api/archives")
+    assert [item["id"] for item in response.json()] == [archive["id"]]
+    response = await http.get(f"/api/archives/{archive['id']}")
+    assert response.status_code == 200
+
+    await server.cleanup_old_archives()
+
+    response = await http.get("/api/archives")
+    assert response.json() == []
+    response = await http.get(f"/api/archives/{archive['id']}")
+    assert response.status_code == 404
+    response = await http.get("/api/vehicles/TMBJJ7NJ1NZ000001/history")
+    assert response.json()["entries"] == []
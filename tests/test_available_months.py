@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import period_stats
+from generate_inventory import InventoryGenerator, insert_cars
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def periods(server):
+    generator = InventoryGenerator(seed=4)
+    periods = generator.past_periods(13) + [(generator.as_of.month, generator.as_of.year)]
+    for count, (month, year) in enumerate(periods, start=1):
+        await insert_cars(server.db, generator.cars(count, month, year, with_photos=False))
+    return periods[::-1]  # Newest first
+
+
+async def test_pages_newest_first_with_total(http, periods):
+    response = await http.get("/api/cars/available-months")
+
+    assert response.headers["x-total-count"] == "14"
+    page = response.json()
+    assert [(item["month"], item["year"]) for item in page] == periods[:12]
+    assert page[0]["car_count"] == 14
+    month, year = periods[0]
+    assert page[0]["month_name"] == period_stats.MONTH_NAMES[month - 1]
+
+    response = await http.get("/api/cars/available-months", params={"offset": 12, "limit": 5})
+    assert [(item["month"], item["year"]) for item in response.json()] == periods[12:]
+
+
+async def test_index_is_cached_until_a_write(server, periods, monkeypatch):
+    index = period_stats.PeriodIndex(max_age=60)
+    loads = 0
+    available_periods = period_stats.available_periods
+
+    async def counted(db):
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return await available_periods(db)
+
+    monkeypatch.setattr(period_stats, "available_periods", counted)
+    monkeypatch.setattr(period_stats, "period_index", index)
+
+    results = await asyncio.gather(*(index.get(server.db) for _ in range(5)))
+    assert loads == 1
+    assert all(result is results[0] for result in results)
+    await index.get(server.db)
+    assert loads == 1
+
+    # Counter writes of this process invalidate the index
+    month, year = periods[0]
+    await insert_cars(server.db, InventoryGenerator(seed=5).cars(1, month, year, with_photos=False))
+    entries = await index.get(server.db)
+    assert loads == 2
+    assert entries[0]["car_count"] == 15
+
+
+async def test_writes_of_other_workers_show_up_after_max_age(server, periods):
+    index = period_stats.PeriodIndex(max_age=0.05)
+    before = await index.get(server.db)
+    await server.db.period_stats.delete_many({"year": periods[0][1], "month": periods[0][0]})
+
+    assert await index.get(server.db) is before
+    await asyncio.sleep(0.06)
+    assert len(await index.get(server.db)) == 13
+
+
+async def test_total_count_header_is_exposed_to_browsers(http, periods):
+    response = await http.get("/api/cars/available-months", headers={"Origin": "http://localhost:3000"})
+
+    assert response.headers["x-total-count"] == str(len(periods))
+    assert "X-Total-Count" in response.headers["access-control-expose-headers"]
@@ -0,0 +1,165 @@
+import asyncio
+
+import fakeredis
+import pytest
+from prometheus_client import REGISTRY
+
+from cache import ALL_TAGS, Cache, MemoryCacheBackend, RedisCacheBackend
+
+
+pytestmark = pytest.mark.anyio
+
+
+def backend_errors(operation):
+    return REGISTRY.get_sample_value("cache_backend_errors_total", {"operation": operation}) or 0.0
+
+
+@pytest.fixture(params=["memory", "fakeredis"])
+def backend(request):
+    if request.param == "memory":
+        return MemoryCacheBackend()
+    return RedisCacheBackend(fakeredis.FakeAsyncRedis(), prefix="tests:cache")
+
+
+class Loader:
+    """A load function counting its calls"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"calls": self.calls}
+
+
+class BrokenBackend(MemoryCacheBackend):
+    async def get(self, key):
+        raise ConnectionError("backend down")
+
+    async def set(self, key, versions, value, ttl):
+        raise ConnectionError("backend down")
+
+
+async def test_values_are_cached_until_their_tag_is_invalidated(backend):
+    cache = Cache(backend, "test", ttl=60, tags=["cars"])
+    other = Cache(backend, "other", ttl=60, tags=["users"])
+    load = Loader()
+
+    assert await cache.get_or_load("key", load) == {"calls": 1}
+    assert await cache.get_or_load("key", load) == {"calls": 1}
+    assert await other.get_or_load("key", load) == {"calls": 2}
+
+    await backend.invalidate("cars")
+
+    assert await cache.get_or_load("key", load) == {"calls": 3}
+    assert await other.get_or_load("key", load) == {"calls": 2}
+
+
+async def test_load_racing_a_write_is_not_served(backend):
+    cache = Cache(backend, "test", ttl=60, tags=["cars"])
+    load = Loader()
+
+    async def load_during_write():
+        value = await load()
+        await backend.invalidate("cars")  # Written after the load read the data
+        return value
+
+    assert await cache.get_or_load("key", load_during_write) == {"calls": 1}
+    assert await cache.get_or_load("key", load) == {"calls": 2}
+
+
+async def test_expired_entries_are_reloaded(backend):
+    cache = Cache(backend, "test", ttl=0.05, tags=["cars"])
+    load = Loader()
+
+    await cache.get_or_load("key", load)
+    await asyncio.sleep(0.1)
+
+    assert await cache.get_or_load("key", load) == {"calls": 2}
+
+
+async def test_concurrent_misses_share_one_load(backend):
+    cache = Cache(backend, "test", ttl=60, tags=["cars"])
+    load = Loader(delay=0.01)
+
+    results = await asyncio.gather(*(cache.get_or_load("key", load) for _ in range(10)))
+
+    assert load.calls == 1
+    assert results == [{"calls": 1}] * 10
+
+
+async def test_errors_are_not_cached(backend):
+    cache = Cache(backend, "test", ttl=60, tags=["cars"])
+
+    async def fail():
+        raise ValueError("query failed")
+
+    with pytest.raises(ValueError):
+        await cache.get_or_load("key", fail)
+    assert await cache.get_or_load("key", Loader()) == {"calls": 1}
+
+
+async def test_other_workers_wait_for_the_lock_holder():
+    redis = fakeredis.FakeAsyncRedis()
+    # Two workers: separate backends and caches (so separate SingleFlights) on one server
+    first = Cache(RedisCacheBackend(redis, prefix="tests:cache"), "test", ttl=60, tags=["cars"])
+    second = Cache(RedisCacheBackend(redis, prefix="tests:cache"), "test", ttl=60, tags=["cars"])
+    load = Loader(delay=0.05)
+
+    results = await asyncio.gather(first.get_or_load("key", load), second.get_or_load("key", load))
+
+    assert load.calls == 1
+    assert results == [{"calls": 1}, {"calls": 1}]
+
+
+async def test_all_tags_clears_the_memory_backend():
+    backend = MemoryCacheBackend()
+    cache = Cache(backend, "test", ttl=60, tags=["cars"])
+    load = Loader()
+    await cache.get_or_load("key", load)
+
+    backend.invalidated(ALL_TAGS)
+
+    assert (await backend.stats())["entries"] == 0
+    assert await cache.get_or_load("key", load) == {"calls": 2}
+
+
+async def test_memory_backend_is_bounded_by_bytes():
+    backend = MemoryCacheBackend(max_bytes=10)
+    await backend.set("a", (0,), b"12345", ttl=60)
+    await backend.set("b", (0,), b"12345", ttl=60)
+    await backend.get("a")
+    await backend.set("c", (0,), b"12345", ttl=60)
+    await backend.set("too big", (0,), b"12345678901", ttl=60)
+
+    assert await backend.get("a") is not None
+    assert await backend.get("b") is None
+    assert await backend.get("too big") is None
+    assert (await backend.stats())["size_bytes"] == 10
+
+
+async def test_backend_errors_fail_open():
+    cache = Cache(BrokenBackend(), "test", ttl=60, tags=["cars"])
+    load = Loader()
+    errors = backend_errors("get")
+
+    assert await cache.get_or_load("key", load) == {"calls": 1}
+    assert await cache.get_or_load("key", load) == {"calls": 2}
+    assert backend_errors("get") == errors + 2
+
+
+async def test_deleted_users_lose_access(http):
+    response = await http.post("/api/auth/create-user", json={"username": "clerk", "password": "clerk123",
+                                                             "role": "user"})
+    response.raise_for_status()
+    user_id = response.json()["id"]
+    response = await http.post("/api/auth/login", json={"username": "clerk", "password": "clerk123"})
+    clerk = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await http.get("/api/auth/me", headers=clerk)).status_code == 200
+    assert (await http.get("/api/auth/me", headers=clerk)).status_code == 200
+
+    (await http.delete(f"/api/auth/users/{user_id}")).raise_for_status()
+
+    assert (await http.get("/api/auth/me", headers=clerk)).status_code == 401
@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+
+import pytest
+
+from cache_bus import ALL_TOPICS, EVENTS_COLLECTION, RESUME_MARGIN, InvalidationBus
+
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeTailableCursor:
+    """Iterates like Motor's tailable-await cursor: an empty batch ends the iteration, not the cursor"""
+
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.since = query.get("at", {}).get("$gte")
+        self.alive = True
+        self._position = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self.alive and self._position < len(self.collection.events):
+            event = self.collection.events[self._position]
+            self._position += 1
+            if self.since is None or event["at"] >= self.since:
+                return event
+        await asyncio.sleep(0.01)  # The server's await time
+        raise StopAsyncIteration
+
+
+class FakeEventsCollection:
+    def __init__(self):
+        self.events = []
+        self.cursors = []
+        self._ids = itertools.count()
+
+    async def insert_one(self, event):
+        self.events.append({"_id": next(self._ids), **event})
+
+    def find(self, query, cursor_type=None):
+        self.cursors.append(FakeTailableCursor(self, query))
+        return self.cursors[-1]
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.events = FakeEventsCollection()
+
+    def __getitem__(self, name):
+        assert name == EVENTS_COLLECTION
+        return self.events
+
+    async def create_collection(self, name, **options):
+        pass
+
+
+async def wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+@pytest.fixture
+async def bus():
+    bus = InvalidationBus(FakeDatabase(), heartbeat_interval=0.02)
+    bus.topics = []
+    bus.subscribe(bus.topics.append)
+    task = asyncio.create_task(bus.run())
+    yield bus
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_events_of_other_workers_reach_subscribers(bus):
+    other = InvalidationBus(bus._db)
+    await wait_for(lambda: bus.healthy_within(1.0))
+
+    await other.publish("cars")
+    await bus.publish("users")  # Its own: applied by the writer already
+    await wait_for(lambda: bus.topics)
+    # Several empty batches and heartbeats later
+    await asyncio.sleep(0.1)
+
+    assert bus.topics == ["cars"]
+    assert len(bus._db.events.cursors) == 1
+
+
+async def test_dead_cursor_resumes_from_the_last_event(bus):
+    other = InvalidationBus(bus._db)
+    await wait_for(lambda: bus._db.events.cursors)
+    await other.publish("cars")
+    await wait_for(lambda: bus.topics)
+    cars_at = bus._db.events.events[-1]["at"]
+
+    bus._db.events.cursors[0].alive = False
+    await wait_for(lambda: len(bus._db.events.cursors) == 2)
+    await other.publish("archives")
+    await wait_for(lambda: len(bus.topics) == 3)
+
+    # Told that events may have been missed; "cars" is read again but not replayed
+    assert bus.topics == ["cars", ALL_TOPICS, "archives"]
+    assert bus._db.events.cursors[1].since <= cars_at
+    assert bus._db.events.cursors[1].since > bus._db.events.events[0]["at"] - RESUME_MARGIN
+
+
+async def test_changes_reach_the_subscribers_asking_for_them(bus):
+    changes = []
+    bus.subscribe(lambda topic, published: changes.append((topic, published)), changes=True)
+    other = InvalidationBus(bus._db)
+    await wait_for(lambda: bus._db.events.cursors)
+
+    await other.publish("cars", [[None, {"make": "Cupra"}]])
+    await other.publish("users")
+    await wait_for(lambda: len(changes) == 2)
+
+    assert changes == [("cars", [[None, {"make": "Cupra"}]]), ("users", None)]
+    assert bus.topics == ["cars", "users"]
+
+
+async def test_car_writes_publish_the_indexed_fields(http, server, monkeypatch):
+    published = []
+
+    class RecordingBus:
+        async def publish(self, topic, changes=None):
+            published.append((topic, changes))
+
+    monkeypatch.setattr(server, "invalidation_bus", RecordingBus())
+    response = await http.post("/api/cars", json={"make": "Cupra", "model": "Born", "number": "1"})
+    car = response.json()
+    response = await http.patch(f"/api/cars/{car['id']}/status",
+                                json={"status": "present", "car_photo": "data:,car", "vin_photo": "data:,vin"})
+    response.raise_for_status()
+    await http.delete("/api/cars")
+
+    (_, created), (_, updated), (_, deleted) = [event for event in published if event[0] == "cars"]
+    assert created[0][0] is None and created[0][1]["make"] == "Cupra"
+    old, new = updated[0]
+    assert (old["status"], new["status"]) == ("absent", "present")
+    assert set(new) == set(server.INVENTORY_FIELDS)
+    assert deleted is None
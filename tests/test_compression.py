@@ -0,0 +1,92 @@
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from compression import COMPRESSORS, CompressedBodyCache, CompressionMiddleware, negotiate_encoding
+
+
+BODY = {"cars": [{"make": "Volkswagen", "model": "Golf"}] * 200}
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("deflate, gzip;q=0.1", "gzip"),
+    ("*;q=0, gzip", "gzip"),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_ties_use_server_preference_and_wildcards_match():
+    preferred = next(iter(COMPRESSORS))
+    assert negotiate_encoding("gzip, br, zstd") == preferred
+    assert negotiate_encoding("*") == preferred
+    assert negotiate_encoding(f"*, {preferred};q=0") == (list(COMPRESSORS) + [None])[1]
+
+
+def test_body_cache_is_bounded():
+    cache = CompressedBodyCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.put("c", b"123")
+    cache.put("too big", b"x" * 11)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == b"12345"
+    assert cache.get("too big") is None
+
+
+@pytest.fixture
+def compressed_app():
+    async def listing(request):
+        return JSONResponse(BODY)
+
+    async def archive(request):
+        return JSONResponse(BODY, headers={"ETag": '"archive-1"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def photo(request):
+        return Response(b"\xff\xd8" * 2000, media_type="image/jpeg")
+
+    app = Starlette(routes=[Route("/listing", listing), Route("/archive", archive), Route("/small", small),
+                            Route("/photo", photo)])
+    cache = CompressedBodyCache()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        yield CompressionMiddleware(app, minimum_size=512, thread_threshold=1024, cache=cache,
+                                    executor=lambda: executor), cache
+
+
+@pytest.mark.anyio
+async def test_middleware_compresses_what_is_worth_it(compressed_app):
+    app, cache = compressed_app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        listing = await http.get("/listing", headers={"Accept-Encoding": "gzip"})
+        small = await http.get("/small", headers={"Accept-Encoding": "gzip"})
+        photo = await http.get("/photo", headers={"Accept-Encoding": "gzip"})
+        plain = await http.get("/listing", headers={"Accept-Encoding": "identity"})
+        for _ in range(2):
+            archive = await http.get("/archive", headers={"Accept-Encoding": "gzip"})
+
+    assert listing.headers["content-encoding"] == "gzip"
+    assert listing.headers["vary"] == "Accept-Encoding"
+    assert listing.json() == BODY  # httpx decodes gzip
+    assert "content-encoding" not in small.headers and small.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in photo.headers
+    assert "content-encoding" not in plain.headers
+    # Responses with an ETag are compressed once per encoding
+    assert archive.json() == BODY
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert gzip.decompress(cache.get(('"archive-1"', "gzip"))) == archive.content
@@ -0,0 +1,45 @@
+import logging
+
+import pytest
+
+from generate_inventory import InventoryGenerator, csv_bytes
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def settings_overrides():
+    # The lifespan configures logging from the settings
+    return {"log_level": "INFO"}
+
+
+async def test_import_logs_summary_at_info(http, caplog):
+    cars = InventoryGenerator(seed=3).cars(5, with_photos=False)
+
+    with caplog.at_level(logging.INFO, logger="server"):
+        response = await http.post("/api/cars/import-csv",
+                                   files={"file": ("stock.csv", csv_bytes(cars), "text/csv")})
+
+    assert response.status_code == 200
+    assert response.json()["imported_count"] == 5
+    summary = next(record for record in caplog.records if record.getMessage() == "CSV import complete")
+    assert summary.csv_filename == "stock.csv"
+    assert summary.rows == 5
+
+
+async def test_failed_import_is_logged_with_its_filename(http, server, caplog, monkeypatch):
+    def broken(logger):
+        raise RuntimeError("sampler unavailable")
+
+    monkeypatch.setattr(server, "RowSampler", broken)
+    cars = InventoryGenerator(seed=3).cars(1, with_photos=False)
+
+    with caplog.at_level(logging.INFO, logger="server"):
+        response = await http.post("/api/cars/import-csv",
+                                   files={"file": ("stock.csv", csv_bytes(cars), "text/csv")})
+
+    assert response.status_code == 500
+    failure = next(record for record in caplog.records if record.getMessage() == "CSV import failed")
+    assert failure.csv_filename == "stock.csv"
+    assert failure.exc_info is not None
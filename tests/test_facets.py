@@ -0,0 +1,40 @@
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+CARS = [("Volkswagen", "Golf", False), ("Volkswagen", "Golf", True), ("Volkswagen", "Polo", False),
+        ("Skoda", "Fabia", False)]
+
+
+@pytest.fixture
+async def cars(http):
+    for number, (make, model, is_consignment) in enumerate(CARS):
+        response = await http.post("/api/cars", json={"make": make, "model": model, "number": str(number),
+                                                      "is_consignment": is_consignment})
+        response.raise_for_status()
+
+
+async def test_facet_counts(http, cars):
+    response = await http.get("/api/cars/facets")
+
+    facets = response.json()
+    assert facets["total"] == 4
+    assert facets["make"] == [{"value": "Volkswagen", "count": 3}, {"value": "Skoda", "count": 1}]
+    assert facets["model"][0] == {"make": "Volkswagen", "model": "Golf", "count": 2}
+    assert facets["status"] == [{"value": "absent", "count": 4}]
+    assert facets["is_consignment"] == [{"value": False, "count": 3}, {"value": True, "count": 1}]
+
+
+async def test_facets_follow_filters_and_writes(http, cars):
+    response = await http.get("/api/cars/facets", params={"make": "skoda"})
+    assert response.json()["total"] == 1
+
+    response = await http.post("/api/cars", json={"make": "Skoda", "model": "Kamiq", "number": "99"})
+    response.raise_for_status()
+
+    response = await http.get("/api/cars/facets", params={"make": "skoda"})
+    assert response.json()["total"] == 2
+    assert response.json()["model"] == [{"make": "Skoda", "model": "Fabia", "count": 1},
+                                        {"make": "Skoda", "model": "Kamiq", "count": 1}]
+
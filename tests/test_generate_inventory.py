@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import period_stats
+from generate_inventory import InventoryGenerator, csv_bytes, vin_check_digit, write_mongo
+
+
+AS_OF = datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+
+def test_same_seed_same_inventory():
+    first = list(InventoryGenerator(seed=11, as_of=AS_OF).cars(50))
+    second = list(InventoryGenerator(seed=11, as_of=AS_OF).cars(50))
+    other = list(InventoryGenerator(seed=12, as_of=AS_OF).cars(50))
+
+    assert first == second
+    assert first != other
+    assert csv_bytes(first) == csv_bytes(second)
+
+
+def test_cars_are_valid():
+    cars = list(InventoryGenerator(seed=11, as_of=AS_OF).cars(500))
+
+    vins = [car["vin"] for car in cars if car["vin"]]
+    assert all(len(vin) == 17 and vin[8] == vin_check_digit(vin) for vin in vins)
+    assert len(set(vins)) == len(vins)
+    assert len({car["number"] for car in cars}) == 500
+    assert all(car["purchase_date"] < "2024-02-01" for car in cars)
+    assert {(car["current_month"], car["current_year"]) for car in cars} == {(2, 2024)}
+
+
+def test_past_periods_cross_the_year():
+    assert InventoryGenerator(as_of=AS_OF).past_periods(3) == [(11, 2023), (12, 2023), (1, 2024)]
+
+
+@pytest.mark.anyio
+async def test_write_mongo_matches_what_the_api_writes(server):
+    totals = await write_mongo(InventoryGenerator(seed=11, as_of=AS_OF), server.db, 30, months=2,
+                               cars_per_period=10, batch_size=7)
+
+    assert totals == {"active_cars": 30, "archived_cars": 20, "archives": 2}
+    assert await server.db.cars.count_documents({"archive_status": "active"}) == 30
+    assert await server.db.monthly_archives.count_documents({}) == 2
+    # The counters were maintained like the API would
+    assert await period_stats.reconcile(server.db) == 0
+    counts = await period_stats.read_counts(server.db, month=2, year=2024)
+    assert counts[False]["total"] + counts[True]["total"] == 30
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from health import CachedProbe, PoolMonitor
+
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = ("mongo", 27017)
+
+
+async def test_probes_are_unauthenticated(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        live = await http.get("/healthz")
+        ready = await http.get("/readyz")
+
+    assert live.status_code == 200 and live.json()["status"] == "alive"
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert {"mongo", "mongo_pool", "event_loop", "queues", "cache"} <= set(ready.json()["checks"])
+
+
+@pytest.mark.parametrize("settings_overrides", [{"mongo_max_pool_size": 2, "health_cache_seconds": 0}])
+async def test_exhausted_pool_is_not_ready(http, server):
+    event = SimpleNamespace(address=ADDRESS)
+    server.pool_monitor.pool_created(event)
+    server.pool_monitor.connection_checked_out(event)
+    server.pool_monitor.connection_checked_out(event)
+
+    response = await http.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["mongo_pool"] == {
+        "ok": False, "utilisation": 1.0, "max_pool_size": 2, "checked_out": {"mongo:27017": 2}
+    }
+
+    server.pool_monitor.connection_checked_in(event)
+    response = await http.get("/readyz")
+    assert response.status_code == 200
+
+
+def test_pool_monitor_counts_per_server():
+    monitor = PoolMonitor()
+    other = SimpleNamespace(address=("replica", 27017))
+    for _ in range(3):
+        monitor.connection_checked_out(SimpleNamespace(address=ADDRESS))
+    monitor.connection_checked_out(other)
+    monitor.connection_checked_in(other)
+    monitor.connection_checked_in(other)
+
+    assert monitor.checked_out() == {"mongo:27017": 3, "replica:27017": 0}
+    assert monitor.utilisation(10) == 0.3
+    monitor.pool_closed(SimpleNamespace(address=ADDRESS))
+    assert monitor.utilisation(10) == 0.0
+
+
+async def test_cached_probe_shares_runs():
+    runs = 0
+
+    async def probe():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        return {"run": runs}
+
+    cached = CachedProbe(probe, ttl=0.05)
+    results = await asyncio.gather(*(cached.get() for _ in range(5)))
+    assert runs == 1 and results == [{"run": 1}] * 5
+
+    await asyncio.sleep(0.06)
+    assert await cached.get() == {"run": 2}
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import period_stats
+from generate_inventory import InventoryGenerator, insert_cars, write_mongo
+from inventory_engine import InventoryEngine
+
+
+pytestmark = pytest.mark.anyio
+
+AS_OF = datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+FILTERS = [
+    {},
+    {"month": 2, "year": 2024},
+    {"month": 1},
+    {"year": 2023},
+    {"make": "volks"},
+    {"make": "^b", "status": "present"},
+    {"model": "a\\d", "is_consignment": False},
+    {"make": "o", "model": "^[cg]", "month": 1, "year": 2024},
+    {"status": "absent", "is_consignment": True},
+    {"search": "golf"},
+    {"search": "^WBA"},
+    {"search": "^1000[4-9]", "status": "present"},
+]
+
+
+@pytest.fixture
+async def inventory(server):
+    generator = InventoryGenerator(seed=5, as_of=AS_OF, consignment_ratio=0.2)
+    await write_mongo(generator, server.db, 150, months=1, cars_per_period=30)
+    await insert_cars(server.db, generator.cars(50, month=1, year=2024))
+    return server.db
+
+
+@pytest.fixture
+async def engine(inventory):
+    engine = InventoryEngine()
+    task = asyncio.create_task(engine.run(inventory))
+    while not engine.usable():
+        await asyncio.sleep(0.01)
+    yield engine
+    task.cancel()
+
+
+async def matching_ids(db, query):
+    return {car["_id"] async for car in db.cars.find(query, {"_id": 1})}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+async def test_select_agrees_with_mongodb(server, inventory, engine, filters):
+    ids = engine.select(**filters)
+
+    expected = await matching_ids(inventory, server.car_filter_query(**filters))
+    assert len(ids) == len(set(ids))
+    assert set(ids) == expected
+
+
+@pytest.mark.parametrize("period", [(None, None), (2, 2024), (1, 2024), (None, 2024), (12, 2023)])
+async def test_counts_agree_with_period_stats(inventory, engine, period):
+    month, year = period
+    counts = await period_stats.read_counts(inventory, month=month, year=year)
+
+    assert engine.counts(month=month, year=year) == {"regular": counts[False], "consignment": counts[True]}
+
+
+async def test_invalid_patterns_are_left_to_mongodb(engine):
+    assert engine.select(make="(") is None
+    assert engine.select(search="[") is None
+
+
+async def test_writes_are_applied_in_place(server, inventory, engine):
+    car = await inventory.cars.find_one({"make": "BMW", "archive_status": "active"})
+    renamed = {**car, "make": "Cupra", "status": "present"}
+
+    engine.apply(car, renamed)
+    assert engine.select(make="cupra") == [car["_id"]]
+    assert car["_id"] not in engine.select(make="bmw")
+
+    engine.apply(renamed, {**renamed, "archive_status": "archived"})
+    assert engine.select(make="cupra") == []
+
+    engine.apply(None, renamed)
+    assert engine.select(make="cupra") == [car["_id"]]
+    engine.apply(renamed, None)
+    assert engine.select(make="cupra") == []
+    assert engine.usable()
+
+
+async def test_writes_of_other_workers_are_applied_in_place(server, inventory, engine):
+    car = await inventory.cars.find_one({"make": "BMW", "archive_status": "active"})
+    old = server.indexed_fields(car)
+    loaded_at = engine.loaded_at
+
+    engine.invalidated("cars", [[old, {**old, "make": "Cupra"}]])
+    engine.invalidated("users", None)
+
+    assert engine.usable()
+    assert engine.select(make="cupra") == [car["_id"]]
+    assert engine.loaded_at == loaded_at
+    engine.invalidated("cars", None)
+    assert not engine.usable()
+
+
+async def test_bulk_writes_make_it_unusable_until_reloaded(inventory, engine):
+    await insert_cars(inventory, InventoryGenerator(seed=6, as_of=AS_OF).cars(10))
+    engine.mark_stale()
+    assert not engine.usable()
+
+    while not engine.usable():
+        await asyncio.sleep(0.01)
+    assert engine.stats()["cars"] == 210
+
+
+@pytest.mark.parametrize("settings_overrides", [{"inventory_engine": True}])
+async def test_listing_and_stats_use_the_engine(http, server):
+    while not server.inventory_engine.usable():
+        await asyncio.sleep(0.01)
+    for number, make in enumerate(["Volkswagen", "Volkswagen", "Skoda"]):
+        response = await http.post("/api/cars", json={"make": make, "model": "Golf", "number": str(number)})
+        response.raise_for_status()
+
+    assert server.inventory_engine.usable()
+    assert server.inventory_engine.stats()["cars"] == 3
+    response = await http.get("/api/cars", params={"make": "volks"})
+    assert sorted(car["number"] for car in response.json()) == ["0", "1"]
+    response = await http.get("/api/cars/stats/summary")
+    assert response.json()["total_cars"] == 3
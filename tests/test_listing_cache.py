@@ -0,0 +1,89 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from cache import MemoryCacheBackend
+
+
+pytestmark = pytest.mark.anyio
+
+
+def lookups(result):
+    return REGISTRY.get_sample_value("cache_lookups_total", {"cache": "listings", "result": result}) or 0.0
+
+
+class StubBus:
+    """healthy_within() of an InvalidationBus whose listener is up or down"""
+
+    def __init__(self, healthy):
+        self.healthy = healthy
+
+    def healthy_within(self, seconds):
+        return self.healthy
+
+
+async def add_car(http, make, number):
+    response = await http.post("/api/cars", json={"make": make, "model": "Golf", "number": number})
+    response.raise_for_status()
+    return response.json()
+
+
+async def test_listings_are_served_from_cache_until_a_car_write(http):
+    car = await add_car(http, "Volkswagen", "1")
+    hits = lookups("hit")
+
+    first = await http.get("/api/cars", params={"make": "volkswagen"})
+    second = await http.get("/api/cars", params={"make": "volkswagen"})
+    assert second.content == first.content
+    assert lookups("hit") == hits + 1
+
+    await add_car(http, "Volkswagen", "2")
+    assert len((await http.get("/api/cars", params={"make": "volkswagen"})).json()) == 2
+
+    response = await http.put(f"/api/cars/{car['id']}", json={"make": "Skoda", "model": "Fabia", "number": "1"})
+    response.raise_for_status()
+    assert len((await http.get("/api/cars", params={"make": "volkswagen"})).json()) == 1
+
+    (await http.delete(f"/api/cars/{car['id']}")).raise_for_status()
+    assert [c["number"] for c in (await http.get("/api/cars")).json()] == ["2"]
+
+
+async def test_filters_are_cached_separately(http):
+    await add_car(http, "Volkswagen", "1")
+    await add_car(http, "Skoda", "2")
+
+    assert len((await http.get("/api/cars", params={"make": "skoda"})).json()) == 1
+    assert len((await http.get("/api/cars")).json()) == 2
+    assert len((await http.get("/api/cars", params={"make": "skoda"})).json()) == 1
+
+
+async def test_other_workers_writes_invalidate_through_the_bus():
+    backend = MemoryCacheBackend(bus=StubBus(healthy=True))
+    versions = await backend.tag_versions(["cars"])
+    await backend.set("listings:key", versions, b"[]", ttl=60)
+
+    backend.invalidated("cars")
+
+    assert await backend.tag_versions(["cars"]) != versions
+    assert await backend.tag_versions(["users"]) == (0, 0)
+
+
+async def test_caches_bypass_themselves_while_the_bus_is_unhealthy():
+    bus = StubBus(healthy=False)
+    backend = MemoryCacheBackend(bus=bus)
+    assert not backend.usable()
+    bus.healthy = True
+    assert backend.usable()
+    assert not MemoryCacheBackend(max_bytes=0).usable()
+
+
+async def test_listings_are_read_from_mongodb_while_the_bus_is_unhealthy(http, server, monkeypatch):
+    await add_car(http, "Volkswagen", "1")
+    monkeypatch.setattr(server.cache_backend, "bus", StubBus(healthy=False))
+    bypasses = lookups("bypass")
+
+    await http.get("/api/cars")
+    await server.db.cars.delete_many({})  # A write the cache does not hear about
+    response = await http.get("/api/cars")
+
+    assert response.json() == []
+    assert lookups("bypass") == bypasses + 2
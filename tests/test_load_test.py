@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import pytest
+
+import load_test
+
+
+def test_recorder_reports_percentiles_and_errors():
+    recorder = load_test.Recorder()
+    for millisecond in range(1, 101):
+        recorder.record("list_cars", millisecond / 1000, ok=millisecond != 100)
+    recorder.record("stats", 0.002, ok=True)
+
+    report = recorder.report(elapsed=2.0)
+
+    assert (report["total_requests"], report["total_errors"], report["rps"]) == (101, 1, 50.5)
+    list_cars = report["operations"]["list_cars"]
+    assert (list_cars["p50_ms"], list_cars["p95_ms"], list_cars["p99_ms"], list_cars["max_ms"]) == (
+        51.0, 95.0, 99.0, 100.0
+    )
+    assert report["operations"]["stats"]["errors"] == 0
+
+
+def test_mix_overrides_are_validated():
+    args = load_test.parse_args(["--url", "http://localhost:1", "--mix", "no_such_operation=1"])
+
+    with pytest.raises(SystemExit):
+        asyncio.run(load_test.main(args))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cache", ["memory", "fakeredis"])
+async def test_inprocess_harness_runs_without_errors(cache, tmp_path):
+    output = tmp_path / "report.json"
+    args = load_test.parse_args(["--duration", "1", "--clients", "2", "--cars", "20", "--photo-kb", "1",
+                                 "--cache", cache, "--output", str(output)])
+
+    await load_test.main(args)
+
+    report = json.loads(output.read_text())
+    assert report["seeded_cars"] == 20
+    assert report["total_requests"] > 0
+    assert report["total_errors"] == 0
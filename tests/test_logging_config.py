@@ -0,0 +1,64 @@
+import json
+import logging
+
+import pytest
+
+from logging_config import RowSampler, configure_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_json_records_keep_traceback_as_field(root_logger, capsys):
+    listener = configure_logging(level="INFO", fmt="json")
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        logging.getLogger("tests").exception("Import failed", extra={"rows": 3})
+    listener.stop()
+
+    record = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert record["message"] == "Import failed"
+    assert record["rows"] == 3
+    assert record["exc_info"].startswith("Traceback")
+    assert "ValueError: bad row" in record["exc_info"]
+
+
+def test_text_records_include_traceback(root_logger, capsys):
+    listener = configure_logging(level="INFO", fmt="text")
+    try:
+        raise ValueError("bad row")
+    except ValueError:
+        logging.getLogger("tests").exception("Import failed")
+    listener.stop()
+
+    output = capsys.readouterr().out
+    assert "Import failed" in output
+    assert output.count("ValueError: bad row") == 1
+
+
+def test_stop_detaches_queue_handler(root_logger):
+    listener = configure_logging(level="INFO")
+    assert listener.queue_handler in root_logger.handlers
+
+    listener.stop()
+
+    assert listener.queue_handler not in root_logger.handlers
+
+
+def test_row_sampler_logs_head_then_every_nth_row():
+    logger = logging.getLogger("tests.rows")
+    logger.setLevel(logging.DEBUG)
+    sampler = RowSampler(logger, every=10, head=3)
+
+    assert [row for row in range(1, 31) if sampler()] == [1, 2, 3, 10, 20, 30]
+
+    logger.setLevel(logging.INFO)
+    sampler = RowSampler(logger, every=10, head=3)
+    assert not any(sampler() for _ in range(30))
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from loop_monitor import LoopMonitor
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def blocking(request):
+    time.sleep(0.3)  # Blocks the event loop on purpose
+    return PlainTextResponse("done")
+
+
+async def test_blocking_calls_are_attributed_to_their_route():
+    app = Starlette(routes=[Route("/block", blocking)])
+    monitor = LoopMonitor(app, interval_ms=10, block_threshold_ms=100)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            await http.get("/block")
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    [block] = monitor.blocks
+    assert block["route"] == "/block"
+    assert block["duration_ms"] >= 200
+    assert any("time.sleep" in line for line in block["stack"])
+    [hot_spot] = monitor.hot_spots()
+    assert (hot_spot["route"], hot_spot["count"]) == ("/block", 1)
+
+
+async def test_blocking_calls_endpoint_needs_the_monitor(http):
+    response = await http.get("/api/admin/blocking-calls")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("settings_overrides", [{"loop_monitor": True}])
+async def test_blocking_calls_endpoint(http):
+    response = await http.get("/api/admin/blocking-calls")
+
+    assert response.status_code == 200
+    assert response.json()["threshold_ms"] == 100
+    # E.g. the password hash check of the fixture's login
+    assert all(spot["route"].startswith("/api/") for spot in response.json()["hot_spots"])
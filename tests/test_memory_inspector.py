@@ -0,0 +1,55 @@
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_memory_summary(http):
+    response = await http.get("/api/admin/memory", params={"object_types": 5})
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["rss_mb"] > 0
+    assert summary["tracemalloc"]["tracing"] is False
+    assert len(summary["largest_object_types"]) == 5
+    assert "largest_object_types" not in (await http.get("/api/admin/memory")).json()
+
+
+async def test_snapshots_need_tracemalloc(http):
+    response = await http.post("/api/admin/memory/snapshots")
+    assert response.status_code == 409
+
+
+async def test_snapshot_and_diff(http):
+    response = await http.post("/api/admin/memory/tracemalloc/start", params={"frames": 5})
+    try:
+        assert response.json()["tracing"] is True
+        assert response.json()["frames"] == 5
+
+        base = (await http.post("/api/admin/memory/snapshots", params={"limit": 5})).json()
+        assert len(base["top"]) <= 5
+        retained = [bytearray(1024) for _ in range(1000)]
+
+        response = await http.get("/api/admin/memory/diff", params={"base": base["snapshot_id"]})
+        assert response.status_code == 200
+        diff = response.json()
+        assert diff["target"] > diff["base"]
+        assert any(entry["size_diff_kb"] >= 1000 and "test_memory_inspector.py" in entry["location"]
+                   for entry in diff["diff"])
+
+        response = await http.get(f"/api/admin/memory/snapshots/{diff['target']}",
+                                  params={"group_by": "filename"})
+        assert response.status_code == 200
+        assert response.json()["snapshot_id"] == diff["target"]
+
+        response = await http.get(f"/api/admin/memory/snapshots/{diff['target']}", params={"group_by": "module"})
+        assert response.status_code == 400
+        assert (await http.get("/api/admin/memory/snapshots/999")).status_code == 404
+        assert (await http.get("/api/admin/memory/diff", params={"base": 999})).status_code == 404
+        del retained
+    finally:
+        response = await http.post("/api/admin/memory/tracemalloc/stop")
+
+    status = response.json()
+    assert status["tracing"] is False
+    assert diff["target"] in status["snapshots"]
@@ -0,0 +1,36 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from generate_inventory import InventoryGenerator, csv_bytes
+
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_requests_are_labelled_by_route_template(http):
+    labels = {"method": "GET", "route": "/api/cars/{car_id}", "status": "404"}
+    before = sample("http_requests_total", **labels)
+    unmatched_before = sample("http_requests_total", method="GET", route="<unmatched>", status="404")
+
+    await http.get("/api/cars/00000000-0000-4000-8000-000000000001")
+    await http.get("/api/cars/00000000-0000-4000-8000-000000000002")
+    await http.get("/no-such-page")
+
+    assert sample("http_requests_total", **labels) == before + 2
+    assert sample("http_requests_total", method="GET", route="<unmatched>", status="404") == unmatched_before + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="/api/cars/{car_id}") >= 2
+
+
+async def test_domain_counters_and_exposition(http):
+    before = sample("inventory_cars_imported_total")
+    cars = InventoryGenerator(seed=5).cars(3, with_photos=False)
+    await http.post("/api/cars/import-csv", files={"file": ("cars.csv", csv_bytes(cars), "text/csv")})
+
+    assert sample("inventory_cars_imported_total") == before + 3
+    response = await http.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "inventory_cars_imported_total" in response.text
@@ -0,0 +1,14 @@
+import subprocess
+import sys
+
+from tests.conftest import ROOT_DIR
+
+
+def test_microbenchmarks_run():
+    # Each benchmark once, without timing, so the suite cannot rot between benchmark runs
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "--benchmark-disable"],
+        cwd=ROOT_DIR / "benchmarks", capture_output=True, text=True, timeout=600,
+    )
+
+    assert result.returncode == 0, result.stdout[-2000:]
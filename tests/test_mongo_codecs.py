@@ -0,0 +1,113 @@
+import uuid
+from datetime import date, datetime, timezone
+
+import bson
+import pytest
+from bson.codec_options import CodecOptions
+
+import mongo_codecs
+from mongo_codecs import (
+    client_codec_options,
+    decode_document,
+    decode_trusted,
+    encode_document,
+    id_query,
+    legacy_date_updates,
+    legacy_id_updates,
+)
+
+CAR_ID = "6f1c2a9e-3b7d-4c55-9a0e-2d4f8b1c7e63"
+
+
+def bson_options():
+    options = client_codec_options()
+    return CodecOptions(tz_aware=options["tz_aware"], tzinfo=options["tzinfo"],
+                        uuid_representation=bson.binary.UuidRepresentation.STANDARD,
+                        type_registry=options["type_registry"])
+
+
+def test_purchase_dates_are_stored_as_midnight_utc():
+    stored = encode_document({"purchase_date": "2024-03-05"})
+    assert stored == {"purchase_date": date(2024, 3, 5)}
+
+    read = bson.decode(bson.encode(stored, codec_options=bson_options()), codec_options=bson_options())
+
+    assert read["purchase_date"] == datetime(2024, 3, 5, tzinfo=timezone.utc)
+    assert decode_trusted(read) == {"purchase_date": "2024-03-05"}
+
+
+def test_invalid_purchase_dates_are_stored_unchanged():
+    assert encode_document({"purchase_date": "05.03.2024"}) == {"purchase_date": "05.03.2024"}
+    assert encode_document({"purchase_date": None}) == {"purchase_date": None}
+
+
+def test_legacy_string_timestamps_are_decoded_and_migrated():
+    legacy = {"created_at": "2024-03-05T10:00:00", "updated_at": "2024-03-05T11:00:00+00:00",
+              "purchase_date": "2024-01-31", "archived_at": "not a date"}
+
+    assert legacy_date_updates(legacy) == {
+        "created_at": datetime(2024, 3, 5, 10, tzinfo=timezone.utc),
+        "updated_at": datetime(2024, 3, 5, 11, tzinfo=timezone.utc),
+        "purchase_date": date(2024, 1, 31),
+    }
+    decoded = decode_document({"created_at": "2024-03-05T10:00:00+00:00"})
+    assert decoded["created_at"] == datetime(2024, 3, 5, 10, tzinfo=timezone.utc)
+
+
+@pytest.mark.anyio
+async def test_date_migration_converts_legacy_documents(http, server):
+    response = await http.post("/api/cars", json={"make": "Fiat", "model": "Panda", "number": "1",
+                                                  "purchase_date": "2024-03-05"})
+    car = response.json()
+    await server.db.cars.update_one({"number": "1"}, {"$set": {"created_at": "2024-03-05T10:00:00+00:00",
+                                                              "purchase_date": "2024-03-04"}})
+
+    assert await server.migrate_documents("native_dates", (*mongo_codecs.DATETIME_FIELDS,
+                                                           *mongo_codecs.DATE_FIELDS), legacy_date_updates)
+
+    stored = await server.db.cars.find_one({"number": "1"})
+    assert stored["created_at"] == datetime(2024, 3, 5, 10, tzinfo=timezone.utc)
+    assert stored["purchase_date"] == date(2024, 3, 4)
+    response = await http.get(f"/api/cars/{car['id']}")
+    assert response.json()["purchase_date"] == "2024-03-04"
+
+
+def test_ids_are_stored_as_binary_uuids():
+    stored = encode_document({"id": CAR_ID, "archive_id": "not-a-uuid", "car_id": None})
+    assert stored == {"id": uuid.UUID(CAR_ID), "archive_id": "not-a-uuid", "car_id": None}
+
+    raw = bson.decode(bson.encode(stored, codec_options=bson_options()))
+    assert raw["id"] == bson.Binary(uuid.UUID(CAR_ID).bytes, 4)
+    read = bson.decode(bson.encode(stored, codec_options=bson_options()), codec_options=bson_options())
+    assert decode_trusted(read)["id"] == CAR_ID
+
+
+def test_archived_cars_are_decoded_too():
+    archive = {"id": uuid.UUID(CAR_ID), "cars_data": [{"id": uuid.UUID(CAR_ID), "purchase_date": date(2024, 3, 5)}]}
+
+    assert decode_trusted(archive) == {"id": CAR_ID, "cars_data": [{"id": CAR_ID, "purchase_date": "2024-03-05"}]}
+
+
+def test_id_query(monkeypatch):
+    assert id_query(CAR_ID) == {"$in": [uuid.UUID(CAR_ID), CAR_ID]}
+    assert id_query("legacy-id") == "legacy-id"
+    monkeypatch.setattr(mongo_codecs, "legacy_string_ids", False)
+    assert id_query(CAR_ID) == uuid.UUID(CAR_ID)
+
+
+@pytest.mark.anyio
+async def test_legacy_string_ids_are_found_and_migrated(http, server, monkeypatch):
+    monkeypatch.setattr(mongo_codecs, "legacy_string_ids", True)
+    await server.db.cars.insert_one({"id": CAR_ID, "make": "Fiat", "model": "Panda", "number": "1",
+                                     "archive_status": "active"})
+
+    response = await http.get(f"/api/cars/{CAR_ID}")
+    assert response.json()["id"] == CAR_ID
+    assert legacy_id_updates(await server.db.cars.find_one({"number": "1"})) == {"id": uuid.UUID(CAR_ID)}
+
+    await server.run_migrations()
+
+    assert (await server.db.cars.find_one({"number": "1"}))["id"] == uuid.UUID(CAR_ID)
+    assert mongo_codecs.legacy_string_ids is False
+    response = await http.get(f"/api/cars/{CAR_ID}")
+    assert response.json()["id"] == CAR_ID
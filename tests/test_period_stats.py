@@ -0,0 +1,109 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+import period_stats
+from period_stats import PeriodStatsDelta
+
+
+pytestmark = pytest.mark.anyio
+
+PHOTO = "data:image/jpeg;base64,/9j/4AAQ"
+
+
+def car(status="absent", is_consignment=False, month=3, year=2024, archive_status="active"):
+    return {"status": status, "is_consignment": is_consignment, "current_month": month,
+            "current_year": year, "archive_status": archive_status}
+
+
+def test_delta_accumulates_changes_per_period():
+    delta = PeriodStatsDelta()
+    delta.add(car())
+    delta.add(car(is_consignment=True))
+    delta.change(car(), car(status="present"))
+    delta.change(car(), car(archive_status="archived"))
+
+    assert delta.changes == {
+        (2024, 3, False): {"total": 0, "present": 1, "absent": -1},
+        (2024, 3, True): {"total": 1, "present": 0, "absent": 1},
+    }
+    # Zero counters are left out of the $inc
+    updates = {operation._filter["is_consignment"]: operation._doc for operation in delta.operations()}
+    assert updates == {False: {"$inc": {"present": 1, "absent": -1}}, True: {"$inc": {"total": 1, "absent": 1}}}
+
+
+async def create_car(http, number, **fields):
+    response = await http.post("/api/cars", json={"make": "Opel", "model": "Corsa", "number": str(number), **fields})
+    response.raise_for_status()
+    return response.json()
+
+
+async def test_car_writes_maintain_the_counters(http, server):
+    first = await create_car(http, 1)
+    await create_car(http, 2)
+    await create_car(http, 3, is_consignment=True)
+    response = await http.patch(f"/api/cars/{first['id']}/status",
+                                json={"status": "present", "car_photo": PHOTO, "vin_photo": PHOTO})
+    response.raise_for_status()
+
+    counts = await period_stats.read_counts(server.db)
+    assert counts[False] == {"total": 2, "present": 1, "absent": 1}
+    assert counts[True] == {"total": 1, "present": 0, "absent": 1}
+    response = await http.get("/api/cars/stats/summary")
+    assert response.json()["present_cars"] == 1
+    assert response.json()["consignment_cars"] == 1
+
+    response = await http.delete(f"/api/cars/{first['id']}")
+    response.raise_for_status()
+    counts = await period_stats.read_counts(server.db)
+    assert counts[False] == {"total": 1, "present": 0, "absent": 1}
+    now = datetime.now(timezone.utc)
+    assert await period_stats.available_periods(server.db) == [(now.month, now.year, 2)]
+
+
+async def test_reconcile_repairs_drift(http, server):
+    await create_car(http, 1)
+    await create_car(http, 2)
+    # Writes that bypass the API are not counted
+    await server.db.cars.update_many({}, {"$set": {"status": "present"}})
+    await server.db.period_stats.insert_one({"year": 1999, "month": 1, "is_consignment": False,
+                                             "total": 4, "present": 0, "absent": 4})
+    response = await http.get("/api/cars/stats/summary")
+    assert response.json()["present_cars"] == 0
+
+    response = await http.post("/api/admin/period-stats/reconcile")
+
+    assert response.json()["corrected_documents"] == 2
+    counts = await period_stats.read_counts(server.db)
+    assert counts[False] == {"total": 2, "present": 2, "absent": 0}
+    assert await period_stats.reconcile(server.db) == 0
+    # The cached summary was invalidated
+    response = await http.get("/api/cars/stats/summary")
+    assert response.json()["present_cars"] == 2
+
+
+async def test_reads_count_the_cars_until_the_counters_are_built(http, server, monkeypatch):
+    # First start over cars written before the counters existed
+    await server.db.migrations.delete_one({"_id": period_stats.BUILT_MARKER})
+    monkeypatch.setattr(period_stats, "counters_built", False)
+    cars = [server.prepare_for_mongo({**car(status, month=month), "id": str(uuid.uuid4()), "make": "Opel"})
+            for status, month in (("present", 3), ("absent", 3), ("absent", 4))]
+    await server.db.cars.insert_many(cars)
+
+    response = await http.get("/api/cars/stats/summary", params={"month": 3, "year": 2024})
+    assert response.json()["present_cars"] == 1
+    assert response.json()["absent_cars"] == 1
+    response = await http.get("/api/cars/available-months")
+    assert [(period["month"], period["car_count"]) for period in response.json()] == [(4, 1), (3, 2)]
+
+    await server.build_period_stats()
+
+    assert period_stats.counters_built
+    assert await server.db.period_stats.count_documents({}) == 2
+    counts = await period_stats.read_counts(server.db, month=3)
+    assert counts[False] == {"total": 2, "present": 1, "absent": 1}
+    # Built once: later starts leave repairs to reconcile()
+    await server.db.period_stats.delete_many({})
+    await server.build_period_stats()
+    assert await server.db.period_stats.count_documents({}) == 0
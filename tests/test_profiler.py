@@ -0,0 +1,68 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from profiler import SamplingProfiler
+
+
+pytestmark = pytest.mark.anyio
+
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+async def test_sampling_profiler_counts_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.002, thread_ids={worker.ident})
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert profiler.samples
+    assert {thread_name for thread_name, _ in profiler.samples} == {"busy"}
+    assert all(line.startswith("busy;") and "busy_worker" in line
+               for line in profiler.collapsed().splitlines())
+    speedscope = json.loads(profiler.speedscope("test"))
+    assert [profile["name"] for profile in speedscope["profiles"]] == ["busy"]
+
+
+async def test_process_profile(http):
+    response = await http.get("/api/admin/profile", params={"seconds": 0.1, "format": "collapsed"})
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.collapsed.txt"')
+
+    response = await http.get("/api/admin/profile", params={"seconds": 0.1, "format": "svg"})
+    assert response.status_code == 400
+
+
+async def test_request_profile_covers_the_next_matching_requests(http):
+    async def requests():
+        await asyncio.sleep(0.05)
+        for _ in range(2):
+            await http.get("/api/cars/stats/summary")
+
+    profile, _ = await asyncio.gather(
+        http.get("/api/admin/profile/requests", params={"pattern": "stats/summary$", "count": 2, "timeout": 5}),
+        requests(),
+    )
+
+    assert profile.status_code == 200
+    assert profile.headers["x-profiled-requests"] == "2"
+    assert json.loads(profile.content)["name"] == "2 requests to /api/cars/stats/summary"
+
+
+async def test_request_profile_rejects_unknown_routes(http):
+    response = await http.get("/api/admin/profile/requests", params={"pattern": "^/nothing$"})
+    assert response.status_code == 400
+    response = await http.get("/api/admin/profile/requests", params={"pattern": "("})
+    assert response.status_code == 400
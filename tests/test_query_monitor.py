@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+from query_monitor import QueryMonitor, normalize_shape
+
+
+def run_command(monitor, command_name, command, reply, duration_ms, request_id=1, failed=False):
+    started = SimpleNamespace(command_name=command_name, command=command, connection_id=("db", 27017),
+                              request_id=request_id)
+    monitor.started(started)
+    finished = SimpleNamespace(command_name=command_name, connection_id=("db", 27017), request_id=request_id,
+                               duration_micros=int(duration_ms * 1000), reply=reply)
+    if failed:
+        monitor.failed(finished)
+    else:
+        monitor.succeeded(finished)
+
+
+def test_normalize_shape_keeps_fields_and_operators():
+    assert normalize_shape({"vin": "WVW1", "year": {"$gte": 2020}, "status": {"$in": ["a", "b"]}}) == {
+        "vin": "?", "year": {"$gte": "?"}, "status": {"$in": ["?"]}
+    }
+    assert normalize_shape({"$or": [{"make": "BMW"}, {"model": "Golf"}]}) == {
+        "$or": [{"make": "?"}, {"model": "?"}]
+    }
+
+
+def test_slow_commands_are_grouped_by_shape():
+    monitor = QueryMonitor(slow_threshold_ms=50)
+    reply = {"cursor": {"firstBatch": [{}, {}]}}
+    run_command(monitor, "find", {"find": "cars", "filter": {"vin": "A"}}, reply, 120, request_id=1)
+    run_command(monitor, "find", {"find": "cars", "filter": {"vin": "B"}}, reply, 80, request_id=2)
+    run_command(monitor, "find", {"find": "cars", "filter": {"vin": "C"}}, reply, 5, request_id=3)
+    run_command(monitor, "update", {"update": "cars", "updates": [{"q": {"id": 1}}]}, {"n": 1}, 1,
+                request_id=4, failed=True)
+
+    [slow] = monitor.top_slow_queries()
+    assert (slow["collection"], slow["command"], slow["shape"]) == ("cars", "find", {"vin": "?"})
+    assert (slow["count"], slow["max_ms"], slow["avg_ms"], slow["max_documents"]) == (2, 120.0, 100.0, 2)
+    stats = {(entry["collection"], entry["command"]): entry for entry in monitor.command_stats()}
+    assert stats["cars", "find"]["count"] == 3
+    assert stats["cars", "find"]["documents"] == 6
+    assert stats["cars", "update"]["failures"] == 1
+
+
+def test_housekeeping_commands_are_ignored():
+    monitor = QueryMonitor(slow_threshold_ms=0)
+    run_command(monitor, "ping", {"ping": 1}, {"ok": 1}, 500)
+
+    assert monitor.command_stats() == []
+    assert monitor.top_slow_queries() == []
+
+
+def test_slow_shapes_are_bounded():
+    monitor = QueryMonitor(slow_threshold_ms=0, max_shapes=2)
+    for request_id, (field, duration_ms) in enumerate([("a", 30), ("b", 10), ("c", 20)]):
+        run_command(monitor, "find", {"find": "cars", "filter": {field: 1}}, {}, duration_ms, request_id=request_id)
+
+    assert [entry["shape"] for entry in monitor.top_slow_queries()] == [{"a": "?"}, {"c": "?"}]
+    monitor.reset()
+    assert monitor.top_slow_queries() == []
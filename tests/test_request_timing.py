@@ -0,0 +1,41 @@
+import re
+
+import httpx
+import pytest
+from starlette.responses import PlainTextResponse
+
+from request_timing import ServerTimingMiddleware, record_db_call, track_auth
+
+
+pytestmark = pytest.mark.anyio
+
+
+def timings(header):
+    return {name: float(duration) for name, duration in re.findall(r"(\w+);dur=([\d.]+)", header)}
+
+
+async def test_round_trips_are_accounted_to_their_request():
+    async def endpoint(scope, receive, send):
+        with track_auth():
+            record_db_call(1.5)
+        record_db_call(2.5)
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    app = ServerTimingMiddleware(endpoint, roundtrips_header=True, timing_allow_origin="https://app.example")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        response = await http.get("/")
+
+    header = response.headers["server-timing"]
+    assert timings(header)["db"] == 4.0
+    assert '"2 round trips"' in header
+    assert timings(header)["total"] >= timings(header)["auth"]
+    assert response.headers["x-db-roundtrips"] == "2"
+    assert response.headers["timing-allow-origin"] == "https://app.example"
+
+
+@pytest.mark.parametrize("settings_overrides", [{"server_timing_roundtrips": True}])
+async def test_api_responses_carry_server_timing(http):
+    response = await http.get("/api/cars")
+
+    assert set(timings(response.headers["server-timing"])) == {"db", "auth", "ser", "total"}
+    assert "x-db-roundtrips" in response.headers
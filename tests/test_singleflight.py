@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from singleflight import SingleFlight, normalized_key
+
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_normalized_key_ignores_dict_order():
+    assert normalized_key({"make": "BMW", "year": 2024}) == normalized_key({"year": 2024, "make": "BMW"})
+    assert normalized_key({"make": "BMW"}) != normalized_key({"make": "Audi"})
+
+
+async def test_concurrent_calls_share_one_load():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return [calls]
+
+    results = await asyncio.gather(*(flight.do("key", load) for _ in range(10)))
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight == 0
+    assert await flight.do("key", load) == [2]
+
+
+async def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError(calls)
+
+    results = await asyncio.gather(*(flight.do("key", load) for _ in range(3)), return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    with pytest.raises(ValueError):
+        await flight.do("key", load)
+    assert calls == 2
+
+
+async def test_cancelled_leader_does_not_cancel_the_call():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    assert await follower == "done"
+    assert leader.cancelled()
+
+
+@pytest.mark.parametrize("settings_overrides", [{"strict_response_validation": True}])
+async def test_strict_listing_requests_are_coalesced(http):
+    await http.post("/api/cars", json={"make": "BMW", "model": "X5", "vin": "WBA00000000000001", "number": "1"})
+    leaders = sample("singleflight_requests_total", operation="get_cars", role="leader")
+    coalesced = sample("singleflight_requests_total", operation="get_cars", role="coalesced")
+
+    responses = await asyncio.gather(*(http.get("/api/cars", params={"make": "BMW"}) for _ in range(5)))
+
+    assert [len(response.json()) for response in responses] == [1] * 5
+    new_leaders = sample("singleflight_requests_total", operation="get_cars", role="leader") - leaders
+    new_coalesced = sample("singleflight_requests_total", operation="get_cars", role="coalesced") - coalesced
+    assert new_leaders + new_coalesced == 5
+    assert new_coalesced > 0
@@ -0,0 +1,99 @@
+import anyio
+import pytest
+
+from suggest_index import RANKED_SCAN_MIN, PrefixIndex, SuggestIndex
+
+
+def test_prefix_results_are_ranked_by_use():
+    index = PrefixIndex()
+    for value, count in (("Golf", 5), ("Polo", 9), ("Passat", 2), ("Panda", 9)):
+        index.add(value, count)
+
+    # Ties stay in alphabetical order
+    assert index.suggest("p") == [("Panda", 9), ("Polo", 9), ("Passat", 2)]
+    assert index.suggest("PA", limit=1) == [("Panda", 9)]
+    assert index.suggest("x") == []
+
+
+def test_spellings_share_an_entry_and_suggest_the_most_common():
+    index = PrefixIndex()
+    index.add("BMW", 3)
+    index.add("bmw ", 1)
+
+    assert index.suggest("b") == [("BMW", 4)]
+    index.remove("BMW")
+    index.remove("BMW")
+    index.remove("BMW")
+    assert index.suggest("b") == [("bmw ", 1)]
+    index.remove("bmw ")
+    assert len(index) == 0
+
+
+def test_long_slices_use_the_ranked_scan():
+    index = PrefixIndex()
+    for number in range(RANKED_SCAN_MIN * 2):
+        index.add(f"model {number:04d}", number)
+
+    assert index.suggest("model", limit=3) == [
+        ("model 0511", 511), ("model 0510", 510), ("model 0509", 509)
+    ]
+
+
+def test_models_by_make():
+    index = SuggestIndex()
+    index.add({"make": "Skoda", "model": "Octavia Combi"})
+    index.add({"make": "Opel", "model": "Omega"})
+    index.apply({"make": "Opel", "model": "Omega"}, {"make": "Opel", "model": "Corsa"})
+
+    assert index.suggest("model", "o", make="skoda") == [("Octavia Combi", 1)]
+    assert index.suggest("model", "o", make="Opel") == []
+    assert index.suggest("model", "", make="Audi") == []
+
+
+@pytest.mark.anyio
+async def test_writes_of_other_workers_are_applied_without_a_rebuild(server):
+    index = server.suggest_index
+    await index.loaded.wait()
+    loaded_at = index.loaded_at
+    golf = {"make": "Volkswagen", "model": "Golf", "status": "absent"}
+
+    index.invalidated("cars", [[None, golf]])
+    index.invalidated("cars", [[golf, {**golf, "status": "present"}]])
+    index.invalidated("users", None)
+    await anyio.sleep(0.05)
+
+    assert index.suggest("make", "v") == [("Volkswagen", 1)]
+    assert index.loaded_at == loaded_at
+
+    index.invalidated("cars", None)  # A bulk write
+    with anyio.fail_after(5):
+        while index.loaded_at == loaded_at:
+            await anyio.sleep(0.01)
+    assert index.suggest("make", "v") == []
+
+
+@pytest.mark.anyio
+async def test_suggest_endpoint(http, server):
+    await server.suggest_index.loaded.wait()
+    for number, (make, model) in enumerate([("Volkswagen", "Golf"), ("Volkswagen", "Polo"),
+                                            ("Volvo", "XC60"), ("Volkswagen", "Golf")]):
+        response = await http.post("/api/cars", json={"make": make, "model": model, "number": str(number)})
+        response.raise_for_status()
+
+    response = await http.get("/api/cars/suggest", params={"field": "make", "prefix": "vo"})
+    assert response.json() == [{"value": "Volkswagen", "count": 3}, {"value": "Volvo", "count": 1}]
+    response = await http.get("/api/cars/suggest", params={"field": "model", "prefix": "",
+                                                           "make": "volkswagen", "limit": 1})
+    assert response.json() == [{"value": "Golf", "count": 2}]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("settings_overrides", [{"suggest_index_wait_seconds": 0.01,
+                                                 "ready_ping_timeout_seconds": 60}])
+async def test_suggest_endpoint_waits_for_first_build(http, server):
+    server.suggest_index.loaded.clear()
+
+    with anyio.fail_after(5):
+        response = await http.get("/api/cars/suggest", params={"field": "make", "prefix": "v"})
+
+    assert response.status_code == 503
@@ -0,0 +1,34 @@
+import dataclasses
+from datetime import datetime
+
+import pytest
+
+from generate_inventory import InventoryGenerator
+
+
+pytestmark = pytest.mark.anyio
+
+
+def comparable(cars):
+    """Listing items with timestamps parsed (orjson and pydantic spell UTC differently)"""
+    return sorted(({**car, "created_at": datetime.fromisoformat(car["created_at"].replace("Z", "+00:00")),
+                    "updated_at": datetime.fromisoformat(car["updated_at"].replace("Z", "+00:00"))}
+                   for car in cars), key=lambda car: car["id"])
+
+
+async def test_trusted_listing_matches_validated_models(http, server, monkeypatch):
+    cars = [server.prepare_for_mongo(car) for car in InventoryGenerator(seed=9, photo_kb=1).cars(20)]
+    await server.db.cars.insert_many(cars)
+    # A document written before is_consignment and the photos existed gets the model defaults
+    legacy = server.prepare_for_mongo(next(InventoryGenerator(seed=10).cars(1, with_photos=False)))
+    for field in ("is_consignment", "car_photo", "vin_photo", "image_url"):
+        del legacy[field]
+    await server.db.cars.insert_one(legacy)
+
+    trusted = (await http.get("/api/cars")).json()
+    monkeypatch.setattr(server, "settings", dataclasses.replace(server.settings, strict_response_validation=True))
+    validated = (await http.get("/api/cars")).json()
+
+    assert len(trusted) == 21
+    assert comparable(trusted) == comparable(validated)
+    assert next(car for car in trusted if car["id"] == str(legacy["id"]))["is_consignment"] is False
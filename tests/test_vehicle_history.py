@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import pytest
+
+
+pytestmark = pytest.mark.anyio
+
+VIN = "WVWZZZ1KZ9W000001"
+PHOTO = "data:image/jpeg;base64,/9j/4AAQ"
+
+
+@pytest.fixture
+async def archive(http):
+    response = await http.post("/api/cars", json={"make": "Volkswagen", "model": "Golf", "number": "7",
+                                                  "vin": f" {VIN.lower()} "})
+    car = response.json()
+    await http.patch(f"/api/cars/{car['id']}/status", json={"status": "present", "car_photo": PHOTO,
+                                                          "vin_photo": PHOTO})
+    now = datetime.now(timezone.utc)
+    response = await http.post("/api/archives/create-monthly",
+                               json={"month": now.month, "year": now.year, "archive_name": "Stocktake"})
+    response.raise_for_status()
+    return response.json()
+
+
+async def test_history_lists_archived_appearances(http, archive):
+    response = await http.get(f"/api/vehicles/{VIN.lower()}/history")
+
+    history = response.json()
+    assert history["vin"] == VIN
+    assert [(entry["archive_id"], entry["archive_name"], entry["status"]) for entry in history["entries"]] == [
+        (archive["id"], "Stocktake", "present")
+    ]
+    assert history["last_verified_present"]["archive_id"] == archive["id"]
+
+
+async def test_history_follows_archive_deletion(http, archive):
+    response = await http.delete(f"/api/archives/{archive['id']}")
+    response.raise_for_status()
+
+    response = await http.get(f"/api/vehicles/{VIN}/history")
+    assert response.json()["entries"] == []
+    assert response.json()["last_verified_present"] is None
+
+
+async def test_history_is_backfilled_from_archives(http, server, archive):
+    await server.db.vehicle_history.delete_many({})
+
+    await server.rebuild_vehicle_history()
+
+    response = await http.get(f"/api/vehicles/{VIN}/history")
+    assert [entry["archive_id"] for entry in response.json()["entries"]] == [archive["id"]]